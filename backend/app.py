@@ -1,4 +1,6 @@
-from flask import Flask, jsonify
+import time
+import multiprocessing
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
@@ -6,6 +8,13 @@ from routes.auth import auth_bp
 from routes.dataset import dataset_bp
 from routes.model import model_bp
 from routes.predict import predict_bp
+from routes.profiling import profiling_bp
+from routes.monitoring import monitoring_bp
+from utils.model_cache import model_cache
+from utils.model_registry import model_registry
+from utils.metrics import metrics
+
+Config.ensure_folders()
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -18,6 +27,32 @@ app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(dataset_bp, url_prefix='/api/datasets')
 app.register_blueprint(model_bp, url_prefix='/api/models')
 app.register_blueprint(predict_bp, url_prefix='/api/predict')
+app.register_blueprint(profiling_bp, url_prefix='/api/profiles')
+app.register_blueprint(monitoring_bp, url_prefix='/api/monitoring')
+
+# Optional warm start; skipped in training job processes, which import this module too
+if Config.MODEL_PRELOAD > 0 and multiprocessing.parent_process() is None:
+    preloaded = model_cache.preload(model_registry.list(), Config.MODEL_PRELOAD)
+    print(f"Preloaded {len(preloaded)} model(s): {', '.join(preloaded)}")
+
+@app.before_request
+def _start_timer():
+    if metrics.enabled:
+        g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # The URL rule, not the path, keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - start, route=route, method=request.method)
+        metrics.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/health', methods=['GET'])
 def health():
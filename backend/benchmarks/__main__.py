@@ -0,0 +1,73 @@
+"""
+Benchmark suite for the training, inference and storage hot paths.
+
+    cd backend
+    python -m benchmarks run --rows 1000 10000 100000 --out bench.json
+    python -m benchmarks compare baseline.json bench.json --threshold 0.25
+
+`run` writes results as JSON (environment, config and per-benchmark latency
+statistics). `compare` prints both runs side by side and exits with status 1
+if any benchmark got slower than the threshold allows.
+"""
+import sys
+import json
+import argparse
+from .suite import SUITES, run, compare
+
+def _format_ms(value):
+    return '-' if value is None else f'{value:.3f}'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run benchmarks and write results as JSON')
+    run_parser.add_argument('--suites', nargs='+', choices=SUITES, default=SUITES)
+    run_parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='synthetic dataset / history sizes (up to 1000000)')
+    run_parser.add_argument('--repeat', type=int, default=5,
+                            help='runs per train, batch and dataset benchmark')
+    run_parser.add_argument('--predict-repeat', type=int, default=500)
+    run_parser.add_argument('--appends', type=int, default=200)
+    run_parser.add_argument('--svm-max-rows', type=int, default=5000)
+    run_parser.add_argument('--out', help='output file (default: stdout)')
+
+    compare_parser = commands.add_parser('compare', help='flag regressions against a baseline run')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.25,
+                                help='allowed slowdown before flagging, as a fraction')
+    compare_parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                                help='ignore changes smaller than this many milliseconds')
+    compare_parser.add_argument('--metric', default='p50_ms', choices=['p50_ms', 'mean_ms', 'p95_ms', 'min_ms'])
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        report = run(args.suites, args.rows, args.repeat, args.predict_repeat, args.appends, args.svm_max_rows)
+        output = json.dumps(report, indent=2)
+        if args.out:
+            with open(args.out, 'w') as f:
+                f.write(output + '\n')
+        else:
+            print(output)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold, args.metric, args.min_delta_ms)
+    width = max([len(r['name']) for r in rows] + [9])
+    print(f"{'benchmark':<{width}}  {'baseline':>12}  {'current':>12}  {'ratio':>7}  status")
+    for r in rows:
+        ratio = '-' if r['ratio'] is None else f"{r['ratio']:.2f}x"
+        print(f"{r['name']:<{width}}  {_format_ms(r['baseline']):>12}  {_format_ms(r['current']):>12}  {ratio:>7}  {r['status']}")
+    regressions = [r for r in rows if r['status'] == 'regression']
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%} ({args.metric})")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Measures append_row latency as predictions history grows.
+
+    cd backend
+    python -m benchmarks.bench_append --rows 1000 100000 1000000
+
+For each history size a predictions-shaped CSV is generated, then
+`--appends` rows are appended through the journal. The legacy
+read-concat-rewrite strategy is timed alongside for sizes up to
+`--legacy-max-rows`, since it becomes impractically slow beyond that.
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from utils.csv_utils import append_row, compact_csv
+
+INPUT_SAMPLE = str({'school': 'GP', 'sex': 'M', 'age': '16', 'studytime': '1', 'failures': '0', 'absences': '8'})
+
+def make_history(filepath, rows):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2025-01-01', periods=rows, freq='s').strftime('%Y-%m-%dT%H:%M:%S.%f'),
+        'model_id': rng.choice(['Decision_Tree_20250101000000', 'SVM_20250101000000'], size=rows),
+        'input_data': INPUT_SAMPLE,
+        'prediction': rng.integers(0, 2, size=rows),
+        'probability': rng.random(rows)
+    })
+    df.to_csv(filepath, index=False)
+
+def legacy_append(data_dict, filepath):
+    existing_df = pd.read_csv(filepath)
+    df = pd.concat([existing_df, pd.DataFrame([data_dict])], ignore_index=True)
+    df.to_csv(filepath + '.tmp', index=False)
+    shutil.move(filepath + '.tmp', filepath)
+
+def time_appends(append, filepath, count):
+    row = {'timestamp': '2026-01-01T00:00:00', 'model_id': 'SVM_20250101000000',
+           'input_data': INPUT_SAMPLE, 'prediction': 1, 'probability': 0.9}
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        append(row, filepath)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return {'mean_ms': float(timings.mean()), 'p50_ms': float(np.percentile(timings, 50)),
+            'p95_ms': float(np.percentile(timings, 95)), 'min_ms': float(timings.min())}
+
+def run(sizes, appends, legacy_max_rows):
+    results = []
+    workdir = tempfile.mkdtemp()
+    try:
+        for rows in sizes:
+            filepath = os.path.join(workdir, f'predictions_{rows}.csv')
+            make_history(filepath, rows)
+            result = {'history_rows': rows, 'journal': time_appends(append_row, filepath, appends)}
+            start = time.perf_counter()
+            compact_csv(filepath)
+            result['compaction_s'] = time.perf_counter() - start
+            if rows <= legacy_max_rows:
+                result['legacy'] = time_appends(legacy_append, filepath, min(appends, 20))
+            results.append(result)
+            print(json.dumps(result))
+    finally:
+        shutil.rmtree(workdir)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--appends', type=int, default=200)
+    parser.add_argument('--legacy-max-rows', type=int, default=100000)
+    args = parser.parse_args()
+    run(args.rows, args.appends, args.legacy_max_rows)
@@ -0,0 +1,236 @@
+"""
+Benchmarks for the training, inference and storage hot paths.
+
+Every benchmark runs against synthetic student data in a temporary folder
+(Config folders are pointed there for the run), so nothing under data/ or
+models/ is touched. Results are keyed by a stable name such as
+"train/Decision Tree/rows=10000" so runs can be compared with compare().
+The svm suite also records holdout accuracy and ROC AUC next to the timings.
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import platform
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+import numpy as np
+import pandas as pd
+import sklearn
+from config import Config
+from utils.csv_utils import append_row
+from utils.ml_utils import ALGORITHMS, train_model, predict_single, get_model_instance, uses_large_svm
+from utils.preprocessing import prepare_data, get_preprocessor
+from .synthetic import write_students
+from .bench_append import make_history, time_appends
+
+SUITES = ['train', 'predict', 'batch', 'append', 'dataset', 'svm']
+
+def measure(fn, repeat=1):
+    """Runs fn `repeat` times and returns latency statistics in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings = np.array(timings)
+    return {
+        'n': repeat,
+        'mean_ms': float(timings.mean()),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'min_ms': float(timings.min())
+    }
+
+@contextmanager
+def isolated_folders():
+    """Points the upload, cache, models and jobs folders at a temporary directory."""
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    folders = {
+        'UPLOAD_FOLDER': os.path.join(workdir, 'datasets'),
+        'DATASET_CACHE_FOLDER': os.path.join(workdir, 'datasets', '.cache'),
+        'MODELS_FOLDER': os.path.join(workdir, 'models'),
+        'JOBS_FOLDER': os.path.join(workdir, 'jobs')
+    }
+    for path in folders.values():
+        os.makedirs(path, exist_ok=True)
+    try:
+        with mock.patch.multiple(Config, **folders):
+            yield workdir
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _dataset(rows):
+    path = os.path.join(Config.UPLOAD_FOLDER, f'students_{rows}.csv')
+    if not os.path.exists(path):
+        write_students(path, rows)
+    return path
+
+def bench_train(sizes, repeat, svm_max_rows):
+    results = {}
+    for rows in sizes:
+        path = _dataset(rows)
+        for algorithm in ALGORITHMS:
+            if algorithm == 'SVM' and rows > svm_max_rows and not uses_large_svm(algorithm, rows):
+                continue  # exact SVC is quadratic in rows
+            results[f'train/{algorithm}/rows={rows}'] = measure(lambda: train_model(path, algorithm, {}), repeat)
+    return results
+
+def bench_svm(sizes, svm_max_rows):
+    """Exact SVC against the large-data approximation on the same 80/20 split."""
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+    results = {}
+    for rows in sizes:
+        X, y = prepare_data(pd.read_csv(_dataset(rows), sep=';'))
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=0, stratify=y)
+        engines = [('approximate', 1)] + ([('exact', 0)] if rows <= svm_max_rows else [])
+        for engine, threshold in engines:
+            with mock.patch.object(Config, 'SVM_LARGE_ROWS', threshold):
+                clf = get_model_instance('SVM', {}, n_rows=len(X_train))
+            pipeline = Pipeline(steps=[('preprocessor', get_preprocessor(X_train)), ('classifier', clf)])
+            timing = measure(lambda: pipeline.fit(X_train, y_train))
+            proba = pipeline.predict_proba(X_test)[:, 1]
+            results[f'svm/{engine}/rows={rows}'] = dict(timing, accuracy=float((pipeline.predict(X_test) == y_test).mean()),
+                                                        roc_auc=float(roc_auc_score(y_test, proba)))
+    return results
+
+def _trained(algorithm, rows=1000):
+    from utils.model_cache import ModelCache
+    record = train_model(_dataset(rows), algorithm, {})
+    model, scorer = ModelCache(models_folder=Config.MODELS_FOLDER).get_with_scorer(record['model_id'], record['filepath'])
+    return record, model, scorer
+
+def bench_predict(repeat):
+    results = {}
+    X, _ = prepare_data(pd.read_csv(_dataset(1000), sep=';'))
+    samples = X.head(100).to_dict(orient='records')
+    for algorithm in ALGORITHMS:
+        _, model, scorer = _trained(algorithm)
+        paths = [('pipeline', None)] + ([('compiled', scorer)] if scorer is not None else [])
+        for label, path_scorer in paths:
+            i = iter(range(10 ** 9))
+            results[f'predict_single/{algorithm}/{label}'] = measure(
+                lambda: predict_single(model, samples[next(i) % len(samples)], path_scorer), repeat)
+    return results
+
+def bench_batch(sizes, repeat):
+    from app import app
+    from utils.model_cache import ModelCache
+    from utils.model_registry import ModelRegistry
+
+    record, _, _ = _trained('Decision Tree')
+    registry = ModelRegistry(os.path.join(Config.MODELS_FOLDER, 'models.csv'))
+    registry.add(record)
+    client = app.test_client()
+    results = {}
+    with mock.patch('routes.predict.model_registry', registry), \
+            mock.patch('routes.predict.model_cache', ModelCache(models_folder=Config.MODELS_FOLDER)):
+        for rows in sizes:
+            with open(_dataset(rows), 'rb') as f:
+                payload = f.read()
+            for label, form in (('buffered', {}), ('stream', {'stream': 'true'})):
+                def post():
+                    data = dict(form, model_id=record['model_id'], file=(io.BytesIO(payload), 'batch.csv'))
+                    response = client.post('/api/predict/batch', data=data)
+                    response.get_data()  # drain streamed responses
+                    assert response.status_code == 200, response.status_code
+                results[f'batch/{label}/rows={rows}'] = measure(post, repeat)
+    return results
+
+def bench_append(sizes, appends):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='bench-append-')
+    try:
+        for rows in sizes:
+            filepath = os.path.join(workdir, f'predictions_{rows}.csv')
+            make_history(filepath, rows)
+            timing = time_appends(append_row, filepath, appends)
+            results[f'append_row/history={rows}'] = {'n': appends, **timing}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def bench_dataset(sizes, repeat):
+    from app import app
+    client = app.test_client()
+    results = {}
+    for rows in sizes:
+        name = os.path.basename(_dataset(rows))
+        for endpoint in ('preview', 'correlation', 'distributions'):
+            url = f'/api/datasets/{endpoint}/{name}'
+
+            def cold():
+                shutil.rmtree(Config.DATASET_CACHE_FOLDER, ignore_errors=True)
+                assert client.get(url).status_code == 200
+            results[f'dataset/{endpoint}/cold/rows={rows}'] = measure(cold, 1)
+            results[f'dataset/{endpoint}/warm/rows={rows}'] = measure(lambda: client.get(url), repeat)
+    return results
+
+def environment():
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sklearn': sklearn.__version__,
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'storage_backend': Config.STORAGE_BACKEND
+    }
+
+def run(suites=None, sizes=(1000, 10000, 100000), repeat=5, predict_repeat=500, appends=200, svm_max_rows=5000):
+    """Runs the selected suites and returns {"environment", "config", "results"}."""
+    suites = suites or SUITES
+    results = {}
+    with isolated_folders():
+        for suite in suites:
+            print(f"Running {suite}...", file=sys.stderr)
+            if suite == 'train':
+                results.update(bench_train(sizes, repeat, svm_max_rows))
+            elif suite == 'predict':
+                results.update(bench_predict(predict_repeat))
+            elif suite == 'batch':
+                results.update(bench_batch(sizes, repeat))
+            elif suite == 'append':
+                results.update(bench_append(sizes, appends))
+            elif suite == 'dataset':
+                results.update(bench_dataset(sizes, repeat))
+            elif suite == 'svm':
+                results.update(bench_svm(sizes, svm_max_rows))
+            else:
+                raise ValueError(f"Unknown suite: {suite}")
+    config = {'suites': list(suites), 'sizes': list(sizes), 'repeat': repeat,
+              'predict_repeat': predict_repeat, 'appends': appends, 'svm_max_rows': svm_max_rows}
+    return {'environment': environment(), 'config': config, 'results': results}
+
+def compare(baseline, current, threshold=0.25, metric='p50_ms', min_delta_ms=0.5):
+    """
+    Compares two runs benchmark by benchmark. A benchmark regresses when its
+    `metric` grew by more than `threshold` (0.25 = 25% slower) and by more than
+    min_delta_ms, so jitter on sub-millisecond benchmarks isn't flagged.
+    Returns a list of rows: name, baseline, current, ratio, status.
+    """
+    rows = []
+    base, cur = baseline['results'], current['results']
+    for name in sorted(set(base) | set(cur)):
+        if name not in base or name not in cur:
+            rows.append({'name': name, 'baseline': base.get(name, {}).get(metric), 'current': cur.get(name, {}).get(metric),
+                         'ratio': None, 'status': 'new' if name in cur else 'missing'})
+            continue
+        before, after = base[name][metric], cur[name][metric]
+        ratio = after / before if before else float('inf')
+        if abs(after - before) <= min_delta_ms:
+            status = 'ok'
+        elif ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'baseline': before, 'current': after, 'ratio': ratio, 'status': status})
+    return rows
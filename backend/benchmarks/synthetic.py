@@ -0,0 +1,60 @@
+"""
+Synthetic student datasets following the student-mat.csv schema (the fields
+used by pick_random_student.py plus the G1/G2/G3 grades), at any size.
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORIES = {
+    'school': ['GP', 'MS'],
+    'sex': ['F', 'M'],
+    'address': ['U', 'R'],
+    'famsize': ['GT3', 'LE3'],
+    'Pstatus': ['T', 'A'],
+    'Mjob': ['at_home', 'health', 'other', 'services', 'teacher'],
+    'Fjob': ['at_home', 'health', 'other', 'services', 'teacher'],
+    'reason': ['course', 'home', 'other', 'reputation'],
+    'guardian': ['mother', 'father', 'other'],
+    'schoolsup': ['yes', 'no'],
+    'famsup': ['yes', 'no'],
+    'paid': ['yes', 'no'],
+    'activities': ['yes', 'no'],
+    'nursery': ['yes', 'no'],
+    'higher': ['yes', 'no'],
+    'internet': ['yes', 'no'],
+    'romantic': ['yes', 'no']
+}
+
+# (low, high) inclusive integer ranges
+RANGES = {
+    'age': (15, 22), 'Medu': (0, 4), 'Fedu': (0, 4), 'traveltime': (1, 4), 'studytime': (1, 4),
+    'failures': (0, 3), 'famrel': (1, 5), 'freetime': (1, 5), 'goout': (1, 5), 'Dalc': (1, 5),
+    'Walc': (1, 5), 'health': (1, 5)
+}
+
+COLUMNS = ['school', 'sex', 'age', 'address', 'famsize', 'Pstatus', 'Medu', 'Fedu', 'Mjob', 'Fjob',
+           'reason', 'guardian', 'traveltime', 'studytime', 'failures', 'schoolsup', 'famsup', 'paid',
+           'activities', 'nursery', 'higher', 'internet', 'romantic', 'famrel', 'freetime', 'goout',
+           'Dalc', 'Walc', 'health', 'absences', 'G1', 'G2', 'G3']
+
+def generate_students(rows, seed=0):
+    """Returns a DataFrame of `rows` synthetic students with a learnable G3."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col, values in CATEGORIES.items():
+        data[col] = rng.choice(values, size=rows)
+    for col, (low, high) in RANGES.items():
+        data[col] = rng.integers(low, high + 1, size=rows)
+    data['absences'] = np.minimum(rng.poisson(5, size=rows), 75)
+
+    # Grades drift with study time, failures, absences and alcohol like the real data
+    ability = (10 + 1.2 * (data['studytime'] - 2) - 2.0 * data['failures'] - 0.05 * data['absences']
+               - 0.4 * (data['Dalc'] - 1) + 0.8 * (data['higher'] == 'yes') + rng.normal(0, 3, size=rows))
+    for col, noise in (('G1', 2.0), ('G2', 1.5), ('G3', 1.0)):
+        data[col] = np.clip(np.round(ability + rng.normal(0, noise, size=rows)), 0, 20).astype(int)
+    return pd.DataFrame(data, columns=COLUMNS)
+
+def write_students(filepath, rows, seed=0):
+    """Writes a synthetic dataset as ;-separated CSV, like the bundled student-mat.csv."""
+    generate_students(rows, seed).to_csv(filepath, sep=';', index=False)
+    return filepath
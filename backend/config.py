@@ -6,8 +6,83 @@ class Config:
     DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
     MODELS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
     UPLOAD_FOLDER = os.path.join(DATA_FOLDER, 'datasets')
-    
-    # Ensure directories exist
-    os.makedirs(DATA_FOLDER, exist_ok=True)
-    os.makedirs(MODELS_FOLDER, exist_ok=True)
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    # Parsed, columnar copies of uploaded datasets keyed by content hash
+    DATASET_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, '.cache')
+
+    # Datasets larger than this are profiled in chunks rather than loaded whole
+    PROFILE_STREAMING_BYTES = int(os.environ.get('PROFILE_STREAMING_MB', 256)) * 1024 * 1024
+    PROFILE_CHUNK_ROWS = int(os.environ.get('PROFILE_CHUNK_ROWS', 100000))
+
+    # In-process cache of loaded model pipelines (see utils/model_cache.py)
+    MODEL_CACHE_MAX_ENTRIES = int(os.environ.get('MODEL_CACHE_MAX_ENTRIES', 16))
+    MODEL_CACHE_MAX_BYTES = int(os.environ.get('MODEL_CACHE_MAX_MB', 512)) * 1024 * 1024
+    # Models loaded and warmed up at startup (most recent first), and whether model
+    # arrays are memory-mapped so forked workers share them through the page cache
+    MODEL_PRELOAD = int(os.environ.get('MODEL_PRELOAD', 0))
+    MODEL_MMAP = os.environ.get('MODEL_MMAP', '').lower() in ('1', 'true', 'yes')
+
+    # Cache of single-prediction results (see utils/result_cache.py); 0 entries disables
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 10000))
+    RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 300))
+
+    # Rows scored per chunk by streaming batch prediction
+    BATCH_CHUNK_ROWS = int(os.environ.get('BATCH_CHUNK_ROWS', 10000))
+
+    # Page size of GET /api/predict/history when paginating, and its upper bound
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 50))
+    HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 1000))
+
+    # Live accuracy from feedback (see utils/monitoring.py): rolling windows in
+    # hours, calibration buckets, and when a window raises a drift alert
+    MONITOR_WINDOWS_HOURS = [int(h) for h in os.environ.get('MONITOR_WINDOWS_HOURS', '1,24,168').split(',')]
+    MONITOR_CALIBRATION_BINS = int(os.environ.get('MONITOR_CALIBRATION_BINS', 10))
+    MONITOR_MIN_SAMPLES = int(os.environ.get('MONITOR_MIN_SAMPLES', 30))
+    MONITOR_DRIFT_TOLERANCE = float(os.environ.get('MONITOR_DRIFT_TOLERANCE', 0.1))
+
+    # Step size and L2 penalty of the SGD pass that incrementally updates logistic regression
+    INCREMENTAL_SGD_ETA0 = float(os.environ.get('INCREMENTAL_SGD_ETA0', 0.01))
+    INCREMENTAL_SGD_ALPHA = float(os.environ.get('INCREMENTAL_SGD_ALPHA', 1e-4))
+
+    # Micro-batching of concurrent single predictions (see utils/micro_batch.py); 0 disables
+    PREDICT_BATCH_WINDOW_MS = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', 0))
+    PREDICT_BATCH_MAX_ROWS = int(os.environ.get('PREDICT_BATCH_MAX_ROWS', 64))
+
+    # Request/stage timings served at /api/metrics (see utils/metrics.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+    # Opt-in profiling of single requests sent with an X-Profile: 1 header or
+    # ?profile=1 by an authenticated user (optionally limited to these usernames)
+    REQUEST_PROFILING_ENABLED = os.environ.get('REQUEST_PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    REQUEST_PROFILING_USERS = os.environ.get('REQUEST_PROFILING_USERS', '')
+    REQUEST_PROFILE_INTERVAL_MS = float(os.environ.get('REQUEST_PROFILE_INTERVAL_MS', 1))
+    REQUEST_PROFILES_FOLDER = os.path.join(DATA_FOLDER, 'profiles')
+
+    # SVMs trained on at least SVM_LARGE_ROWS rows use a Nystroem kernel approximation and
+    # a calibrated linear SVM instead of SVC (see utils/large_svm.py); 0 always uses SVC
+    SVM_LARGE_ROWS = int(os.environ.get('SVM_LARGE_ROWS', 20000))
+    SVM_LARGE_COMPONENTS = int(os.environ.get('SVM_LARGE_COMPONENTS', 300))
+    SVM_LARGE_CALIBRATION_CV = int(os.environ.get('SVM_LARGE_CALIBRATION_CV', 3))
+
+    # Background training jobs (see utils/jobs.py)
+    TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', 2))
+    JOBS_FOLDER = os.path.join(DATA_FOLDER, 'jobs')
+
+    # Password hashing: bcrypt cost factor and size of the hashing thread pool
+    BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+    BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', os.cpu_count() or 4))
+
+    # Storage backend for users/models/predictions/feedback: 'csv' or 'sqlite'
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'csv')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH') or os.path.join(DATA_FOLDER, 'storage.db')
+
+    # Append journal for CSV storage (see utils/csv_utils.py)
+    CSV_GROUP_COMMIT_MS = float(os.environ.get('CSV_GROUP_COMMIT_MS', 0))
+    CSV_COMPACT_INTERVAL = float(os.environ.get('CSV_COMPACT_INTERVAL', 30))
+    CSV_COMPACT_BYTES = int(os.environ.get('CSV_COMPACT_BYTES', 1024 * 1024))
+
+    @classmethod
+    def ensure_folders(cls):
+        """Creates the data, models and upload folders; called once at app startup."""
+        os.makedirs(cls.DATA_FOLDER, exist_ok=True)
+        os.makedirs(cls.MODELS_FOLDER, exist_ok=True)
+        os.makedirs(cls.UPLOAD_FOLDER, exist_ok=True)
@@ -0,0 +1,30 @@
+"""
+One-shot migration of users/models/predictions/feedback between storage backends.
+
+    cd backend
+    python migrate_storage.py csv sqlite   # CSV files -> data/storage.db
+    python migrate_storage.py sqlite csv   # and back
+
+Then set STORAGE_BACKEND to the target backend and restart the server.
+Stop the server before migrating so no writes are lost in between.
+"""
+import sys
+import argparse
+from utils.csv_utils import migrate_storage
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', choices=['csv', 'sqlite'])
+    parser.add_argument('target', choices=['csv', 'sqlite'])
+    args = parser.parse_args(argv)
+    if args.source == args.target:
+        parser.error("source and target must differ")
+
+    migrated = migrate_storage(args.source, args.target)
+    for filepath in migrated:
+        print(f"Migrated {filepath}")
+    print(f"{len(migrated)} table(s) migrated from {args.source} to {args.target}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
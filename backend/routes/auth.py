@@ -1,15 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
-import bcrypt
-import os
-from utils.csv_utils import read_csv, append_row, init_csv
-from config import Config
+from utils.user_store import user_store, hash_password, check_password
 
 auth_bp = Blueprint('auth', __name__)
-USERS_FILE = os.path.join(Config.DATA_FOLDER, 'users.csv')
-
-# Initialize users file
-init_csv(USERS_FILE, ['username', 'password'])
+USERS_FILE = user_store.filepath
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -20,13 +14,14 @@ def register():
     if not username or not password:
         return jsonify({"msg": "Username and password required"}), 400
 
-    users_df = read_csv(USERS_FILE)
-    if not users_df.empty and username in users_df['username'].values:
+    # Cheap pre-check so taken names don't cost a bcrypt hash
+    if user_store.exists(username):
         return jsonify({"msg": "Username already exists"}), 400
 
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed = hash_password(password)
     
-    append_row({'username': username, 'password': hashed}, USERS_FILE)
+    if not user_store.create(username, hashed):
+        return jsonify({"msg": "Username already exists"}), 400
     
     return jsonify({"msg": "User registered successfully"}), 201
 
@@ -36,16 +31,11 @@ def login():
     username = data.get('username')
     password = data.get('password')
 
-    users_df = read_csv(USERS_FILE)
-    if users_df.empty:
-        return jsonify({"msg": "Invalid credentials"}), 401
-
-    user_row = users_df[users_df['username'] == username]
-    if user_row.empty:
+    stored_hash = user_store.get_hash(username)
+    if stored_hash is None:
         return jsonify({"msg": "Invalid credentials"}), 401
 
-    stored_hash = user_row.iloc[0]['password']
-    if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
+    if check_password(password, stored_hash):
         access_token = create_access_token(identity=username)
         return jsonify(access_token=access_token), 200
     else:
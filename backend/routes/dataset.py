@@ -1,9 +1,9 @@
 from flask import Blueprint, request, jsonify
 import os
-import pandas as pd
 from werkzeug.utils import secure_filename
 from config import Config
-from utils.csv_utils import read_csv
+from utils.dataset_cache import prune_cache
+from utils.profiling import get_profile, save_profile, as_dict
 
 dataset_bp = Blueprint('dataset', __name__)
 
@@ -19,6 +19,12 @@ def upload_dataset():
         filename = secure_filename(file.filename)
         filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
         file.save(filepath)
+        # Parse, cache and profile now so the dataset page loads instantly
+        try:
+            save_profile(filepath)
+            prune_cache()
+        except Exception as e:
+            print(f"Could not profile {filename}: {e}")
         return jsonify({"msg": "File uploaded successfully", "filename": filename}), 201
     else:
         return jsonify({"msg": "Only CSV files are allowed"}), 400
@@ -35,27 +41,13 @@ def preview_dataset(filename):
         return jsonify({"msg": "File not found"}), 404
     
     try:
-        # Use sep=None to auto-detect separator
-        df = pd.read_csv(filepath, sep=None, engine='python')
-        # Sanitize preview
-        preview_df = df.head(10).astype(object).where(pd.notnull(df.head(10)), None)
-        preview = preview_df.to_dict(orient='records')
-        
-        # Sanitize description
-        desc_df = df.describe()
-        desc_df = desc_df.astype(object).where(pd.notnull(desc_df), None)
-        
-        stats = {
-            "rows": len(df),
-            "columns": list(df.columns),
-            "description": desc_df.to_dict()
-        }
-        
-        # Class distribution for G3 if exists
-        if 'G3' in df.columns:
-            stats['class_distribution'] = df['G3'].value_counts().to_dict()
+        # Served from the profile computed at upload time
+        profile = get_profile(filepath)
+        stats = dict(profile['stats'])
+        if 'class_distribution' in stats:
+            stats['class_distribution'] = as_dict(stats['class_distribution'])
             
-        return jsonify({"preview": preview, "stats": stats}), 200
+        return jsonify({"preview": profile['preview'], "stats": stats}), 200
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
 
@@ -66,23 +58,10 @@ def get_correlation(filename):
         return jsonify({"msg": "File not found"}), 404
     
     try:
-        df = pd.read_csv(filepath, sep=None, engine='python')
+        data = get_profile(filepath)['correlation']
         
-        # Select only numeric columns for correlation
-        numeric_df = df.select_dtypes(include=['number'])
-        
-        if numeric_df.empty:
+        if data is None:
             return jsonify({"msg": "No numeric columns found for correlation"}), 400
-            
-        corr_matrix = numeric_df.corr().round(2)
-        
-        # Replace NaN with None for JSON serialization
-        corr_matrix = corr_matrix.where(pd.notnull(corr_matrix), None)
-        
-        data = {
-            "columns": list(corr_matrix.columns),
-            "values": corr_matrix.values.tolist()
-        }
         
         return jsonify(data), 200
     except Exception as e:
@@ -95,30 +74,8 @@ def get_distributions(filename):
         return jsonify({"msg": "File not found"}), 404
     
     try:
-        df = pd.read_csv(filepath, sep=None, engine='python')
-        
-        distributions = {}
-        
-        # Categorical columns to analyze
-        categorical_cols = ['sex', 'address', 'famsize', 'Pstatus', 'Mjob', 'Fjob', 'reason', 'guardian', 'schoolsup', 'famsup', 'paid', 'activities', 'nursery', 'higher', 'internet', 'romantic']
-        # Numeric columns to analyze
-        numeric_cols = ['age', 'Medu', 'Fedu', 'traveltime', 'studytime', 'failures', 'famrel', 'freetime', 'goout', 'Dalc', 'Walc', 'health', 'absences', 'G1', 'G2', 'G3']
-        
-        for col in categorical_cols:
-            if col in df.columns:
-                distributions[col] = df[col].value_counts().to_dict()
-                
-        for col in numeric_cols:
-            if col in df.columns:
-                # For numeric, we might want bins or just counts if discrete enough
-                if df[col].nunique() < 20:
-                    distributions[col] = df[col].value_counts().sort_index().to_dict()
-                else:
-                    # For continuous, maybe just basic stats or histogram bins?
-                    # Let's just return value counts for now, frontend can handle or we limit
-                    distributions[col] = df[col].value_counts(bins=10).sort_index().to_dict()
-                    # Convert Interval index to string
-                    distributions[col] = {str(k): v for k, v in distributions[col].items()}
+        profile = get_profile(filepath)
+        distributions = {col: as_dict(pairs) for col, pairs in profile['distributions'].items()}
 
         return jsonify(distributions), 200
     except Exception as e:
@@ -1,16 +1,20 @@
 from flask import Blueprint, request, jsonify
 import os
-import json
 import pandas as pd
-from utils.ml_utils import train_model
-from utils.csv_utils import read_csv, append_row, init_csv, write_csv
+from utils.ml_utils import ALGORITHMS, train_model, search_model, sweep_models, training_cache_key, update_model, delta_filename
+from utils.preprocessing import prepare_data
+from utils.dataset_cache import sniff_buffer_delimiter
+from utils.monitoring import model_monitor
+from utils.jobs import training_jobs
+from utils.compiled_scorer import scorer_filename
+from utils.model_cache import model_cache
+from utils.result_cache import result_cache
+from utils.model_registry import model_registry
+from utils.metrics import metrics
 from config import Config
 
 model_bp = Blueprint('model', __name__)
-MODELS_CSV = os.path.join(Config.DATA_FOLDER, 'models.csv')
-
-# Initialize models.csv
-init_csv(MODELS_CSV, ['model_id', 'algorithm', 'hyperparams', 'metrics', 'filepath', 'timestamp', 'rules', 'feature_importance'])
+MODELS_CSV = model_registry.filepath
 
 @model_bp.route('/train', methods=['POST'])
 def train():
@@ -18,64 +22,153 @@ def train():
     dataset_name = data.get('dataset')
     algorithm = data.get('algorithm')
     hyperparams = data.get('hyperparams', {})
+    search = data.get('search')
     
     if not dataset_name or not algorithm:
         return jsonify({"msg": "Dataset and algorithm are required"}), 400
-        
+    # Before the cache key and the metric labels, which take the name as given
+    if algorithm not in ALGORITHMS:
+        return jsonify({"msg": f"Unknown algorithm: {algorithm}"}), 400
+
     dataset_path = os.path.join(Config.UPLOAD_FOLDER, dataset_name)
     if not os.path.exists(dataset_path):
         return jsonify({"msg": "Dataset not found"}), 404
-        
+
+    if search is not None and not (isinstance(search, dict) and search.get('params')):
+        return jsonify({"msg": "search must be an object with a params grid"}), 400
+
+    if not data.get('force'):
+        # Identical dataset content, algorithm and settings: reuse the trained model
+        cache_key = training_cache_key(dataset_path, algorithm, {} if search else hyperparams, search)
+        cached = model_registry.find_cached(cache_key)
+        if cached is not None and os.path.exists(os.path.join(Config.MODELS_FOLDER, cached['filepath'])):
+            return jsonify(cached), 200
+
+    if data.get('async'):
+        job = training_jobs.submit(dataset_path, algorithm, hyperparams, on_complete=_register, search=search)
+        return jsonify(job), 202
+
     try:
-        result = train_model(dataset_path, algorithm, hyperparams)
-        append_row(result, MODELS_CSV)
+        with metrics.span('search' if search else 'train', algorithm=algorithm):
+            if search:
+                result = search_model(dataset_path, algorithm, search)
+            else:
+                result = train_model(dataset_path, algorithm, hyperparams)
+        _register(result)
         return jsonify(result), 201
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
 
+@model_bp.route('/sweep', methods=['POST'])
+def sweep():
+    data = request.get_json()
+    dataset_name = data.get('dataset')
+    if not dataset_name:
+        return jsonify({"msg": "Dataset is required"}), 400
+
+    dataset_path = os.path.join(Config.UPLOAD_FOLDER, dataset_name)
+    if not os.path.exists(dataset_path):
+        return jsonify({"msg": "Dataset not found"}), 404
+
+    try:
+        with metrics.span('sweep'):
+            table, records = sweep_models(dataset_path, data.get('algorithms'), data.get('hyperparams'),
+                                          scoring=data.get('scoring', 'accuracy'), save=bool(data.get('save')))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    except Exception as e:
+        return jsonify({"msg": str(e)}), 500
+    for record in records:
+        _register(record)
+    return jsonify(table), 200
+
+@model_bp.route('/update/<model_id>', methods=['POST'])
+def update(model_id):
+    """
+    Saves a new version of model_id trained on new labelled rows: an uploaded
+    `file` in the dataset's format (with G3), or `source=feedback` for feedback
+    recorded since the model was saved.
+    """
+    parent = model_registry.get(model_id)
+    if parent is None or not os.path.exists(os.path.join(Config.MODELS_FOLDER, parent['filepath'])):
+        return jsonify({"msg": "Model not found"}), 404
+    lineage = parent.get('lineage') or model_id
+    lineage_models = [m for m in model_registry.list() if (m.get('lineage') or m['model_id']) == lineage]
+
+    try:
+        if 'file' in request.files:
+            file = request.files['file']
+            X_new, y_new = prepare_data(pd.read_csv(file.stream, sep=sniff_buffer_delimiter(file.stream)))
+        elif (request.form.get('source') or (request.get_json(silent=True) or {}).get('source')) == 'feedback':
+            # Only predictions of this lineage: other models may use other datasets and columns
+            X_new, y_new = model_monitor.labelled_rows([m['model_id'] for m in lineage_models],
+                                                       since=parent['timestamp'])
+        else:
+            return jsonify({"msg": "Upload a file or set source=feedback"}), 400
+    except (ValueError, pd.errors.ParserError) as e:
+        return jsonify({"msg": str(e)}), 400
+    if len(X_new) == 0:
+        return jsonify({"msg": "No new labelled rows"}), 400
+
+    versions = [int(float(m['version'])) for m in lineage_models if m.get('version')]
+    try:
+        with metrics.span('update', algorithm=parent['algorithm']):
+            result = update_model(parent, X_new, y_new, versions=versions)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    except Exception as e:
+        return jsonify({"msg": str(e)}), 500
+    _register(result)
+    return jsonify(result), 201
+
+def _register(result):
+    with metrics.span('registry_write'):
+        model_registry.add(result)
+    # A retrain within the same second reuses the model_id, drop any stale pipeline
+    model_cache.invalidate(result['model_id'])
+    result_cache.invalidate(result['model_id'])
+
+@model_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify(training_jobs.list()), 200
+
+@model_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({"msg": "Job not found"}), 404
+    return jsonify(job), 200
+
+@model_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = training_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"msg": "Job not found"}), 404
+    return jsonify(job), 200
+
 @model_bp.route('/list', methods=['GET'])
 def list_models():
-    df = read_csv(MODELS_CSV)
-    if df.empty:
-        return jsonify([]), 200
-    
-    # Replace NaN with None to ensure valid JSON
-    df = df.astype(object).where(pd.notnull(df), None)
-    
-    # Parse JSON strings back to objects for the response
-    models = df.to_dict(orient='records')
-    for m in models:
-        try:
-            m['hyperparams'] = json.loads(m['hyperparams'])
-            m['metrics'] = json.loads(m['metrics'])
-            if m.get('feature_importance'):
-                m['feature_importance'] = json.loads(m['feature_importance'])
-        except:
-            pass
-    return jsonify(models), 200
+    return jsonify(model_registry.list()), 200
 
 @model_bp.route('/delete/<model_id>', methods=['DELETE'])
 def delete_model(model_id):
     try:
-        df = read_csv(MODELS_CSV)
-        if df.empty:
-            return jsonify({"msg": "Model not found"}), 404
-            
-        # Find model to delete
-        model_row = df[df['model_id'] == model_id]
-        if model_row.empty:
+        model = model_registry.remove(model_id)
+        if model is None:
             return jsonify({"msg": "Model not found"}), 404
             
         # Delete file
-        filename = model_row.iloc[0]['filepath']
-        file_path = os.path.join(Config.MODELS_FOLDER, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            
-        # Remove from CSV
-        df = df[df['model_id'] != model_id]
-        write_csv(df, MODELS_CSV, mode='w')
+        for filename in (model['filepath'], scorer_filename(model['filepath']), delta_filename(model['filepath'])):
+            file_path = os.path.join(Config.MODELS_FOLDER, filename)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        model_cache.invalidate(model_id)
+        result_cache.invalidate(model_id)
         
         return jsonify({"msg": "Model deleted successfully"}), 200
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
+
+@model_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(model_cache.stats()), 200
@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify
+from utils.model_registry import model_registry
+from utils.monitoring import model_monitor
+
+monitoring_bp = Blueprint('monitoring', __name__)
+
+def _baseline(model_id):
+    """Cross-validated accuracy recorded when the model was trained, if known."""
+    record = model_registry.get(model_id)
+    metrics = record.get('metrics') if record else None
+    return metrics.get('accuracy') if isinstance(metrics, dict) else None
+
+@monitoring_bp.route('', methods=['GET'])
+def overview():
+    reports = [model_monitor.report(model_id, _baseline(model_id)) for model_id in model_monitor.model_ids()]
+    return jsonify([r for r in reports if r is not None]), 200
+
+@monitoring_bp.route('/alerts', methods=['GET'])
+def alerts():
+    active = []
+    for model_id in model_monitor.model_ids():
+        report = model_monitor.report(model_id, _baseline(model_id))
+        if report is not None:
+            active.extend(dict(alert, model_id=model_id) for alert in report['alerts'])
+    return jsonify(active), 200
+
+@monitoring_bp.route('/<model_id>', methods=['GET'])
+def model_report(model_id):
+    report = model_monitor.report(model_id, _baseline(model_id))
+    if report is None:
+        return jsonify({"msg": "No feedback for this model"}), 404
+    return jsonify(report), 200
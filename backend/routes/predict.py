@@ -1,17 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import os
+import json
 import pandas as pd
 from datetime import datetime
-from utils.ml_utils import load_model, predict_single
-from utils.csv_utils import read_csv, append_row, init_csv, write_csv
+from utils.ml_utils import predict_single, predict_with_proba
+from utils.dataset_cache import read_raw, sniff_buffer_delimiter
+from utils.model_cache import model_cache
+from utils.micro_batch import micro_batcher
+from utils.result_cache import result_cache
+from utils.metrics import metrics
+from utils.monitoring import model_monitor
+from utils.model_registry import model_registry
+from utils.csv_utils import read_csv, append_row, init_csv, write_csv, read_page, daily_counts
 from config import Config
 
 predict_bp = Blueprint('predict', __name__)
 PREDICTIONS_CSV = os.path.join(Config.DATA_FOLDER, 'predictions.csv')
+_predictions_created = False
 
-# Initialize predictions.csv
-# Columns: timestamp, model_id, input_data (json), prediction, probability
-init_csv(PREDICTIONS_CSV, ['timestamp', 'model_id', 'input_data', 'prediction', 'probability'])
+def _predictions_csv():
+    """Path of predictions.csv, created with its header on first use rather than at import."""
+    global _predictions_created
+    if not _predictions_created:
+        # Columns: timestamp, model_id, input_data (json), prediction, probability
+        init_csv(PREDICTIONS_CSV, ['timestamp', 'model_id', 'input_data', 'prediction', 'probability'])
+        _predictions_created = True
+    return PREDICTIONS_CSV
 
 @predict_bp.route('/', methods=['POST'])
 def predict():
@@ -23,20 +37,34 @@ def predict():
     if not model_id or not input_data:
         return jsonify({"msg": "Model ID and input data required"}), 400
         
-    # Find model filename from models.csv
-    models_df = read_csv(os.path.join(Config.DATA_FOLDER, 'models.csv'))
-    if models_df.empty:
+    # Find model filename from the models.csv index
+    if not model_registry.list():
         return jsonify({"msg": "No models found"}), 404
         
-    model_row = models_df[models_df['model_id'] == model_id]
-    if model_row.empty:
+    with metrics.span('registry_lookup'):
+        model_record = model_registry.get(model_id)
+    if model_record is None:
         return jsonify({"msg": "Model not found"}), 404
         
-    model_filename = model_row.iloc[0]['filepath']
+    model_filename = model_record['filepath']
     
     try:
-        model = load_model(model_filename)
-        prediction, probability = predict_single(model, input_data)
+        # The record timestamp changes when a model_id is retrained in another worker
+        cache_key = result_cache.key(model_id, model_record['timestamp'], input_data) if result_cache.enabled else None
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            prediction, probability = cached
+            metrics.inc('prediction_cache_hits_total', model_id=model_id)
+        else:
+            with metrics.span('model_load', model_id=model_id):
+                model, scorer = model_cache.get_with_scorer(model_id, model_filename)
+            with metrics.span('predict', model_id=model_id):
+                if Config.PREDICT_BATCH_WINDOW_MS > 0:
+                    prediction, probability = micro_batcher.predict(model_id, model, scorer, input_data)
+                else:
+                    prediction, probability = predict_single(model, input_data, scorer)
+            if cache_key:
+                result_cache.put(cache_key, (prediction, probability))
         
         result = {
             'timestamp': datetime.now().isoformat(),
@@ -47,12 +75,23 @@ def predict():
         }
         
         if save:
-            append_row(result, PREDICTIONS_CSV)
+            with metrics.span('history_append'):
+                append_row(result, _predictions_csv())
             
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
 
+@predict_bp.route('/cache', methods=['GET'])
+def result_cache_stats():
+    return jsonify(result_cache.stats()), 200
+
+@predict_bp.route('/batching', methods=['GET'])
+def batching_stats():
+    stats = micro_batcher.stats()
+    stats['enabled'] = Config.PREDICT_BATCH_WINDOW_MS > 0
+    return jsonify(stats), 200
+
 @predict_bp.route('/batch', methods=['POST'])
 def batch_predict():
     if 'file' not in request.files:
@@ -64,21 +103,30 @@ def batch_predict():
         return jsonify({"msg": "Model ID required"}), 400
         
     # Find model
-    models_df = read_csv(os.path.join(Config.DATA_FOLDER, 'models.csv'))
-    model_row = models_df[models_df['model_id'] == model_id]
-    if model_row.empty:
+    model_record = model_registry.get(model_id)
+    if model_record is None:
         return jsonify({"msg": "Model not found"}), 404
-    model_filename = model_row.iloc[0]['filepath']
+    model_filename = model_record['filepath']
+    
+    stream = request.form.get('stream', '').lower() in ('1', 'true', 'yes')
+    output_format = request.form.get('format', 'ndjson')
+    if stream and output_format not in ('ndjson', 'csv'):
+        return jsonify({"msg": "format must be ndjson or csv"}), 400
     
     try:
-        model = load_model(model_filename)
-        # Use sep=None to auto-detect separator
-        df = pd.read_csv(file, sep=None, engine='python')
+        with metrics.span('model_load', model_id=model_id):
+            model = model_cache.get(model_id, model_filename)
+        if stream:
+            return _stream_batch(model, file, output_format, model_id)
+        
+        # Separator auto-detected (e.g. ; vs ,)
+        with metrics.span('batch_parse'):
+            df, _ = read_raw(file.stream)
         
         # Predict
         # Ensure columns match. Pipeline handles it usually if names match.
-        predictions = model.predict(df)
-        probabilities = model.predict_proba(df).max(axis=1) if hasattr(model, 'predict_proba') else [0]*len(df)
+        with metrics.span('batch_predict', model_id=model_id):
+            predictions, probabilities = predict_with_proba(model, df)
         
         df['prediction'] = predictions
         df['probability'] = probabilities
@@ -91,9 +139,84 @@ def batch_predict():
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
 
+def _stream_batch(model, file, output_format, model_id):
+    """
+    Scores the upload chunk by chunk and streams the rows back as NDJSON or CSV,
+    so memory stays bounded by BATCH_CHUNK_ROWS and the first rows are sent
+    before the last ones are scored.
+    """
+    reader = pd.read_csv(file.stream, sep=sniff_buffer_delimiter(file.stream), chunksize=Config.BATCH_CHUNK_ROWS)
+
+    def score(chunk):
+        with metrics.span('batch_predict', model_id=model_id):
+            predictions, probabilities = predict_with_proba(model, chunk)
+        chunk['prediction'] = predictions
+        chunk['probability'] = probabilities
+        return chunk
+
+    def render(chunk, first):
+        if output_format == 'csv':
+            return chunk.to_csv(index=False, header=first)
+        lines = chunk.to_json(orient='records', lines=True, double_precision=15)
+        return lines if lines.endswith('\n') else lines + '\n'
+
+    # Score the first chunk up front so bad input still gets a proper error status
+    first_chunk = next(reader, None)
+    if first_chunk is None:
+        return jsonify({"msg": "Empty file"}), 400
+    first_output = render(score(first_chunk), True)
+
+    def generate():
+        yield first_output
+        try:
+            for chunk in reader:
+                yield render(score(chunk), False)
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            if output_format == 'ndjson':
+                yield json.dumps({"error": str(e)}) + '\n'
+            print(f"Batch prediction stream failed: {e}")
+
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+# Any of these switches /history from the full list to a page
+HISTORY_PAGE_PARAMS = ('limit', 'cursor', 'model_id', 'start', 'end', 'prediction')
+
+def _parse_time(value):
+    parsed = datetime.fromisoformat(value)
+    # Stored timestamps are naive local time
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+def _history_filters(args):
+    """Filters from query args; raises ValueError on malformed values."""
+    return {
+        'model_id': args.get('model_id') or None,
+        'start': _parse_time(args['start']) if args.get('start') else None,
+        'end': _parse_time(args['end']) if args.get('end') else None,
+        'prediction': int(args['prediction']) if args.get('prediction') else None
+    }
+
 @predict_bp.route('/history', methods=['GET'])
 def history():
-    df = read_csv(PREDICTIONS_CSV)
+    if any(param in request.args for param in HISTORY_PAGE_PARAMS):
+        try:
+            filters = _history_filters(request.args)
+            limit = int(request.args.get('limit', Config.HISTORY_PAGE_SIZE))
+            cursor = request.args.get('cursor')
+            before = int(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"msg": f"Invalid history query: {e}"}), 400
+        limit = max(1, min(limit, Config.HISTORY_MAX_PAGE_SIZE))
+        with metrics.span('history_page'):
+            rows, next_cursor = read_page(_predictions_csv(), filters, before, limit)
+        return jsonify({
+            'items': rows,
+            'next_cursor': str(next_cursor) if next_cursor is not None else None
+        }), 200
+
+    with metrics.span('history_read'):
+        df = read_csv(_predictions_csv())
     if df.empty:
         return jsonify([]), 200
     
@@ -102,6 +225,15 @@ def history():
     
     return jsonify(df.to_dict(orient='records')), 200
 
+@predict_bp.route('/history/summary', methods=['GET'])
+def history_summary():
+    try:
+        filters = _history_filters(request.args)
+    except ValueError as e:
+        return jsonify({"msg": f"Invalid history query: {e}"}), 400
+    with metrics.span('history_summary'):
+        return jsonify(daily_counts(_predictions_csv(), filters)), 200
+
 @predict_bp.route('/feedback', methods=['POST'])
 def feedback():
     data = request.get_json()
@@ -111,24 +243,20 @@ def feedback():
     
     if not timestamp or not model_id or actual_result is None:
         return jsonify({"msg": "Missing data"}), 400
-        
-    # We need to find the row in predictions.csv and update it
-    # Since we don't have a unique ID for predictions other than timestamp+model_id (which might not be unique enough if high traffic)
-    # But for this project, timestamp is likely unique enough or we just append to a feedback.csv
-    
-    # Let's append to feedback.csv for simplicity and robustness
-    FEEDBACK_CSV = os.path.join(Config.DATA_FOLDER, 'feedback.csv')
-    init_csv(FEEDBACK_CSV, ['timestamp', 'model_id', 'actual_result', 'feedback_time'])
-    
-    feedback_entry = {
-        'timestamp': timestamp,
-        'model_id': model_id,
-        'actual_result': actual_result,
-        'feedback_time': datetime.now().isoformat()
-    }
-    
     try:
-        append_row(feedback_entry, FEEDBACK_CSV)
-        return jsonify({"msg": "Feedback received"}), 200
+        actual_result = int(actual_result)
+    except (TypeError, ValueError):
+        return jsonify({"msg": "actual_result must be 0 or 1"}), 400
+    # Checked before the span label and feedback.csv, which would otherwise
+    # grow a series and a monitoring entry per made-up id
+    if model_registry.get(model_id) is None:
+        return jsonify({"msg": "Model not found"}), 404
+
+    # Appended to feedback.csv together with the prediction it refers to,
+    # found through the history index, and counted towards live accuracy
+    try:
+        with metrics.span('feedback', model_id=model_id):
+            match = model_monitor.record(timestamp, model_id, actual_result)
+        return jsonify({"msg": "Feedback received", "matched": match is not None}), 200
     except Exception as e:
         return jsonify({"msg": str(e)}), 500
@@ -0,0 +1,67 @@
+from flask import Blueprint, request, jsonify, send_from_directory, g
+from flask_jwt_extended import jwt_required, verify_jwt_in_request, get_jwt_identity
+from werkzeug.utils import secure_filename
+from config import Config
+from utils.profiler import SamplingProfiler, save_profile, list_profiles, PROFILE_SUFFIX
+
+profiling_bp = Blueprint('profiling', __name__)
+
+def _profile_requested():
+    flag = request.headers.get('X-Profile') or request.args.get('profile')
+    return flag is not None and flag.lower() in ('1', 'true', 'yes')
+
+def _allowed(username):
+    allowed = [u.strip() for u in Config.REQUEST_PROFILING_USERS.split(',') if u.strip()]
+    return not allowed or username in allowed
+
+@profiling_bp.before_app_request
+def _start_profile():
+    if not Config.REQUEST_PROFILING_ENABLED or not _profile_requested():
+        return None
+    try:
+        verify_jwt_in_request()
+    except Exception:
+        return jsonify({"msg": "Profiling requires a valid access token"}), 401
+    if not _allowed(get_jwt_identity()):
+        return jsonify({"msg": "Not allowed to profile requests"}), 403
+    g.profiler = SamplingProfiler().start()
+    return None
+
+@profiling_bp.after_app_request
+def _finish_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        # Streamed bodies are produced after this point and aren't included
+        profiler.stop()
+        try:
+            response.headers['X-Profile-Id'] = save_profile(profiler, request.method, request.path)
+        except OSError as e:
+            print(f"Could not save request profile: {e}")
+    return response
+
+def _denied():
+    # Saved profiles are readable by the same users who may record them
+    if not Config.REQUEST_PROFILING_ENABLED:
+        return jsonify({"msg": "Request profiling is disabled"}), 404
+    if not _allowed(get_jwt_identity()):
+        return jsonify({"msg": "Not allowed to read profiles"}), 403
+    return None
+
+@profiling_bp.route('', methods=['GET'])
+@jwt_required()
+def profiles():
+    denied = _denied()
+    if denied is not None:
+        return denied
+    return jsonify(list_profiles()), 200
+
+@profiling_bp.route('/<name>', methods=['GET'])
+@jwt_required()
+def download_profile(name):
+    denied = _denied()
+    if denied is not None:
+        return denied
+    name = secure_filename(name)
+    if not name.endswith(PROFILE_SUFFIX):
+        return jsonify({"msg": "Profile not found"}), 404
+    return send_from_directory(Config.REQUEST_PROFILES_FOLDER, name, mimetype='text/plain', as_attachment=True)
@@ -1,8 +1,47 @@
 import unittest
 import json
 import os
+import io
+import tempfile
+import numpy as np
+import joblib
+from unittest import mock
 from app import app
 from config import Config
+from utils.model_cache import ModelCache
+from utils import model_registry as model_registry_module
+from utils.model_registry import ModelRegistry
+from utils import csv_utils
+from utils.csv_utils import append_row, read_csv, init_csv, compact_csv, migrate_storage, read_page, daily_counts, find_prediction
+from utils.history_index import HistoryIndex
+from utils import monitoring as monitoring_module
+from utils.monitoring import ModelMonitor
+from utils.sqlite_storage import SQLiteBackend, table_name
+from utils.user_store import UserStore, hash_password, check_password
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from utils import dataset_cache
+from utils.dataset_cache import load_dataset, prune_cache, HASH_INDEX
+from utils.profiling import get_profile, compute_profile, PROFILE_FILE
+from utils.streaming_profile import stream_profile
+from utils.ml_utils import get_model_instance, predict_with_proba, predict_single, search_model, sweep_models, train_model, update_model, delta_filename, uses_large_svm
+from utils.preprocessing import get_preprocessor, prepare_data
+from utils.jobs import TrainingJobs
+from utils.compiled_scorer import compile_pipeline, scorer_filename
+from utils.micro_batch import MicroBatcher
+from utils.result_cache import ResultCache, result_cache
+from benchmarks.synthetic import generate_students
+from utils.metrics import Metrics, metrics
+from benchmarks.suite import compare, bench_svm, isolated_folders
+from utils.profiler import SamplingProfiler
+from flask_jwt_extended import create_access_token
+import time
+import sys
+from datetime import datetime, timedelta
+import subprocess
+import warnings
+from threading import Thread
+from sklearn.pipeline import Pipeline
 
 class BasicTests(unittest.TestCase):
 
@@ -39,5 +78,1022 @@ class BasicTests(unittest.TestCase):
         data = json.loads(response.data)
         self.assertTrue('access_token' in data)
 
+class ModelCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for name in ['a', 'b', 'c']:
+            joblib.dump({'name': name}, os.path.join(self.tmpdir.name, f'{name}.joblib'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_hits_misses_and_lru_eviction(self):
+        cache = ModelCache(max_entries=2, max_bytes=10**6, models_folder=self.tmpdir.name)
+        self.assertEqual(cache.get('a', 'a.joblib')['name'], 'a')
+        cache.get('a', 'a.joblib')
+        cache.get('b', 'b.joblib')
+        cache.get('c', 'c.joblib')  # evicts 'a', the least recently used
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 3, 1))
+        self.assertEqual(stats['models'], ['b', 'c'])
+
+    def test_rewritten_file_and_invalidate(self):
+        cache = ModelCache(max_entries=4, max_bytes=10**6, models_folder=self.tmpdir.name)
+        first = cache.get('a', 'a.joblib')
+        path = os.path.join(self.tmpdir.name, 'a.joblib')
+        joblib.dump({'name': 'a2', 'pad': 'x' * 100}, path)
+        self.assertEqual(cache.get('a', 'a.joblib')['name'], 'a2')
+        self.assertIsNot(cache.get('a', 'a.joblib'), first)
+        cache.invalidate('a')
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_preload_recent_models_memory_mapped(self):
+        pipeline, _ = _fit_pipeline('Logistic Regression')
+        records = []
+        for i, name in enumerate(['old', 'mid', 'new']):
+            joblib.dump(pipeline, os.path.join(self.tmpdir.name, f'{name}.joblib'))
+            records.append({'model_id': name, 'filepath': f'{name}.joblib', 'timestamp': f'2024-01-0{i + 1}T00:00:00'})
+        cache = ModelCache(max_entries=4, max_bytes=10**7, models_folder=self.tmpdir.name)
+        with mock.patch.object(Config, 'MODEL_MMAP', True):
+            self.assertEqual(cache.preload(records, 2), ['mid', 'new'])
+        model, scorer = cache.get_with_scorer('new', 'new.joblib')
+        self.assertIsInstance(model.named_steps['classifier'].coef_, np.memmap)
+        self.assertIsNotNone(scorer)
+        self.assertEqual(cache.stats()['models'], ['mid', 'new'])
+
+class ModelRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'models.csv')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _record(self, model_id):
+        return {'model_id': model_id, 'algorithm': 'Naive Bayes', 'hyperparams': '{}',
+                'metrics': json.dumps({'accuracy': 0.5}), 'filepath': f'{model_id}.joblib',
+                'timestamp': '2025-01-01T00:00:00', 'rules': None, 'feature_importance': '{}'}
+
+    def test_add_get_remove(self):
+        registry = ModelRegistry(self.path)
+        registry.add(self._record('m1'))
+        registry.add(self._record('m2'))
+        self.assertEqual(registry.get('m1')['metrics'], {'accuracy': 0.5})
+        self.assertEqual([m['model_id'] for m in registry.list()], ['m1', 'm2'])
+        self.assertEqual(registry.remove('m1')['model_id'], 'm1')
+        self.assertIsNone(registry.get('m1'))
+        self.assertEqual([m['model_id'] for m in ModelRegistry(self.path).list()], ['m2'])
+
+    def test_reloads_on_external_write(self):
+        registry = ModelRegistry(self.path)
+        self.assertEqual(registry.list(), [])
+        append_row(self._record('m3'), self.path)  # e.g. another worker
+        self.assertIsNotNone(registry.get('m3'))
+
+    def _with_concurrent_add(self, name, model_id, others):
+        """Patches utils.model_registry.<name> so another worker adds model_id while it runs."""
+        real = getattr(model_registry_module, name)
+        def racing(*args, **kwargs):
+            if others:  # the other worker's own call
+                return real(*args, **kwargs)
+            other = Thread(target=ModelRegistry(self.path).add, args=(self._record(model_id),))
+            others.append(other)
+            other.start()
+            other.join(timeout=0.2)  # stays blocked on the file lock if the caller holds it
+            return real(*args, **kwargs)
+        return mock.patch.object(model_registry_module, name, side_effect=racing)
+
+    def test_concurrent_add_is_indexed(self):
+        registry, others = ModelRegistry(self.path), []
+        registry.add(self._record('m1'))
+        registry.list()  # in sync, so add() indexes its row instead of reloading
+        with self._with_concurrent_add('append_row', 'm3', others):
+            registry.add(self._record('m2'))
+        others[0].join()
+        self.assertEqual(sorted(m['model_id'] for m in registry.list()), ['m1', 'm2', 'm3'])
+
+    def test_remove_keeps_concurrent_add(self):
+        registry, others = ModelRegistry(self.path), []
+        registry.add(self._record('m1'))
+        registry.add(self._record('m2'))
+        with self._with_concurrent_add('write_csv', 'm3', others):
+            registry.remove('m1')
+        others[0].join()
+        self.assertEqual(sorted(m['model_id'] for m in ModelRegistry(self.path).list()), ['m2', 'm3'])
+
+    def test_remove_hands_cache_key_to_older_model(self):
+        registry = ModelRegistry(self.path)
+        registry.add(dict(self._record('m1'), cache_key='k'))
+        registry.add(dict(self._record('m2'), cache_key='k'))
+        self.assertEqual(registry.find_cached('k')['model_id'], 'm2')
+        registry.remove('m2')
+        self.assertEqual(registry.find_cached('k')['model_id'], 'm1')
+        registry.remove('m1')
+        self.assertIsNone(registry.find_cached('k'))
+
+class CsvJournalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'predictions.csv')
+        init_csv(self.path, ['timestamp', 'model_id', 'prediction'])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_append_does_not_rewrite_base(self):
+        size = os.path.getsize(self.path)
+        for i in range(3):
+            append_row({'timestamp': str(i), 'model_id': 'm', 'prediction': i}, self.path)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(read_csv(self.path)['prediction'].tolist(), [0, 1, 2])
+
+    def test_init_keeps_journaled_rows(self):
+        path = os.path.join(self.tmpdir.name, 'feedback.csv')
+        append_row({'timestamp': '0', 'model_id': 'm', 'prediction': 1}, path)
+        init_csv(path, ['timestamp', 'model_id', 'prediction'])
+        self.assertEqual(read_csv(path)['prediction'].tolist(), [1])
+
+    def test_compaction_and_torn_write(self):
+        for i in range(3):
+            append_row({'timestamp': str(i), 'model_id': 'm', 'prediction': i}, self.path)
+        with open(self.path + csv_utils.JOURNAL_SUFFIX, 'ab') as f:
+            f.write(b'{"timestamp": "3", "mod')  # crash mid-append
+        self.assertEqual(len(read_csv(self.path)), 3)
+        self.assertTrue(compact_csv(self.path))
+        self.assertFalse(os.path.exists(self.path + csv_utils.JOURNAL_SUFFIX + '.mark'))
+        append_row({'timestamp': '4', 'model_id': 'm', 'prediction': 4}, self.path)
+        self.assertEqual(read_csv(self.path)['prediction'].tolist(), [0, 1, 2, 4])
+
+    def test_recovers_swap_interrupted_before_trim(self):
+        for i in range(2):
+            append_row({'timestamp': str(i), 'model_id': 'm', 'prediction': i}, self.path)
+        merged = read_csv(self.path)
+        journal = self.path + csv_utils.JOURNAL_SUFFIX
+        # Simulate a crash right after the new base was renamed into place
+        temp = self.path + '.crash.tmp'
+        merged.to_csv(temp, index=False)
+        mark = {'base_inode': os.stat(temp).st_ino, 'journal_inode': os.stat(journal).st_ino,
+                'offset': os.path.getsize(journal)}
+        with open(self.path + csv_utils.MARK_SUFFIX, 'w') as f:
+            json.dump(mark, f)
+        os.replace(temp, self.path)
+        self.assertEqual(read_csv(self.path)['prediction'].tolist(), [0, 1])
+        self.assertFalse(os.path.exists(journal))
+
+class HistoryPageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'predictions.csv')
+        init_csv(self.path, ['timestamp', 'model_id', 'input_data', 'prediction', 'probability'])
+        self.rows = []
+        for i in range(40):
+            row = {'timestamp': f'2024-03-0{1 + i // 15}T10:{i:02d}:00.5', 'model_id': f'm{i % 2}',
+                   'input_data': str({'school': 'GP', 'note': 'a, "quoted"\nvalue', 'i': i}),
+                   'prediction': i % 3 % 2, 'probability': 0.5 + i / 100}
+            self.rows.append(row)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _pages(self, page, filters, limit=7):
+        rows, cursor = page(filters, None, limit)
+        while cursor is not None:
+            more, cursor = page(filters, cursor, limit)
+            rows += more
+        return rows
+
+    def _expected(self, filters):
+        rows = [r for r in reversed(self.rows)
+                if filters.get('model_id') in (None, r['model_id'])
+                and filters.get('prediction') in (None, r['prediction'])
+                and (filters.get('start') is None or r['timestamp'] >= filters['start'].isoformat())]
+        return [(r['timestamp'], r['model_id'], r['input_data'], r['prediction']) for r in rows]
+
+    def _check(self, page):
+        for filters in ({}, {'model_id': 'm1'}, {'prediction': 1, 'start': datetime(2024, 3, 2)}, {'model_id': 'x'}):
+            rows = self._pages(page, filters)
+            got = [(r['timestamp'], r['model_id'], r['input_data'], r['prediction']) for r in rows]
+            self.assertEqual(got, self._expected(filters), filters)
+
+    def test_csv_pages_across_compaction_and_sidecar(self):
+        page = lambda filters, before, limit: read_page(self.path, filters, before, limit)
+        for row in self.rows[:25]:
+            append_row(row, self.path)
+        compact_csv(self.path)
+        for row in self.rows[25:]:
+            append_row(row, self.path)
+        self._check(page)
+        first, cursor = page({}, None, 10)
+        compact_csv(self.path)  # row numbers survive compaction
+        rest, _ = page({}, cursor, 100)
+        self.assertEqual(len(first + rest), 40)
+        self.assertEqual(rest[0]['timestamp'], self.rows[29]['timestamp'])
+        self._check(page)
+        # A fresh process reuses the saved index instead of rescanning the base
+        fresh = HistoryIndex(self.path)
+        with mock.patch.object(HistoryIndex, '_scan_base', side_effect=AssertionError('rescanned')):
+            self.assertEqual(len(fresh.page({}, None, 100)[0]), 40)
+
+    def test_sqlite_matches_csv(self):
+        backend = SQLiteBackend(os.path.join(self.tmpdir.name, 'storage.db'))
+        backend.init(self.path, list(self.rows[0]))
+        for row in self.rows:
+            backend.append(row, self.path)
+            append_row(row, self.path)
+        self._check(lambda filters, before, limit: backend.page(self.path, filters, before, limit))
+        filters = {'end': datetime(2024, 3, 3)}
+        self.assertEqual(backend.daily_counts(self.path, filters), daily_counts(self.path, filters))
+        summary = daily_counts(self.path)
+        self.assertEqual([(r['day'], r['model_id'], r['count']) for r in summary[:2]],
+                         [('2024-03-01', 'm0', 8), ('2024-03-01', 'm1', 7)])
+        self.assertEqual(sum(r['passed'] for r in summary), sum(r['prediction'] for r in self.rows))
+        row = self.rows[7]
+        self.assertEqual(backend.find_prediction(self.path, 'm1', row['timestamp']), (row['prediction'], row['probability']))
+        self.assertEqual(find_prediction(self.path, 'm1', row['timestamp']), (row['prediction'], row['probability']))
+        self.assertIsNone(find_prediction(self.path, 'm0', row['timestamp']))
+
+    def test_history_routes(self):
+        for row in self.rows:
+            append_row(row, self.path)
+        client = app.test_client()
+        with mock.patch('routes.predict.PREDICTIONS_CSV', self.path):
+            self.assertEqual(len(client.get('/api/predict/history').get_json()), 40)
+            page = client.get('/api/predict/history?model_id=m0&limit=15').get_json()
+            self.assertEqual(len(page['items']), 15)
+            rest = client.get(f"/api/predict/history?model_id=m0&cursor={page['next_cursor']}").get_json()
+            self.assertEqual((len(rest['items']), rest['next_cursor']), (5, None))
+            summary = client.get('/api/predict/history/summary?start=2024-03-03').get_json()
+            self.assertEqual(sum(r['count'] for r in summary), 10)
+            self.assertEqual(client.get('/api/predict/history?start=yesterday').status_code, 400)
+
+class MonitoringTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.predictions = os.path.join(self.tmpdir.name, 'predictions.csv')
+        self.feedback = os.path.join(self.tmpdir.name, 'feedback.csv')
+        self.timestamps = [f'2024-03-01T10:00:{i:02d}.250000' for i in range(40)]
+        for i, ts in enumerate(self.timestamps):
+            append_row({'timestamp': ts, 'model_id': 'm', 'input_data': '{}', 'prediction': 1, 'probability': 0.95}, self.predictions)
+        self.monitor = ModelMonitor(self.feedback, self.predictions)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_counts_calibration_and_alerts(self):
+        for i, ts in enumerate(self.timestamps):
+            self.assertEqual(self.monitor.record(ts, 'm', i % 2), (1, 0.95))
+        self.assertIsNone(self.monitor.record('2024-03-01T11:00:00', 'm', 1))
+        report = self.monitor.report('m', baseline=0.8)
+        self.assertEqual(report['total']['confusion'], {'tp': 20, 'fp': 20, 'tn': 0, 'fn': 0})
+        self.assertEqual((report['total']['accuracy'], report['unmatched']), (0.5, 1))
+        self.assertEqual(report['calibration'][9]['n'], 40)
+        self.assertEqual(report['calibration'][9]['accuracy'], 0.5)
+        self.assertEqual(report['windows']['1h']['n'], 40)
+        self.assertEqual({(a['type'], a['window']) for a in report['alerts']},
+                         {(kind, window) for kind in ('accuracy_drop', 'overconfident') for window in ('1h', '24h', '168h')})
+        self.assertIsNone(self.monitor.report('other'))
+
+    def test_rebuilds_from_feedback_written_elsewhere(self):
+        self.monitor.record(self.timestamps[0], 'm', 1)
+        # Older rows without the matched prediction, two days old
+        old = (datetime.now() - timedelta(days=2)).isoformat()
+        for ts in self.timestamps[1:4]:
+            append_row({'timestamp': ts, 'model_id': 'm', 'actual_result': 0, 'feedback_time': old}, self.feedback)
+        for monitor in (self.monitor, ModelMonitor(self.feedback, self.predictions)):
+            report = monitor.report('m')
+            self.assertEqual(report['total']['confusion'], {'tp': 1, 'fp': 3, 'tn': 0, 'fn': 0})
+            self.assertEqual((report['windows']['24h']['n'], report['windows']['168h']['n']), (1, 4))
+            self.assertEqual(report['alerts'], [])  # below MONITOR_MIN_SAMPLES
+
+    def test_concurrent_record_is_counted(self):
+        self.monitor.record(self.timestamps[0], 'm', 1)
+        self.monitor.model_ids()  # in sync, so record() counts its row instead of rebuilding
+        others, real = [], monitoring_module.append_row
+        def racing(*args, **kwargs):
+            if others:  # the other worker's own call
+                return real(*args, **kwargs)
+            other = Thread(target=ModelMonitor(self.feedback, self.predictions).record, args=(self.timestamps[1], 'm', 0))
+            others.append(other)
+            other.start()
+            other.join(timeout=0.2)  # stays blocked on the file lock if the caller holds it
+            return real(*args, **kwargs)
+        with mock.patch.object(monitoring_module, 'append_row', side_effect=racing):
+            self.monitor.record(self.timestamps[2], 'm', 1)
+        others[0].join()
+        self.assertEqual(self.monitor.report('m')['total']['confusion'], {'tp': 2, 'fp': 1, 'tn': 0, 'fn': 0})
+
+    def test_feedback_and_monitoring_routes(self):
+        client = app.test_client()
+        registry = ModelRegistry(os.path.join(self.tmpdir.name, 'models.csv'))
+        registry.add({'model_id': 'm', 'algorithm': 'SVM', 'metrics': '{}'})
+        with mock.patch('routes.predict.model_monitor', self.monitor), \
+                mock.patch('routes.predict.model_registry', registry), \
+                mock.patch('routes.monitoring.model_monitor', self.monitor):
+            response = client.post('/api/predict/feedback', json={'timestamp': self.timestamps[0], 'model_id': 'm', 'actual_result': 0})
+            self.assertEqual(response.get_json()['matched'], True)
+            response = client.post('/api/predict/feedback', json={'timestamp': self.timestamps[1], 'model_id': 'made-up', 'actual_result': 0})
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(self.monitor.model_ids(), ['m'])
+            self.assertEqual(client.post('/api/predict/feedback', json={'timestamp': 'x', 'model_id': 'm', 'actual_result': 'no'}).status_code, 400)
+            report = client.get('/api/monitoring/m').get_json()
+            self.assertEqual(report['total']['confusion']['fp'], 1)
+            self.assertEqual([r['model_id'] for r in client.get('/api/monitoring').get_json()], ['m'])
+            self.assertEqual(client.get('/api/monitoring/alerts').get_json(), [])
+            self.assertEqual(client.get('/api/monitoring/unknown').status_code, 404)
+
+class SQLiteBackendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.backend = SQLiteBackend(os.path.join(self.tmpdir.name, 'storage.db'))
+        self.path = os.path.join(self.tmpdir.name, 'users.csv')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_append_write_and_signature(self):
+        self.backend.init(self.path, ['username', 'password'])
+        self.assertTrue(self.backend.read(self.path).empty)
+        self.backend.append({'username': 'a', 'password': 'x'}, self.path)
+        version = self.backend.signature(self.path)
+        self.backend.append({'username': 'b', 'password': 'y'}, self.path)
+        self.assertNotEqual(self.backend.signature(self.path), version)
+        df = self.backend.read(self.path)
+        self.assertEqual(df['username'].tolist(), ['a', 'b'])
+        self.backend.write(df[df['username'] == 'b'], self.path)
+        self.assertEqual(self.backend.read(self.path)['username'].tolist(), ['b'])
+        self.assertEqual(self.backend.list_files(self.tmpdir.name), [self.path])
+
+    def test_stores_use_keyed_lookups(self):
+        with mock.patch.object(Config, 'STORAGE_BACKEND', 'sqlite'), mock.patch.dict(csv_utils._backends, {'sqlite': self.backend}):
+            self.assertTrue(UserStore(self.path).create('alice', 'h1'))
+            registry_path = os.path.join(self.tmpdir.name, 'models.csv')
+            ModelRegistry(registry_path).add({'model_id': 'm1', 'algorithm': 'SVM', 'metrics': '{"accuracy": 0.9}'})
+            with mock.patch('utils.user_store.read_csv', side_effect=AssertionError('full read')), \
+                    mock.patch('utils.model_registry.read_csv', side_effect=AssertionError('full read')):
+                other = UserStore(self.path)
+                self.assertEqual(other.get_hash('alice'), 'h1')
+                self.assertIsNone(other.get_hash('bob'))
+                self.assertFalse(other.create('alice', 'h2'))
+                self.assertEqual(ModelRegistry(registry_path).get('m1')['metrics'], {'accuracy': 0.9})
+            table = table_name(self.path, self.backend.data_folder)
+            plan = self.backend._connect().execute(f'EXPLAIN QUERY PLAN SELECT * FROM "{table}" WHERE username = ?', ('alice',)).fetchall()
+            self.assertIn(f'idx_{table}_username', str(plan))
+
+    def test_migrate_skips_headerless_files(self):
+        open(os.path.join(self.tmpdir.name, 'empty.csv'), 'w').close()
+        init_csv(self.path, ['username', 'password'])
+        append_row({'username': 'a', 'password': 'x'}, self.path)
+        self.backend.write(pd.DataFrame(), self.path)  # no-op: no columns and no table
+        self.assertTrue(self.backend.read(self.path).empty)
+        with mock.patch.dict(csv_utils._backends, {'sqlite': self.backend}):
+            self.assertEqual(migrate_storage('csv', 'sqlite', self.tmpdir.name), [self.path])
+        self.assertEqual(self.backend.read(self.path)['username'].tolist(), ['a'])
+
+    def test_tables_are_keyed_by_folder(self):
+        backend = SQLiteBackend(os.path.join(self.tmpdir.name, 'storage.db'), data_folder=self.tmpdir.name)
+        other = os.path.join(self.tmpdir.name, 'other', 'users.csv')
+        self.assertEqual(table_name(self.path, self.tmpdir.name), 'users')
+        self.assertEqual(table_name(os.path.join(Config.DATA_FOLDER, 'models.csv'), Config.DATA_FOLDER), 'models')
+        self.assertNotEqual(table_name(os.path.join(Config.MODELS_FOLDER, 'models.csv'), Config.DATA_FOLDER), 'models')
+        backend.append({'username': 'a', 'password': 'x'}, self.path)
+        backend.append({'username': 'b', 'password': 'y'}, other)
+        self.assertEqual(backend.read(self.path)['username'].tolist(), ['a'])
+        self.assertEqual(backend.read(other)['username'].tolist(), ['b'])
+        self.assertEqual(backend.list_files(self.tmpdir.name), [self.path])
+
+class UserStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'users.csv')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_concurrent_registration_is_unique(self):
+        store = UserStore(self.path)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: store.create('alice', f'hash{i}'), range(8)))
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(len(read_csv(self.path)), 1)
+        self.assertTrue(UserStore(self.path).exists('alice'))
+
+    def test_create_with_group_commit(self):
+        store, results = UserStore(self.path), []
+        with mock.patch.object(Config, 'CSV_GROUP_COMMIT_MS', 5):
+            # Registration appends while holding the file lock; it must not wait on the committer
+            worker = Thread(target=lambda: results.extend([store.create('bob', 'h1'), store.create('bob', 'h2')]), daemon=True)
+            worker.start()
+            worker.join(timeout=10)
+            self.assertFalse(worker.is_alive(), "registration deadlocked")
+            append_row({'username': 'carol', 'password': 'h3'}, self.path)  # still goes through the committer
+        self.assertEqual(results, [True, False])
+        reloaded = UserStore(self.path)
+        self.assertTrue(reloaded.exists('bob') and reloaded.exists('carol'))
+
+    def test_hash_and_check(self):
+        rounds, Config.BCRYPT_ROUNDS = Config.BCRYPT_ROUNDS, 4
+        try:
+            hashed = hash_password('secret')
+        finally:
+            Config.BCRYPT_ROUNDS = rounds
+        self.assertTrue(check_password('secret', hashed))
+        self.assertFalse(check_password('wrong', hashed))
+
+class DatasetCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_folder, Config.DATASET_CACHE_FOLDER = Config.DATASET_CACHE_FOLDER, os.path.join(self.tmpdir.name, '.cache')
+
+    def tearDown(self):
+        Config.DATASET_CACHE_FOLDER = self.cache_folder
+        self.tmpdir.cleanup()
+
+    def test_cached_load_matches_python_parser(self):
+        path = os.path.join(self.tmpdir.name, 'students.csv')
+        with open(path, 'w') as f:
+            f.write('school;age;Mjob;G3\nGP;15;teacher;12\nMS;17;;8\nGP;16;health;\n')
+        expected = pd.read_csv(path, sep=None, engine='python')
+        pd.testing.assert_frame_equal(load_dataset(path), expected)
+        self.assertEqual(len([e for e in os.listdir(Config.DATASET_CACHE_FOLDER) if e != HASH_INDEX]), 1)
+        pd.testing.assert_frame_equal(load_dataset(path), expected)  # served from the cache
+
+    def test_prune_reuses_saved_hashes(self):
+        uploads, Config.UPLOAD_FOLDER = Config.UPLOAD_FOLDER, self.tmpdir.name
+        try:
+            for name in ('a.csv', 'b.csv'):
+                with open(os.path.join(self.tmpdir.name, name), 'w') as f:
+                    f.write(f'x;G3\n{name};1\n')
+                load_dataset(os.path.join(self.tmpdir.name, name))
+            os.makedirs(os.path.join(Config.DATASET_CACHE_FOLDER, 'stale'))
+            # A fresh worker: nothing memoized in memory, nothing may be re-read
+            with mock.patch.dict(dataset_cache._hashes, clear=True), mock.patch.object(dataset_cache, '_hashes_loaded', set()), \
+                    mock.patch('utils.dataset_cache.hashlib.sha256', side_effect=AssertionError('rehashed')):
+                prune_cache()
+            self.assertEqual(len([e for e in os.listdir(Config.DATASET_CACHE_FOLDER) if e != HASH_INDEX]), 2)
+        finally:
+            Config.UPLOAD_FOLDER = uploads
+
+class DatasetProfileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folders = Config.DATASET_CACHE_FOLDER, Config.UPLOAD_FOLDER
+        Config.DATASET_CACHE_FOLDER = os.path.join(self.tmpdir.name, '.cache')
+        Config.UPLOAD_FOLDER = self.tmpdir.name
+        df = pd.read_csv(os.path.join(self.folders[1], 'student-mat.csv'), sep=';')
+        df.head(50).to_csv(os.path.join(self.tmpdir.name, 'students.csv'), sep=';', index=False)
+        self.app = app.test_client()
+
+    def tearDown(self):
+        Config.DATASET_CACHE_FOLDER, Config.UPLOAD_FOLDER = self.folders
+        self.tmpdir.cleanup()
+
+    def test_endpoints_served_from_persisted_profile(self):
+        first = [self.app.get(f'/api/datasets/{ep}/students.csv').data
+                 for ep in ['preview', 'correlation', 'distributions']]
+        profile_dirs = [e for e in os.listdir(Config.DATASET_CACHE_FOLDER) if e != HASH_INDEX]
+        self.assertTrue(os.path.exists(os.path.join(Config.DATASET_CACHE_FOLDER, profile_dirs[0], PROFILE_FILE)))
+        second = [self.app.get(f'/api/datasets/{ep}/students.csv').data
+                  for ep in ['preview', 'correlation', 'distributions']]
+        self.assertEqual(first, second)
+        distributions = json.loads(second[2])
+        self.assertEqual(sum(distributions['G3'].values()), 50)
+        self.assertEqual(json.loads(second[0])['stats']['rows'], 50)
+
+class StreamingProfileTests(unittest.TestCase):
+
+    def test_chunked_profile_matches_in_memory(self):
+        path = os.path.join(Config.UPLOAD_FOLDER, 'student-mat.csv')
+        expected = compute_profile(pd.read_csv(path, sep=';'))
+        streamed = stream_profile(path, chunk_rows=37)
+        self.assertEqual(streamed['preview'], expected['preview'])
+        self.assertEqual(streamed['stats']['rows'], expected['stats']['rows'])
+        for col, stats in expected['stats']['description'].items():
+            for name, value in stats.items():
+                self.assertAlmostEqual(streamed['stats']['description'][col][name], value, places=9)
+        self.assertEqual(streamed['correlation'], expected['correlation'])
+        self.assertEqual(dict(map(tuple, streamed['stats']['class_distribution'])),
+                         dict(map(tuple, expected['stats']['class_distribution'])))
+        for col, pairs in expected['distributions'].items():
+            self.assertEqual(dict(map(tuple, streamed['distributions'][col])), dict(map(tuple, pairs)))
+
+def _fit_pipeline(algorithm='Decision Tree', hyperparams=None, rows=None):
+    df = pd.read_csv(os.path.join(Config.UPLOAD_FOLDER, 'student-mat.csv'), sep=';')
+    if rows:
+        df = df.head(rows)
+    X, y = prepare_data(df)
+    pipeline = Pipeline(steps=[('preprocessor', get_preprocessor(X)),
+                               ('classifier', get_model_instance(algorithm, hyperparams or {}))])
+    return pipeline.fit(X, y), df
+
+class BatchPredictTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.pipeline, self.df = _fit_pipeline(hyperparams={'max_depth': 3})
+        record = {'model_id': 'm', 'filepath': 'm.joblib'}
+        self.patches = [mock.patch('routes.predict.model_registry.get', return_value=record),
+                        mock.patch('routes.predict.model_cache.get', return_value=self.pipeline)]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def _post(self, **form):
+        data = {'model_id': 'm', 'file': (open(os.path.join(Config.UPLOAD_FOLDER, 'student-mat.csv'), 'rb'), 'batch.csv')}
+        data.update(form)
+        return self.app.post('/api/predict/batch', data=data)
+
+    def test_streamed_results_match_buffered(self):
+        expected = self._post().get_json()
+        expected_predictions = [r['prediction'] for r in expected]
+        with mock.patch.object(Config, 'BATCH_CHUNK_ROWS', 50):
+            response = self._post(stream='true')
+            lines = [json.loads(l) for l in response.data.decode().splitlines()]
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            self.assertEqual(len(lines), len(expected))
+            for line, row in zip(lines, expected):
+                self.assertAlmostEqual(line.pop('probability'), row.pop('probability'), places=12)
+                self.assertEqual(line, row)
+            response = self._post(stream='true', format='csv')
+        streamed = pd.read_csv(io.StringIO(response.data.decode()))
+        self.assertEqual(streamed['prediction'].tolist(), expected_predictions)
+
+    def test_single_probability_pass_matches_predict(self):
+        X, _ = prepare_data(self.df)
+        predictions, probabilities = predict_with_proba(self.pipeline, X)
+        self.assertTrue((predictions == self.pipeline.predict(X)).all())
+        self.assertTrue(np.allclose(probabilities, self.pipeline.predict_proba(X).max(axis=1)))
+
+class CompiledScorerTests(unittest.TestCase):
+
+    def test_matches_pipeline(self):
+        for algorithm, hyperparams in [('Decision Tree', {'max_depth': 6}), ('Naive Bayes', {}), ('Logistic Regression', {})]:
+            pipeline, df = _fit_pipeline(algorithm, hyperparams)
+            scorer = compile_pipeline(pipeline)
+            X, _ = prepare_data(df)
+            X = X.copy()
+            X.loc[0, 'Mjob'] = np.nan      # imputed
+            X.loc[1, 'Fjob'] = 'astronaut'  # unseen category
+            X.loc[2, 'age'] = np.nan
+            predictions, probabilities = scorer.predict(X.to_dict(orient='records'))
+            expected, expected_proba = predict_with_proba(pipeline, X)
+            self.assertTrue((predictions == expected).all(), algorithm)
+            self.assertTrue(np.allclose(probabilities, expected_proba, rtol=0, atol=1e-12), algorithm)
+            record = X.iloc[5].to_dict()
+            self.assertEqual(predict_single(pipeline, record, scorer), predict_single(pipeline, record))
+
+    def test_unsupported_falls_back(self):
+        pipeline, df = _fit_pipeline('SVM', rows=100)
+        self.assertIsNone(compile_pipeline(pipeline))
+        pipeline, df = _fit_pipeline('Naive Bayes')
+        X, _ = prepare_data(df)
+        record = X.iloc[0].to_dict()
+        record['Mjob'] = None  # not handled by the scorer: served by the pipeline
+        self.assertEqual(predict_single(pipeline, record, compile_pipeline(pipeline)), predict_single(pipeline, record))
+
+class MicroBatchTests(unittest.TestCase):
+
+    def test_concurrent_requests_are_coalesced(self):
+        pipeline, df = _fit_pipeline('Logistic Regression')
+        X, _ = prepare_data(df)
+        records = X.head(40).to_dict(orient='records')
+        records[3] = dict(records[3], Mjob=None)  # scorer can't take it: the batch falls back per row
+        batcher = MicroBatcher(window_ms=50, max_rows=16)
+        for scorer in (compile_pipeline(pipeline), None):
+            with ThreadPoolExecutor(max_workers=40) as pool:
+                results = list(pool.map(lambda r: batcher.predict('m', pipeline, scorer, r), records))
+            for record, (prediction, probability) in zip(records, results):
+                expected = predict_single(pipeline, record)
+                self.assertEqual(prediction, expected[0])
+                self.assertAlmostEqual(probability, expected[1], places=12)
+        stats = batcher.stats()
+        self.assertEqual(stats['latency_ms']['count'], 80)
+        self.assertEqual(stats['batch_size']['sum'], 80)
+        self.assertLess(stats['batch_size']['count'], 80)
+
+    def test_incomplete_record_fails_like_predict_single(self):
+        pipeline, df = _fit_pipeline('Logistic Regression')
+        X, _ = prepare_data(df)
+        records = X.head(8).to_dict(orient='records')
+        incomplete = {k: v for k, v in records[0].items() if k != 'age'}
+        with self.assertRaises(KeyError):
+            predict_single(pipeline, incomplete)
+        batcher = MicroBatcher(window_ms=100, max_rows=16)
+        with ThreadPoolExecutor(max_workers=9) as pool:
+            futures = [pool.submit(batcher.predict, 'm', pipeline, None, r) for r in records + [incomplete]]
+            with self.assertRaises(KeyError):
+                futures[-1].result()
+            for future, record in zip(futures, records):
+                expected = predict_single(pipeline, record)
+                self.assertEqual(future.result()[0], expected[0])
+                self.assertAlmostEqual(future.result()[1], expected[1], places=12)
+
+class ResultCacheTests(unittest.TestCase):
+
+    def test_canonical_keys_ttl_and_lru(self):
+        cache = ResultCache(max_entries=2, ttl=60)
+        key = cache.key('m', 't', {'age': 15, 'sex': 'F'})
+        cache.put(key, (1, 0.9))
+        self.assertEqual(cache.get(cache.key('m', 't', {'sex': 'F', 'age': np.float64(15.0)})), (1, 0.9))
+        self.assertIsNone(cache.get(cache.key('m', 't', {'sex': 'F', 'age': 16})))
+        cache.put(cache.key('m', 't', {'age': 1}), (0, 0.5))
+        cache.put(cache.key('other', 't', {'age': 1}), (0, 0.5))
+        self.assertIsNone(cache.get(key))  # least recently used, evicted
+        cache.invalidate('other')
+        self.assertEqual(cache.stats()['entries'], 1)
+        with mock.patch('utils.result_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get(cache.key('m', 't', {'age': 1})))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['evictions'], stats['expirations']), (1, 1, 1))
+
+    def test_predict_route_serves_repeats_from_cache(self):
+        pipeline, df = _fit_pipeline('Naive Bayes')
+        X, _ = prepare_data(df)
+        input_data = X.iloc[0].to_dict()
+        record = {'model_id': 'm', 'filepath': 'm.joblib', 'timestamp': '2024-01-01T00:00:00'}
+        client = app.test_client()
+        result_cache.clear()
+        with mock.patch('routes.predict.model_registry.get', return_value=record), \
+                mock.patch('routes.predict.model_registry.list', return_value=[record]), \
+                mock.patch('routes.predict.model_cache.get_with_scorer', return_value=(pipeline, None)) as load:
+            first = client.post('/api/predict/', json={'model_id': 'm', 'input_data': input_data}).get_json()
+            shuffled = dict(reversed(list(input_data.items())))
+            second = client.post('/api/predict/', json={'model_id': 'm', 'input_data': shuffled}).get_json()
+            self.assertEqual(load.call_count, 1)
+            self.assertEqual((first['prediction'], first['probability']), (second['prediction'], second['probability']))
+            result_cache.invalidate('m')
+            client.post('/api/predict/', json={'model_id': 'm', 'input_data': input_data})
+            self.assertEqual(load.call_count, 2)
+
+class MetricsTests(unittest.TestCase):
+
+    def test_prometheus_output(self):
+        registry = Metrics(enabled=True)
+        with registry.span('model_load', model_id='m"1'):
+            pass
+        registry.inc('http_requests_total', route='/api/health', method='GET', status=200)
+        text = registry.render()
+        self.assertIn('# TYPE app_stage_seconds histogram', text)
+        self.assertIn('app_stage_seconds_bucket{model_id="m\\"1",stage="model_load",le="+Inf"} 1', text)
+        self.assertIn('app_stage_seconds_count{model_id="m\\"1",stage="model_load"} 1', text)
+        self.assertIn('http_requests_total{method="GET",route="/api/health",status="200"} 1', text)
+
+    def test_disabled_is_noop(self):
+        registry = Metrics(enabled=False)
+        with registry.span('predict', model_id='m'):
+            pass
+        registry.inc('http_requests_total')
+        registry.observe('http_request_duration_seconds', 1.0)
+        self.assertEqual(registry.render(), '')
+
+    def test_routes_are_counted(self):
+        client = app.test_client()
+        with mock.patch.object(metrics, 'enabled', True):
+            metrics.reset()
+            client.get('/api/health')
+            client.get('/api/datasets/preview/student-mat.csv')
+            text = client.get('/api/metrics').data.decode()
+        self.assertIn('http_requests_total{method="GET",route="/api/health",status="200"} 1', text)
+        self.assertIn('route="/api/datasets/preview/<filename>"', text)
+        self.assertIn('stage="profile_', text)  # read, or computed on a fresh checkout
+
+    def test_unknown_algorithm_is_rejected_before_spans(self):
+        client = app.test_client()
+        with mock.patch.object(metrics, 'enabled', True):
+            metrics.reset()
+            response = client.post('/api/models/train', json={'dataset': 'student-mat.csv', 'algorithm': 'made-up'})
+            self.assertEqual(response.status_code, 400)
+            self.assertNotIn('made-up', client.get('/api/metrics').data.decode())
+
+class RequestProfilingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        with app.app_context():
+            self.headers = {'Authorization': f"Bearer {create_access_token(identity='profiler_user')}"}
+        self.folder = tempfile.mkdtemp()
+        self.patch = mock.patch.multiple(Config, REQUEST_PROFILING_ENABLED=True, REQUEST_PROFILES_FOLDER=self.folder)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_sampler_collects_stacks(self):
+        def busy_wait():
+            end = time.perf_counter() + 0.05
+            while time.perf_counter() < end:
+                pass
+        profiler = SamplingProfiler(interval=1).start()
+        busy_wait()
+        profiler.stop()
+        self.assertTrue(any('busy_wait' in line for line in profiler.collapsed().splitlines()))
+
+    def test_profiled_request_is_saved_and_downloadable(self):
+        response = self.client.get('/api/health', headers=dict(self.headers, **{'X-Profile': '1'}))
+        self.assertEqual(response.status_code, 200)
+        name = response.headers['X-Profile-Id']
+        listed = self.client.get('/api/profiles', headers=self.headers).get_json()
+        self.assertEqual([p['name'] for p in listed], [name])
+        download = self.client.get(f'/api/profiles/{name}', headers=self.headers)
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('attachment', download.headers['Content-Disposition'])
+        with mock.patch.object(Config, 'REQUEST_PROFILING_USERS', 'someone_else'):
+            self.assertEqual(self.client.get('/api/profiles', headers=self.headers).status_code, 403)
+            self.assertEqual(self.client.get(f'/api/profiles/{name}', headers=self.headers).status_code, 403)
+        with mock.patch.object(Config, 'REQUEST_PROFILING_ENABLED', False):
+            self.assertEqual(self.client.get('/api/profiles', headers=self.headers).status_code, 404)
+            self.assertEqual(self.client.get(f'/api/profiles/{name}', headers=self.headers).status_code, 404)
+
+    def test_unprofiled_and_unauthenticated_requests(self):
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/health').headers)
+        self.assertEqual(self.client.get('/api/health?profile=1').status_code, 401)
+        with mock.patch.object(Config, 'REQUEST_PROFILING_USERS', 'someone_else'):
+            self.assertEqual(self.client.get('/api/health?profile=1', headers=self.headers).status_code, 403)
+        with mock.patch.object(Config, 'REQUEST_PROFILING_ENABLED', False):
+            self.assertNotIn('X-Profile-Id', self.client.get('/api/health?profile=1').headers)
+        self.assertEqual(os.listdir(self.folder), [])
+        self.assertEqual(self.client.get('/api/profiles/..%2Fconfig.py', headers=self.headers).status_code, 404)
+
+class StartupTests(unittest.TestCase):
+    # Cumulative `import app` time allowed by -X importtime; about 0.7s with
+    # lazy imports, 1.6s when scikit-learn and scipy load eagerly
+    IMPORT_BUDGET_SECONDS = 1.2
+    LAZY_MODULES = ('sklearn', 'scipy')
+
+    def test_import_time_budget(self):
+        backend = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                                cwd=backend, capture_output=True, text=True, check=True)
+        timings = {}
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, name = line.split('|')
+                if cumulative.strip().isdigit():
+                    timings[name.strip()] = int(cumulative) / 1e6
+        eager = [m for m in timings if m.split('.')[0] in self.LAZY_MODULES]
+        self.assertEqual(eager, [], 'imported at startup instead of on first use')
+        self.assertLess(timings['app'], self.IMPORT_BUDGET_SECONDS)
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_synthetic_data_follows_student_schema(self):
+        real = pd.read_csv(os.path.join(Config.UPLOAD_FOLDER, 'student-mat.csv'), sep=';')
+        fake = generate_students(500)
+        self.assertEqual(list(fake.columns), list(real.columns))
+        X, y = prepare_data(fake)
+        self.assertEqual(set(y), {0, 1})
+        pipeline = Pipeline(steps=[('preprocessor', get_preprocessor(X)), ('classifier', get_model_instance('Naive Bayes', {}))])
+        self.assertEqual(len(pipeline.fit(X, y).predict(X)), 500)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'results': {'a': {'p50_ms': 10.0}, 'b': {'p50_ms': 10.0}, 'c': {'p50_ms': 0.1}, 'd': {'p50_ms': 1.0}}}
+        current = {'results': {'a': {'p50_ms': 14.0}, 'b': {'p50_ms': 5.0}, 'c': {'p50_ms': 0.3}, 'e': {'p50_ms': 1.0}}}
+        status = {r['name']: r['status'] for r in compare(baseline, current, threshold=0.25)}
+        self.assertEqual(status, {'a': 'regression', 'b': 'improvement', 'c': 'ok', 'd': 'missing', 'e': 'new'})
+
+class HyperparameterSearchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.models_folder, Config.MODELS_FOLDER = Config.MODELS_FOLDER, self.tmpdir.name
+        self.dataset = os.path.join(Config.UPLOAD_FOLDER, 'student-mat.csv')
+
+    def tearDown(self):
+        Config.MODELS_FOLDER = self.models_folder
+        self.tmpdir.cleanup()
+
+    def test_grid_search_saves_only_winner(self):
+        search = {'params': {'max_depth': [2, 3, 5, None], 'min_samples_leaf': [1, 5]}, 'factor': 2}
+        result = search_model(self.dataset, 'Decision Tree', search)
+        leaderboard = json.loads(result['leaderboard'])
+        self.assertEqual(len(leaderboard), 8)
+        self.assertEqual(leaderboard[0]['params'], json.loads(result['hyperparams']))
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), [result['filepath'], scorer_filename(result['filepath'])])
+        model = joblib.load(os.path.join(self.tmpdir.name, result['filepath']))
+        self.assertEqual(model.named_steps['classifier'].max_depth, leaderboard[0]['params']['max_depth'])
+
+    def test_random_search_with_distributions(self):
+        search = {'method': 'random', 'params': {'C': {'distribution': 'loguniform', 'low': 0.01, 'high': 10}},
+                  'n_candidates': 6, 'random_state': 0}
+        result = search_model(self.dataset, 'Logistic Regression', search)
+        self.assertEqual(len(json.loads(result['leaderboard'])), 6)
+        self.assertIn('accuracy', json.loads(result['metrics']))
+
+    def test_failed_candidates_score_null(self):
+        search = {'params': {'C': [-1.0, 1.0]}, 'factor': 2}
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # FitFailedWarning for C=-1
+            result = search_model(self.dataset, 'Logistic Regression', search)
+        def reject(constant):
+            raise ValueError(f"{constant} is not valid JSON")
+        leaderboard = json.loads(result['leaderboard'], parse_constant=reject)
+        self.assertEqual([(e['params']['C'], e['score'] is None) for e in leaderboard], [(1.0, False), (-1.0, True)])
+
+    def test_sweep_matches_individual_training(self):
+        table, records = sweep_models(self.dataset, ['Naive Bayes', 'Logistic Regression'], save=True)
+        self.assertEqual([row['rank'] for row in table], [1, 2])
+        self.assertEqual(len(records), 2)
+        for row in table:
+            expected = json.loads(train_model(self.dataset, row['algorithm'], {})['metrics'])
+            for name, value in expected.items():
+                self.assertAlmostEqual(row['metrics'][name], value, places=9)
+        model = joblib.load(os.path.join(self.tmpdir.name, records[0]['filepath']))
+        X, _ = prepare_data(pd.read_csv(self.dataset, sep=';'))
+        self.assertEqual(len(model.predict(X)), len(X))
+
+    def test_identical_training_request_is_memoized(self):
+        registry = ModelRegistry(os.path.join(self.tmpdir.name, 'models.csv'))
+        client = app.test_client()
+        body = {'dataset': 'student-mat.csv', 'algorithm': 'Naive Bayes', 'hyperparams': {}}
+        with mock.patch('routes.model.model_registry', registry):
+            first = client.post('/api/models/train', json=body)
+            second = client.post('/api/models/train', json=body)
+            self.assertEqual((first.status_code, second.status_code), (201, 200))
+            self.assertEqual(second.get_json()['model_id'], first.get_json()['model_id'])
+            self.assertEqual(len([f for f in os.listdir(self.tmpdir.name) if f.endswith('.joblib')]), 2)  # model + scorer
+            forced = client.post('/api/models/train', json=dict(body, force=True))
+            self.assertEqual(forced.status_code, 201)
+            other = client.post('/api/models/train', json=dict(body, hyperparams={'var_smoothing': 1e-8}))
+            self.assertEqual(other.status_code, 201)
+
+class IncrementalUpdateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.models_folder, Config.MODELS_FOLDER = Config.MODELS_FOLDER, self.tmpdir.name
+        self.registry = ModelRegistry(os.path.join(self.tmpdir.name, 'models.csv'))
+        self.dataset = os.path.join(Config.UPLOAD_FOLDER, 'student-mat.csv')
+        X, y = prepare_data(pd.read_csv(self.dataset, sep=';'))
+        self.X_new, self.y_new = X.iloc[:60], 1 - y.iloc[:60]  # flipped labels so the update is visible
+
+    def tearDown(self):
+        Config.MODELS_FOLDER = self.models_folder
+        self.tmpdir.cleanup()
+
+    def _train(self, algorithm):
+        record = train_model(self.dataset, algorithm, {})
+        self.registry.add(record)
+        return self.registry.get(record['model_id'])
+
+    def test_incremental_updates_keep_preprocessor(self):
+        for algorithm, method in (('Naive Bayes', 'partial_fit'), ('Logistic Regression', 'sgd')):
+            parent = self._train(algorithm)
+            child = update_model(parent, self.X_new, self.y_new)
+            self.registry.add(child)
+            child = self.registry.get(child['model_id'])
+            self.assertEqual((child['model_id'], child['version'], child['lineage']),
+                             (parent['model_id'] + '_v2', 2, parent['model_id']))
+            self.assertEqual(child['update']['method'], method)
+            self.assertGreater(child['update']['accuracy_after'], child['update']['accuracy_before'])
+            self.assertEqual(child['metrics'], parent['metrics'])
+            model = joblib.load(os.path.join(self.tmpdir.name, child['filepath']))
+            scorer = joblib.load(os.path.join(self.tmpdir.name, scorer_filename(child['filepath'])))
+            row = self.X_new.iloc[0].to_dict()
+            expected = predict_single(model, row)
+            self.assertEqual(predict_single(model, row, scorer)[0], expected[0])
+            self.assertAlmostEqual(predict_single(model, row, scorer)[1], expected[1], places=9)
+            # Updating a version continues the same lineage
+            grandchild = update_model(child, self.X_new, self.y_new, versions=[1, 2])
+            self.assertEqual(grandchild['model_id'], parent['model_id'] + '_v3')
+
+    def test_tree_refits_on_dataset_and_lineage_delta(self):
+        parent = self._train('Decision Tree')
+        child = update_model(parent, self.X_new, self.y_new)
+        self.assertEqual(json.loads(child['update'])['method'], 'refit')
+        self.assertNotEqual(json.loads(child['metrics']), parent['metrics'])
+        delta = pd.read_csv(os.path.join(self.tmpdir.name, delta_filename(child['filepath'])))
+        self.assertEqual(len(delta), 60)
+        self.registry.add(child)
+        grandchild = update_model(self.registry.get(child['model_id']), self.X_new.iloc[:5], self.y_new.iloc[:5])
+        self.assertEqual(len(pd.read_csv(os.path.join(self.tmpdir.name, delta_filename(grandchild['filepath'])))), 65)
+        with self.assertRaises(ValueError):
+            update_model(dict(parent, dataset='missing.csv'), self.X_new, self.y_new)
+
+    def test_update_route_from_file_and_feedback(self):
+        parent = self._train('Naive Bayes')
+        monitor = ModelMonitor(os.path.join(self.tmpdir.name, 'feedback.csv'), os.path.join(self.tmpdir.name, 'predictions.csv'))
+        for i, row in enumerate(self.X_new.iloc[:10].to_dict(orient='records')):
+            ts = f'2024-03-01T10:00:{i:02d}'
+            append_row({'timestamp': ts, 'model_id': parent['model_id'], 'input_data': str(row), 'prediction': 1, 'probability': 0.9}, monitor.predictions_path)
+            monitor.record(ts, parent['model_id'], int(self.y_new.iloc[i]))
+        # Feedback on a model from another dataset must not leak into the update
+        append_row({'timestamp': 'x', 'model_id': 'other', 'input_data': str({'foo': 1}), 'prediction': 1, 'probability': 0.9}, monitor.predictions_path)
+        monitor.record('x', 'other', 0)
+        upload = pd.read_csv(self.dataset, sep=';').iloc[:20].to_csv(sep=';', index=False).encode()
+
+        client = app.test_client()
+        with mock.patch('routes.model.model_registry', self.registry), mock.patch('routes.model.model_monitor', monitor):
+            response = client.post(f"/api/models/update/{parent['model_id']}", json={'source': 'feedback'})
+            self.assertEqual(response.status_code, 201, response.get_json())
+            self.assertEqual(response.get_json()['model_id'], parent['model_id'] + '_v2')
+            self.assertEqual(json.loads(response.get_json()['update'])['rows'], 10)
+            response = client.post(f"/api/models/update/{parent['model_id']}", data={'file': (io.BytesIO(upload), 'delta.csv')},
+                                   content_type='multipart/form-data')
+            self.assertEqual(response.get_json()['model_id'], parent['model_id'] + '_v3')
+            self.assertEqual(client.post("/api/models/update/missing", json={'source': 'feedback'}).status_code, 404)
+            self.assertEqual(client.post(f"/api/models/update/{parent['model_id']}", json={}).status_code, 400)
+
+class LargeSVMTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.models_folder, Config.MODELS_FOLDER = Config.MODELS_FOLDER, self.tmpdir.name
+        self.dataset = os.path.join(Config.UPLOAD_FOLDER, 'student-mat.csv')
+
+    def tearDown(self):
+        Config.MODELS_FOLDER = self.models_folder
+        self.tmpdir.cleanup()
+
+    def test_engine_selected_by_row_count(self):
+        with mock.patch.object(Config, 'SVM_LARGE_ROWS', 1000):
+            self.assertEqual(type(get_model_instance('SVM', {'C': 2.0}, n_rows=999)).__name__, 'SVC')
+            large = get_model_instance('SVM', {'C': 2.0}, n_rows=1000)
+            self.assertEqual((type(large).__name__, large.C, large.n_components), ('ApproximateSVC', 2.0, Config.SVM_LARGE_COMPONENTS))
+            self.assertFalse(uses_large_svm('Decision Tree', 10 ** 6))
+        with mock.patch.object(Config, 'SVM_LARGE_ROWS', 0):
+            self.assertFalse(uses_large_svm('SVM', 10 ** 6))
+
+    def test_large_svm_trains_and_predicts(self):
+        exact = json.loads(train_model(self.dataset, 'SVM', {})['metrics'])
+        with mock.patch.object(Config, 'SVM_LARGE_ROWS', 100):
+            record = train_model(self.dataset, 'SVM', {'kernel': 'rbf'})
+        metrics = json.loads(record['metrics'])
+        self.assertGreater(metrics['accuracy'], exact['accuracy'] - 0.1)
+        model = joblib.load(os.path.join(self.tmpdir.name, record['filepath']))
+        self.assertEqual(type(model.named_steps['classifier']).__name__, 'ApproximateSVC')
+        X, y = prepare_data(pd.read_csv(self.dataset, sep=';'))
+        predictions, probabilities = predict_with_proba(model, X)
+        self.assertTrue(np.array_equal(predictions, model.predict(X)))
+        self.assertTrue(((probabilities >= 0.5) & (probabilities <= 1)).all())
+        self.assertEqual(model.decision_function(X).shape, (len(X),))
+
+    def test_benchmark_compares_engines(self):
+        with isolated_folders():
+            results = bench_svm([400], svm_max_rows=400)
+        self.assertEqual(sorted(results), ['svm/approximate/rows=400', 'svm/exact/rows=400'])
+        for result in results.values():
+            self.assertGreater(result['roc_auc'], 0.5)
+            self.assertIn('p50_ms', result)
+
+class TrainingJobsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.jobs = TrainingJobs(jobs_folder=self.tmpdir.name, max_workers=1)
+        self.dataset = os.path.join(Config.UPLOAD_FOLDER, 'student-mat.csv')
+
+    def tearDown(self):
+        if self.jobs._executor is not None:
+            self.jobs._executor.shutdown(cancel_futures=True)
+        self.tmpdir.cleanup()
+
+    def _wait(self, job_id, timeout=120):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.jobs.get(job_id)
+            if job['status'] in ('completed', 'failed', 'cancelled'):
+                return job
+            time.sleep(0.1)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_searches_share_cores_between_workers(self):
+        from utils.jobs import _run_training
+        with mock.patch('os.cpu_count', return_value=8):
+            self.assertEqual(TrainingJobs(jobs_folder=self.tmpdir.name, max_workers=2).n_jobs, 4)
+            self.assertEqual(TrainingJobs(jobs_folder=self.tmpdir.name, max_workers=16).n_jobs, 1)
+        with mock.patch('utils.ml_utils.search_model', return_value={}) as search:
+            _run_training('j', self.dataset, 'Naive Bayes', {}, {'params': {}}, 'cancel', 3)
+        self.assertEqual(search.call_args.kwargs['n_jobs'], 3)
+
+    def test_job_completes_and_registers(self):
+        registered = []
+        job = self.jobs.submit(self.dataset, 'Naive Bayes', {}, on_complete=registered.append)
+        cancelled = self.jobs.submit(self.dataset, 'Naive Bayes', {})
+        self.assertEqual(job['status'], 'queued')
+        self.assertIn(self.jobs.cancel(cancelled['job_id'])['status'], ('cancelled', 'cancelling'))
+
+        job = self._wait(job['job_id'])
+        self.assertEqual(job['status'], 'completed', job['error'])
+        self.assertEqual(job['progress'], 1.0)
+        self.assertEqual(registered, [job['result']])
+        for filename in (job['result']['filepath'], scorer_filename(job['result']['filepath'])):
+            os.remove(os.path.join(Config.MODELS_FOLDER, filename))
+        self.assertEqual(self._wait(cancelled['job_id'])['status'], 'cancelled')
+        # Status is readable from the persisted file by another worker's manager
+        other = TrainingJobs(jobs_folder=self.tmpdir.name)
+        self.assertEqual(other.get(job['job_id'])['status'], 'completed')
+        self.assertEqual(len(other.list()), 2)
+
 if __name__ == "__main__":
     unittest.main()
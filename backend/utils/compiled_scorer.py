@@ -0,0 +1,176 @@
+"""
+NumPy-only scorer compiled from a fitted training pipeline.
+
+The preprocessor is reduced to per-column imputation values and one-hot
+lookup tables, and the classifier to flat arrays (logistic regression
+coefficients, including SGD-updated ones, Gaussian naive Bayes means/variances, decision tree node
+arrays), so a prediction needs no DataFrame and no sklearn dispatch.
+Pipelines it does not recognise (e.g. SVC) compile to None, and inputs it
+cannot handle exactly raise, so callers fall back to the sklearn pipeline.
+"""
+import os
+import numpy as np
+
+# Bump when the scorer layout changes; older saved scorers are recompiled on load
+SCORER_VERSION = 1
+SCORER_SUFFIX = '.scorer.joblib'
+
+def scorer_filename(model_filename):
+    return os.path.splitext(model_filename)[0] + SCORER_SUFFIX
+
+class CompiledScorer:
+
+    def __init__(self, num_columns, num_fill, cat_columns, cat_fill, cat_lookup, n_features, classes, kind, params):
+        self.version = SCORER_VERSION
+        self.num_columns = num_columns
+        self.num_fill = num_fill
+        self.cat_columns = cat_columns
+        self.cat_fill = cat_fill
+        self.cat_lookup = cat_lookup   # per categorical column: value -> feature index
+        self.n_features = n_features
+        self.classes = classes
+        self.kind = kind
+        self.params = params
+
+    def transform(self, records):
+        """Raw input dicts -> the preprocessed feature matrix."""
+        X = np.zeros((len(records), self.n_features))
+        n_num = len(self.num_columns)
+        for i, record in enumerate(records):
+            for j, col in enumerate(self.num_columns):
+                value = float(record[col])
+                X[i, j] = self.num_fill[j] if value != value else value
+            for j, col in enumerate(self.cat_columns):
+                value = record[col]
+                if isinstance(value, float) and value != value:
+                    value = self.cat_fill[j]
+                elif not isinstance(value, str):
+                    raise TypeError(f"Unsupported value for {col}: {value!r}")
+                index = self.cat_lookup[j].get(value)
+                if index is not None:
+                    X[i, n_num + index] = 1.0
+        return X
+
+    def predict_proba_matrix(self, X):
+        p = self.params
+        if self.kind == 'logistic':
+            scores = X @ p['coef'].T + p['intercept']
+            if p['ovr']:
+                proba = 1.0 / (1.0 + np.exp(-scores))
+                if proba.shape[1] == 1:
+                    return np.hstack([1 - proba, proba])
+                return proba / proba.sum(axis=1, keepdims=True)
+            scores -= scores.max(axis=1, keepdims=True)
+            proba = np.exp(scores)
+            return proba / proba.sum(axis=1, keepdims=True)
+        if self.kind == 'gaussian_nb':
+            jll = p['log_norm'] - 0.5 * (((X[:, None, :] - p['theta']) ** 2) / p['var']).sum(axis=2)
+            top = jll.max(axis=1, keepdims=True)
+            log_prob = top + np.log(np.exp(jll - top).sum(axis=1, keepdims=True))
+            return np.exp(jll - log_prob)
+        # Decision tree: walk all rows down together; sklearn compares float32 features
+        Xf = X.astype(np.float32)
+        left, right = p['left'], p['right']
+        if len(X) == 1:
+            row, node = Xf[0], 0
+            while left[node] != -1:
+                node = left[node] if row[p['feature'][node]] <= p['threshold'][node] else right[node]
+            return p['leaf_proba'][[node]]
+        rows = np.arange(len(X))
+        node = np.zeros(len(X), dtype=np.intp)
+        while True:
+            internal = left[node] != -1
+            if not internal.any():
+                break
+            go_left = Xf[rows, p['feature'][node]] <= p['threshold'][node]
+            node = np.where(internal, np.where(go_left, left[node], right[node]), node)
+        return p['leaf_proba'][node]
+
+    def predict(self, records):
+        """Returns (predictions, probability of the predicted class) for a list of input dicts."""
+        proba = self.predict_proba_matrix(self.transform(records))
+        return self.classes[proba.argmax(axis=1)], proba.max(axis=1)
+
+def _imputer_fill(imputer):
+    if getattr(imputer, 'add_indicator', False):
+        return None
+    return imputer.statistics_
+
+def compile_pipeline(pipeline):
+    """Compiles a fitted preprocessor+classifier pipeline, or returns None if unsupported."""
+    from sklearn.pipeline import Pipeline
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    from sklearn.naive_bayes import GaussianNB
+    from sklearn.tree import DecisionTreeClassifier
+
+    if not isinstance(pipeline, Pipeline) or list(pipeline.named_steps) != ['preprocessor', 'classifier']:
+        return None
+    preprocessor, clf = pipeline.named_steps['preprocessor'], pipeline.named_steps['classifier']
+    if not isinstance(preprocessor, ColumnTransformer):
+        return None
+
+    num_columns, num_fill, cat_columns, cat_fill, cat_lookup = [], [], [], [], []
+    offset = 0
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'remainder' and transformer == 'drop':
+            continue
+        columns = list(columns)
+        if not columns:
+            continue
+        if not isinstance(transformer, Pipeline):
+            return None
+        steps = [step for _, step in transformer.steps]
+        if name == 'num' and len(steps) == 1 and isinstance(steps[0], SimpleImputer):
+            fill = _imputer_fill(steps[0])
+            if fill is None or np.isnan(np.asarray(fill, dtype=float)).any():
+                return None  # all-NaN columns are dropped by the imputer
+            num_columns, num_fill = columns, np.asarray(fill, dtype=float)
+        elif (name == 'cat' and len(steps) == 2 and isinstance(steps[0], SimpleImputer)
+              and isinstance(steps[1], OneHotEncoder)):
+            fill, encoder = _imputer_fill(steps[0]), steps[1]
+            if (fill is None or encoder.drop is not None or encoder.handle_unknown != 'ignore'
+                    or getattr(encoder, '_infrequent_enabled', False)):
+                return None
+            cat_columns, cat_fill = columns, list(fill)
+            for categories in encoder.categories_:
+                if not all(isinstance(c, str) for c in categories):
+                    return None
+                cat_lookup.append({c: offset + k for k, c in enumerate(categories)})
+                offset += len(categories)
+        else:
+            return None
+    if not num_columns and not cat_columns:
+        return None
+    n_features = len(num_columns) + offset
+    if getattr(clf, 'n_features_in_', None) != n_features:
+        return None
+
+    if isinstance(clf, LogisticRegression):
+        ovr = clf.multi_class in ('ovr', 'warn') or (clf.multi_class == 'auto' and (len(clf.classes_) <= 2 or clf.solver == 'liblinear'))
+        kind, params = 'logistic', {'coef': clf.coef_.copy(), 'intercept': clf.intercept_.copy(), 'ovr': ovr}
+    elif isinstance(clf, SGDClassifier) and clf.loss == 'log_loss':
+        # Incrementally updated logistic regression; SGD is one-vs-rest
+        kind, params = 'logistic', {'coef': clf.coef_.copy(), 'intercept': clf.intercept_.copy(), 'ovr': True}
+    elif isinstance(clf, GaussianNB):
+        log_norm = np.log(clf.class_prior_) - 0.5 * np.log(2.0 * np.pi * clf.var_).sum(axis=1)
+        kind, params = 'gaussian_nb', {'theta': clf.theta_.copy(), 'var': clf.var_.copy(), 'log_norm': log_norm}
+    elif isinstance(clf, DecisionTreeClassifier) and clf.n_outputs_ == 1:
+        tree = clf.tree_
+        value = tree.value[:, 0, :]
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0] = 1.0
+        kind, params = 'tree', {
+            'left': tree.children_left.astype(np.intp),
+            'right': tree.children_right.astype(np.intp),
+            'feature': tree.feature.astype(np.intp),
+            'threshold': tree.threshold.copy(),
+            'leaf_proba': value / normalizer
+        }
+    else:
+        return None
+
+    return CompiledScorer(num_columns, num_fill, cat_columns, cat_fill, cat_lookup, n_features,
+                          clf.classes_.copy(), kind, params)
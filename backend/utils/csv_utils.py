@@ -1,55 +1,542 @@
 import os
+import json
+import time
+import queue
 import pandas as pd
-import shutil
-from threading import Lock
+from threading import Lock, RLock, Thread, Event, get_ident
+from config import Config
 
-csv_lock = Lock()
+try:
+    import fcntl
+except ImportError:  # Windows: file locks only cover threads of one process
+    fcntl = None
 
-def read_csv(filepath):
-    """Reads a CSV file into a DataFrame. Returns empty DataFrame if file doesn't exist."""
-    if not os.path.exists(filepath):
-        return pd.DataFrame()
+# Appends go to a JSON-lines journal next to the CSV (one row per line, so a
+# torn write only ever damages the last line). The CSV itself is only ever
+# replaced through temp file + rename, when compacting or on full rewrites.
+JOURNAL_SUFFIX = '.journal'
+# Watermark written before a base file is swapped in: it records which prefix
+# of the journal is already contained in that base, so a crash between the
+# rename and the journal trim never replays rows twice.
+MARK_SUFFIX = '.journal.mark'
+
+_journaled_files = set()
+_compactor_started = False
+_committer = None
+_locks = {}
+_locks_guard = Lock()
+
+class _FileLock:
+    """
+    Exclusive, reentrant lock for one CSV: an RLock for threads of this process
+    plus flock(2) on a sidecar .lock file for other worker processes.
+    """
+
+    def __init__(self, filepath):
+        self.path = filepath + '.lock'
+        self.lock = RLock()
+        self.depth = 0
+        self.fd = None
+        self.pid = None
+        self.owner = None
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.depth += 1
+        self.owner = get_ident()
+        if fcntl is not None and self.depth == 1:
+            if self.pid != os.getpid():
+                # Never share an inherited descriptor with a forked parent
+                try:
+                    self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                    self.pid = os.getpid()
+                except FileNotFoundError:
+                    self.fd = None  # Directory not created yet, nothing to protect
+            if self.fd is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            self.owner = None
+            if fcntl is not None and self.fd is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
+
+    def held(self):
+        """True if the calling thread holds this lock."""
+        return self.owner == get_ident()
+
+def file_lock(filepath):
+    """Returns the lock guarding filepath. Unrelated files never contend."""
+    with _locks_guard:
+        lock = _locks.get(filepath)
+        if lock is None:
+            lock = _locks[filepath] = _FileLock(filepath)
+    return lock
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on Windows
     try:
-        return pd.read_csv(filepath)
-    except pd.errors.EmptyDataError:
-        return pd.DataFrame()
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
-def write_csv(df, filepath, mode='w'):
-    """Writes a DataFrame to a CSV file safely using a temp file."""
+def _inode(filepath):
+    try:
+        return os.stat(filepath).st_ino
+    except FileNotFoundError:
+        return None
+
+def _read_mark(filepath):
+    try:
+        with open(filepath + MARK_SUFFIX) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _journal_skip(filepath):
+    """Bytes at the start of the journal that are already part of the base CSV."""
+    mark = _read_mark(filepath)
+    if mark and mark['base_inode'] == _inode(filepath) and mark['journal_inode'] == _inode(filepath + JOURNAL_SUFFIX):
+        return mark['offset']
+    return 0
+
+def _trim_journal(filepath, offset):
+    """Drops the first `offset` bytes of the journal (caller holds the file lock)."""
+    journal = filepath + JOURNAL_SUFFIX
+    with open(journal, 'rb') as f:
+        f.seek(offset)
+        tail = f.read()
+    if tail:
+        temp_journal = journal + '.tmp'
+        with open(temp_journal, 'wb') as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_journal, journal)
+    else:
+        os.remove(journal)
+    _fsync_dir(os.path.dirname(filepath))
+    if os.path.exists(filepath + MARK_SUFFIX):
+        os.remove(filepath + MARK_SUFFIX)
+
+def _recover(filepath):
+    """Cleans up after a crash mid-swap (caller holds the file lock)."""
+    if not os.path.exists(filepath + MARK_SUFFIX):
+        return
+    skip = _journal_skip(filepath)
+    if skip:
+        # The new base landed but the journal was never trimmed
+        _trim_journal(filepath, skip)
+    else:
+        # Stale: the base was never swapped in, or the trim already happened
+        os.remove(filepath + MARK_SUFFIX)
+
+def _replace_base(filepath, temp_filepath, journal_offset):
+    """
+    Atomically swaps temp_filepath in as the base CSV, where the new base already
+    contains the first journal_offset bytes of the journal (caller holds the file lock).
+    """
+    journal = filepath + JOURNAL_SUFFIX
+    if journal_offset:
+        mark = {'base_inode': os.stat(temp_filepath).st_ino,
+                'journal_inode': _inode(journal),
+                'offset': journal_offset}
+        temp_mark = filepath + MARK_SUFFIX + '.tmp'
+        with open(temp_mark, 'w') as f:
+            json.dump(mark, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_mark, filepath + MARK_SUFFIX)
+    os.replace(temp_filepath, filepath)
+    _fsync_dir(os.path.dirname(filepath))
+    if journal_offset:
+        _trim_journal(filepath, journal_offset)
+
+def _parse_journal(data):
+    rows = []
+    lines = data.split(b'\n')
+    # Anything after the last newline is a torn write and is ignored
+    for line in lines[:-1]:
+        if line:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    return rows
+
+def open_snapshot(filepath):
+    """
+    Opens the base CSV and its journal as one consistent view and returns
+    (base file or None, journal file or None, journal end offset). Files are
+    only ever replaced by rename, so the handles stay consistent after the lock
+    is released; bytes past the end offset are later appends. Caller closes both.
+    """
+    journal = filepath + JOURNAL_SUFFIX
+    base_file = journal_file = None
+    with file_lock(filepath):
+        _recover(filepath)
+        if os.path.exists(filepath):
+            base_file = open(filepath, 'rb')
+        if os.path.exists(journal):
+            journal_file = open(journal, 'rb')
+            end = os.fstat(journal_file.fileno()).st_size
+        else:
+            end = 0
+    return base_file, journal_file, end
+
+def _read_snapshot(filepath):
+    """Returns (base DataFrame, journal rows, journal end offset) as one consistent view."""
+    base_file, journal_file, end = open_snapshot(filepath)
+    try:
+        df = pd.DataFrame()
+        if base_file is not None:
+            try:
+                df = pd.read_csv(base_file)
+            except pd.errors.EmptyDataError:
+                df = pd.DataFrame()
+        rows = []
+        if journal_file is not None:
+            rows = _parse_journal(journal_file.read(end))
+        return df, rows, end
+    finally:
+        if base_file is not None:
+            base_file.close()
+        if journal_file is not None:
+            journal_file.close()
+
+def _merge(df, rows):
+    if not rows:
+        return df
+    journal_df = pd.DataFrame(rows)
+    if df.empty and len(df.columns) == 0:
+        return journal_df
+    return pd.concat([df, journal_df], ignore_index=True)
+
+def _csv_read(filepath):
+    df, rows, _ = _read_snapshot(filepath)
+    return _merge(df, rows)
+
+def _csv_signature(filepath):
+    signature = []
+    for path in (filepath, filepath + JOURNAL_SUFFIX):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+def _csv_write(df, filepath):
     directory = os.path.dirname(filepath)
     if not os.path.exists(directory):
         os.makedirs(directory)
 
     temp_filepath = filepath + '.tmp'
-    
-    with csv_lock:
-        if mode == 'a' and os.path.exists(filepath):
-            # If appending, we need to read existing, append, then write back? 
-            # Or just open in append mode. Pandas to_csv with mode='a' is easier but not atomic.
-            # For safety/atomicity with pandas, it's often better to read-append-write if size allows,
-            # or just use standard file append.
-            # Given requirements: "Always write via temp file then rename for safety"
-            # This implies we should read full, append, write temp, rename.
-            
-            # However, for logs/history, appending is frequent.
-            # Let's try to be efficient. If mode is 'a', we append to the file directly?
-            # The prompt says: "Always write via temp file then rename for safety"
-            # So we will follow that strictly.
-            
-            existing_df = read_csv(filepath)
-            if not existing_df.empty:
-                df = pd.concat([existing_df, df], ignore_index=True)
-            
+
+    with file_lock(filepath):
+        _recover(filepath)
         df.to_csv(temp_filepath, index=False)
-        shutil.move(temp_filepath, filepath)
+        with open(temp_filepath, 'rb') as f:
+            os.fsync(f.fileno())
+        # The new contents supersede everything journaled so far
+        journal = filepath + JOURNAL_SUFFIX
+        journal_size = os.path.getsize(journal) if os.path.exists(journal) else 0
+        _replace_base(filepath, temp_filepath, journal_size)
+
+def encode_value(value):
+    """Converts numpy scalars and NaN to plain Python values for storage."""
+    if hasattr(value, 'item'):
+        value = value.item()  # numpy scalar
+    if isinstance(value, float) and value != value:
+        value = None
+    return value
+
+def _encode_row(data_dict):
+    row = {key: encode_value(value) for key, value in data_dict.items()}
+    return (json.dumps(row, default=str) + '\n').encode('utf-8')
+
+def _write_journal(filepath, lines):
+    journal = filepath + JOURNAL_SUFFIX
+    with file_lock(filepath):
+        created = not os.path.exists(journal)
+        with open(journal, 'ab') as f:
+            f.write(b''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        if created:
+            _fsync_dir(os.path.dirname(filepath) or '.')
+
+def _csv_append(data_dict, filepath):
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    line = _encode_row(data_dict)
+    # A caller holding the file lock (e.g. UserStore.create) writes directly:
+    # the committer thread would block on that lock while the caller waits for it
+    if Config.CSV_GROUP_COMMIT_MS > 0 and not file_lock(filepath).held():
+        _get_committer().submit(filepath, line)
+    else:
+        _write_journal(filepath, [line])
+    _journaled_files.add(filepath)
+    _start_compactor()
+
+def _csv_init(filepath, columns):
+    # Rows appended before the base file exists live only in the journal,
+    # which the header write would replace
+    with file_lock(filepath):
+        if not os.path.exists(filepath) and not os.path.exists(filepath + JOURNAL_SUFFIX):
+            _csv_write(pd.DataFrame(columns=columns), filepath)
+
+def _csv_compact(filepath):
+    """
+    Folds the journal into the base CSV via temp file + atomic rename.
+    The expensive merge runs without holding the file lock, so appends keep flowing;
+    only the final swap is done under the lock.
+    """
+    journal = filepath + JOURNAL_SUFFIX
+    if not os.path.exists(journal):
+        return False
+    with file_lock(filepath):
+        base_inode = _inode(filepath)
+        journal_inode = _inode(journal)
+    df, rows, end = _read_snapshot(filepath)
+    if not rows:
+        return False
+
+    temp_filepath = filepath + '.compact.tmp'
+    _merge(df, rows).to_csv(temp_filepath, index=False)
+    with open(temp_filepath, 'rb') as f:
+        os.fsync(f.fileno())
+
+    with file_lock(filepath):
+        if _inode(filepath) != base_inode or _inode(journal) != journal_inode:
+            # Rewritten underneath us; the next pass will pick it up
+            os.remove(temp_filepath)
+            return False
+        _replace_base(filepath, temp_filepath, end)
+    return True
+
+def _compaction_loop():
+    while True:
+        time.sleep(Config.CSV_COMPACT_INTERVAL)
+        for filepath in list(_journaled_files):
+            journal = filepath + JOURNAL_SUFFIX
+            try:
+                if os.path.exists(journal) and os.path.getsize(journal) >= Config.CSV_COMPACT_BYTES:
+                    _csv_compact(filepath)
+            except Exception as e:
+                print(f"Compaction of {filepath} failed: {e}")
+
+def _start_compactor():
+    global _compactor_started
+    if _compactor_started or Config.CSV_COMPACT_INTERVAL <= 0:
+        return
+    with _locks_guard:
+        if _compactor_started:
+            return
+        _compactor_started = True
+    Thread(target=_compaction_loop, name='csv-compactor', daemon=True).start()
+
+class _GroupCommitter:
+    """
+    Batches journal appends that arrive within CSV_GROUP_COMMIT_MS of each other
+    into one write + fsync per file. Each caller still blocks until its own row
+    is durable.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.queue = queue.Queue()
+        Thread(target=self._run, name='csv-group-commit', daemon=True).start()
+
+    def submit(self, filepath, line):
+        done = Event()
+        item = [filepath, line, done, None]
+        self.queue.put(item)
+        done.wait()
+        if item[3] is not None:
+            raise item[3]
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_file = {}
+            for item in batch:
+                by_file.setdefault(item[0], []).append(item)
+            for filepath, items in by_file.items():
+                try:
+                    _write_journal(filepath, [item[1] for item in items])
+                except Exception as e:
+                    for item in items:
+                        item[3] = e
+                for item in items:
+                    item[2].set()
+
+def _get_committer():
+    global _committer
+    if _committer is None:
+        with _locks_guard:
+            if _committer is None:
+                _committer = _GroupCommitter(Config.CSV_GROUP_COMMIT_MS / 1000.0)
+    return _committer
+
+class CSVBackend:
+    """Flat CSV files with an fsync'd append journal. The default backend."""
+    name = 'csv'
+    indexed_lookups = False  # find_rows scans the whole file
+
+    def read(self, filepath):
+        return _csv_read(filepath)
+
+    def write(self, df, filepath):
+        _csv_write(df, filepath)
+
+    def append(self, data_dict, filepath):
+        _csv_append(data_dict, filepath)
+
+    def init(self, filepath, columns):
+        _csv_init(filepath, columns)
+
+    def signature(self, filepath):
+        return _csv_signature(filepath)
+
+    def compact(self, filepath):
+        return _csv_compact(filepath)
+
+    def list_files(self, data_folder):
+        return sorted(os.path.join(data_folder, f) for f in os.listdir(data_folder) if f.endswith('.csv'))
+
+    def find_rows(self, filepath, column, value):
+        df = _csv_read(filepath)
+        if df.empty or column not in df.columns:
+            return []
+        return df[df[column].astype(str) == str(value)].to_dict(orient='records')
+
+    def page(self, filepath, filters, before, limit):
+        from .history_index import get_index
+        return get_index(filepath).page(filters, before, limit)
+
+    def daily_counts(self, filepath, filters):
+        from .history_index import get_index
+        return get_index(filepath).daily_counts(filters)
+
+    def find_prediction(self, filepath, model_id, timestamp, row=False):
+        from .history_index import get_index
+        return get_index(filepath).find(model_id, timestamp, row)
+
+_backends = {}
+
+def get_backend(name=None):
+    """Returns the storage backend selected by Config.STORAGE_BACKEND (or by name)."""
+    name = name or Config.STORAGE_BACKEND
+    backend = _backends.get(name)
+    if backend is None:
+        with _locks_guard:
+            backend = _backends.get(name)
+            if backend is None:
+                if name == 'csv':
+                    backend = CSVBackend()
+                elif name == 'sqlite':
+                    from .sqlite_storage import SQLiteBackend
+                    backend = SQLiteBackend(Config.SQLITE_PATH)
+                else:
+                    raise ValueError(f"Unknown storage backend: {name}")
+                _backends[name] = backend
+    return backend
+
+def read_csv(filepath):
+    """Reads a table into a DataFrame. Returns empty DataFrame if it doesn't exist."""
+    return get_backend().read(filepath)
+
+def write_csv(df, filepath, mode='w'):
+    """
+    Writes a DataFrame to a table.
+    mode='w' atomically replaces the contents, mode='a' appends the rows.
+    """
+    backend = get_backend()
+    if mode == 'a':
+        for row in df.to_dict(orient='records'):
+            backend.append(row, filepath)
+    else:
+        backend.write(df, filepath)
 
 def append_row(data_dict, filepath):
-    """Appends a single row (dict) to a CSV file."""
-    df = pd.DataFrame([data_dict])
-    write_csv(df, filepath, mode='a')
+    """Appends a single row (dict) to a table. Returns once the row is durable."""
+    get_backend().append(data_dict, filepath)
 
 def init_csv(filepath, columns):
-    """Initializes a CSV file with headers if it doesn't exist."""
-    if not os.path.exists(filepath):
-        df = pd.DataFrame(columns=columns)
-        write_csv(df, filepath)
+    """Initializes a table with headers if it doesn't exist."""
+    get_backend().init(filepath, columns)
+
+def find_rows(filepath, column, value):
+    """Rows whose `column` equals value, in storage order."""
+    return get_backend().find_rows(filepath, column, value)
+
+def indexed_lookups():
+    """True if find_rows is an index lookup rather than a full read."""
+    return get_backend().indexed_lookups
+
+def read_page(filepath, filters=None, before=None, limit=50):
+    """
+    Newest-first page of the rows of a table with timestamp, model_id and
+    prediction columns. filters may hold model_id, start and end (datetimes;
+    start inclusive, end exclusive) and prediction. Returns (rows, cursor),
+    where cursor is passed back as `before` for the next page and is None on
+    the last one.
+    """
+    return get_backend().page(filepath, filters or {}, before, limit)
+
+def daily_counts(filepath, filters=None):
+    """Row counts and pass rate (prediction == 1) per model per day, without reading the rows."""
+    return get_backend().daily_counts(filepath, filters or {})
+
+def find_prediction(filepath, model_id, timestamp):
+    """
+    (prediction, probability) of the latest row of a predictions table with
+    this model_id and timestamp, or None. An index lookup, not a table scan.
+    """
+    return get_backend().find_prediction(filepath, model_id, timestamp)
+
+def read_prediction(filepath, model_id, timestamp):
+    """The full stored row that find_prediction matches, as a dict, or None."""
+    return get_backend().find_prediction(filepath, model_id, timestamp, row=True)
+
+def file_signature(filepath):
+    """Cheap value that changes whenever the table is written, by any process."""
+    return get_backend().signature(filepath)
+
+def compact_csv(filepath):
+    """Folds pending appends into the main store. Returns True if anything was compacted."""
+    return get_backend().compact(filepath)
+
+def migrate_storage(source, target, data_folder=None):
+    """Copies every table from one backend to another. Returns the migrated file paths."""
+    data_folder = data_folder or Config.DATA_FOLDER
+    source_backend, target_backend = get_backend(source), get_backend(target)
+    migrated = []
+    for filepath in source_backend.list_files(data_folder):
+        df = source_backend.read(filepath)
+        if df.columns.empty:
+            continue  # empty file without a header: no schema to create
+        target_backend.write(df, filepath)
+        migrated.append(filepath)
+    return migrated
@@ -0,0 +1,184 @@
+import os
+import csv
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from threading import Lock
+from config import Config
+from .metrics import metrics
+
+# Content hashes memoized by (path, mtime, size) so hits don't re-read the file.
+# The memo is also kept in the cache folder, so other workers and restarts
+# only hash files that are new or changed.
+HASH_INDEX = 'hashes.json'
+_hashes = {}
+_hashes_loaded = set()  # cache folders whose saved memo has been merged in
+_hash_lock = Lock()
+
+def _hash_index_path():
+    return os.path.join(Config.DATASET_CACHE_FOLDER, HASH_INDEX)
+
+def _read_hash_index():
+    try:
+        with open(_hash_index_path()) as f:
+            return {path: ((mtime, size), value) for path, (mtime, size, value) in json.load(f).items()}
+    except (FileNotFoundError, ValueError, TypeError):
+        return {}
+
+def _save_hash_index(entries):
+    # Merged with what other workers saved; called with _hash_lock held
+    saved = _read_hash_index()
+    saved.update(entries)
+    os.makedirs(Config.DATASET_CACHE_FOLDER, exist_ok=True)
+    temp = _hash_index_path() + f'.tmp{os.getpid()}'
+    with open(temp, 'w') as f:
+        json.dump({path: [key[0], key[1], value] for path, (key, value) in saved.items()}, f)
+    os.replace(temp, _hash_index_path())
+
+def content_hash(filepath):
+    """SHA-256 of the file contents."""
+    st = os.stat(filepath)
+    key = (st.st_mtime_ns, st.st_size)
+    with _hash_lock:
+        if Config.DATASET_CACHE_FOLDER not in _hashes_loaded:
+            for path, entry in _read_hash_index().items():
+                _hashes.setdefault(path, entry)
+            _hashes_loaded.add(Config.DATASET_CACHE_FOLDER)
+        cached = _hashes.get(filepath)
+        if cached and cached[0] == key:
+            return cached[1]
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    value = digest.hexdigest()
+    with _hash_lock:
+        _hashes[filepath] = (key, value)
+        try:
+            _save_hash_index({filepath: (key, value)})
+        except OSError as e:
+            print(f"Could not save dataset hash index: {e}")
+    return value
+
+def sniff_delimiter(sample):
+    """Detects the delimiter from a text sample (e.g. ; vs ,). Defaults to comma."""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+def sniff_file_delimiter(filepath):
+    with open(filepath, newline='', errors='ignore') as f:
+        return sniff_delimiter(f.read(64 * 1024))
+
+def sniff_buffer_delimiter(buffer):
+    """Sniffs the delimiter of a seekable file object without consuming it."""
+    start = buffer.tell()
+    sample = buffer.read(64 * 1024)
+    buffer.seek(start)
+    if isinstance(sample, bytes):
+        sample = sample.decode('utf-8', errors='ignore')
+    return sniff_delimiter(sample)
+
+def read_raw(filepath_or_buffer, delimiter=None):
+    """
+    Parses a CSV with the fast C engine, using a sniffed delimiter instead of
+    the slow python engine's sep=None detection. Returns (df, delimiter).
+    """
+    if delimiter is None:
+        if hasattr(filepath_or_buffer, 'read'):
+            delimiter = sniff_buffer_delimiter(filepath_or_buffer)
+        else:
+            delimiter = sniff_file_delimiter(filepath_or_buffer)
+    return pd.read_csv(filepath_or_buffer, sep=delimiter), delimiter
+
+def dataset_cache_dir(digest):
+    """Directory holding the cached columns (and sidecars) for one content hash."""
+    return os.path.join(Config.DATASET_CACHE_FOLDER, digest)
+
+def _write_cache(df, delimiter, digest):
+    target = dataset_cache_dir(digest)
+    temp = target + f'.tmp{os.getpid()}'
+    os.makedirs(temp, exist_ok=True)
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        entry = {'name': col, 'dtype': str(series.dtype), 'file': f'col_{i}.npy'}
+        if series.dtype == object:
+            # Strings are stored as int32 codes plus a category table
+            codes, categories = pd.factorize(series, use_na_sentinel=True)
+            np.save(os.path.join(temp, entry['file']), codes.astype(np.int32))
+            entry['categories'] = categories.tolist()
+        else:
+            np.save(os.path.join(temp, entry['file']), series.to_numpy())
+        columns.append(entry)
+    meta = {'delimiter': delimiter, 'rows': len(df), 'columns': columns}
+    with open(os.path.join(temp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    try:
+        os.rename(temp, target)
+    except OSError:
+        # The directory already exists (another worker cached the same content
+        # first, or it only holds sidecars): move our files in, meta.json last
+        for name in sorted(os.listdir(temp), key=lambda n: n == 'meta.json'):
+            os.replace(os.path.join(temp, name), os.path.join(target, name))
+        shutil.rmtree(temp, ignore_errors=True)
+
+def _read_cache(digest):
+    directory = dataset_cache_dir(digest)
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+        if 'categories' in entry:
+            categories = np.array(entry['categories'], dtype=object)
+            column = np.empty(len(values), dtype=object)
+            present = values >= 0
+            column[present] = categories[values[present]]
+            column[~present] = np.nan
+            data[entry['name']] = column
+        else:
+            data[entry['name']] = values
+    return pd.DataFrame(data, columns=[entry['name'] for entry in meta['columns']]), meta
+
+def load_dataset(filepath):
+    """
+    Loads a dataset CSV as a DataFrame through the parsed-dataset cache.
+    The first load parses the CSV and stores a typed columnar copy keyed by
+    the content hash; later loads memory-map that copy instead of re-parsing.
+    """
+    digest = content_hash(filepath)
+    with metrics.span('dataset_cache_read'):
+        cached = _read_cache(digest)
+    if cached is not None:
+        return cached[0]
+    with metrics.span('dataset_parse'):
+        df, delimiter = read_raw(filepath)
+    try:
+        _write_cache(df, delimiter, digest)
+    except OSError as e:
+        print(f"Could not cache dataset {filepath}: {e}")
+    return df
+
+def prune_cache():
+    """
+    Removes cached copies whose content no longer matches any uploaded dataset.
+    Hashes come from the (path, mtime, size) memo, so only new or changed
+    uploads are read.
+    """
+    if not os.path.isdir(Config.DATASET_CACHE_FOLDER):
+        return
+    live = set()
+    for f in os.listdir(Config.UPLOAD_FOLDER):
+        path = os.path.join(Config.UPLOAD_FOLDER, f)
+        if f.endswith('.csv') and os.path.isfile(path):
+            live.add(content_hash(path))
+    for entry in os.listdir(Config.DATASET_CACHE_FOLDER):
+        if entry not in live and entry != HASH_INDEX and '.tmp' not in entry:
+            shutil.rmtree(os.path.join(Config.DATASET_CACHE_FOLDER, entry), ignore_errors=True)
@@ -0,0 +1,331 @@
+"""
+Sidecar index over an append-only CSV table (predictions.csv) for paginated,
+filtered reads and per-day counts without parsing the whole history.
+
+For every row the index keeps where it lives (byte offset in the base CSV or
+in its append journal) plus timestamp, model_id, prediction and probability
+as numpy arrays: enough to filter pages and to look up the prediction that
+a feedback event refers to. Journal appends are indexed
+incrementally. A new base file (after compaction or a rewrite) is scanned
+once and its index saved next to it as <file>.idx.npz, so restarts and other
+workers reuse it. A page then only reads and parses its own rows.
+
+Rows are numbered in append order; compaction keeps that order, so the
+numbers stay valid as cursors.
+"""
+import io
+import os
+import csv
+import json
+import numpy as np
+import pandas as pd
+from threading import Lock
+from .csv_utils import open_snapshot
+
+INDEX_SUFFIX = '.idx.npz'
+INDEX_VERSION = 2
+INDEX_COLUMNS = ['timestamp', 'model_id', 'prediction', 'probability']
+
+class _Part:
+    """Index of the rows of one file: byte offsets plus filter columns."""
+
+    def __init__(self, offsets=None, ts=None, model=None, pred=None, prob=None, end=0):
+        self.offsets = np.zeros(0, dtype=np.int64) if offsets is None else offsets
+        self.ts = np.zeros(0, dtype='datetime64[us]') if ts is None else ts
+        self.model = np.zeros(0, dtype=np.int32) if model is None else model
+        self.pred = np.zeros(0, dtype=np.int32) if pred is None else pred
+        self.prob = np.zeros(0, dtype=np.float64) if prob is None else prob
+        self.end = end  # byte offset where the last indexed row ends
+        self.order = self.sorted_ts = None  # timestamp order, built on first lookup
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def extend(self, offsets, ts, model, pred, prob, end):
+        self.offsets = np.concatenate([self.offsets, offsets])
+        self.ts = np.concatenate([self.ts, ts])
+        self.model = np.concatenate([self.model, model])
+        self.pred = np.concatenate([self.pred, pred])
+        self.prob = np.concatenate([self.prob, prob])
+        self.end = end
+        self.order = self.sorted_ts = None
+
+    def find(self, code, ts):
+        """Latest row with this model code and timestamp, by binary search; None if absent."""
+        if self.order is None:
+            self.order = np.argsort(self.ts, kind='stable')
+            self.sorted_ts = self.ts[self.order]
+        lo = np.searchsorted(self.sorted_ts, ts, side='left')
+        hi = np.searchsorted(self.sorted_ts, ts, side='right')
+        rows = [i for i in self.order[lo:hi] if self.model[i] == code]
+        return max(rows) if rows else None
+
+def _row_offsets(data, start):
+    """Start offsets of the CSV records in data[start:], honouring quoted newlines."""
+    offsets = []
+    pos, record, quotes = start, None, 0
+    while pos < len(data):
+        newline = data.find(b'\n', pos)
+        line_end = len(data) if newline == -1 else newline + 1
+        if record is None:
+            record, quotes = pos, 0
+        quotes += data.count(b'"', pos, line_end)
+        if quotes % 2 == 0:
+            if data[record:line_end].strip():
+                offsets.append(record)
+            record = None
+        pos = line_end
+    return offsets
+
+class HistoryIndex:
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.index_path = filepath + INDEX_SUFFIX
+        self._lock = Lock()
+        self._base_key = None
+        self._journal_inode = None
+        self._base = _Part()
+        self._journal = _Part()
+        self._names = []   # model code -> model_id
+        self._codes = {}   # model_id -> model code
+
+    def page(self, filters, before, limit):
+        """See csv_utils.read_page. The cursor is a row number."""
+        base_file, journal_file, journal_end = open_snapshot(self.filepath)
+        try:
+            with self._lock:
+                self._refresh(base_file, journal_file, journal_end)
+                total = len(self._base) + len(self._journal)
+                end = total if before is None else max(0, min(int(before), total))
+                positions = []
+                step = max(1024, 4 * (limit + 1))
+                while end > 0 and len(positions) <= limit:
+                    start = max(0, end - step)
+                    mask = self._mask(start, end, filters)
+                    positions.extend((np.flatnonzero(mask)[::-1] + start).tolist())
+                    end = start
+                    step = min(step * 2, 65536)
+                positions = positions[:limit + 1]
+                more = len(positions) > limit
+                positions = positions[:limit]
+                rows = self._read_rows(positions, base_file, journal_file)
+        finally:
+            for f in (base_file, journal_file):
+                if f is not None:
+                    f.close()
+        return rows, (positions[-1] if more else None)
+
+    def find(self, model_id, timestamp, row=False):
+        """See csv_utils.find_prediction (and read_prediction when row is True)."""
+        try:
+            ts = np.datetime64(pd.Timestamp(timestamp).to_datetime64(), 'us')
+        except (TypeError, ValueError):
+            return None
+        base_file, journal_file, journal_end = open_snapshot(self.filepath)
+        try:
+            with self._lock:
+                self._refresh(base_file, journal_file, journal_end)
+                code = self._codes.get(str(model_id))
+                if code is None:
+                    return None
+                # Journal rows are newer than base rows
+                for part, first in ((self._journal, len(self._base)), (self._base, 0)):
+                    i = part.find(code, ts)
+                    if i is None:
+                        continue
+                    if row:
+                        return self._read_rows([first + i], base_file, journal_file)[0]
+                    prediction, probability = int(part.pred[i]), float(part.prob[i])
+                    return (None if prediction < 0 else prediction,
+                            None if np.isnan(probability) else probability)
+                return None
+        finally:
+            for f in (base_file, journal_file):
+                if f is not None:
+                    f.close()
+
+    def daily_counts(self, filters):
+        """See csv_utils.daily_counts."""
+        base_file, journal_file, journal_end = open_snapshot(self.filepath)
+        try:
+            with self._lock:
+                self._refresh(base_file, journal_file, journal_end)
+                total = len(self._base) + len(self._journal)
+                mask = self._mask(0, total, filters)
+                ts = np.concatenate([self._base.ts, self._journal.ts])[mask]
+                model = np.concatenate([self._base.model, self._journal.model])[mask]
+                pred = np.concatenate([self._base.pred, self._journal.pred])[mask]
+                names = list(self._names)
+        finally:
+            for f in (base_file, journal_file):
+                if f is not None:
+                    f.close()
+        valid = ~np.isnat(ts)
+        df = pd.DataFrame({'model': model[valid], 'day': ts[valid].astype('datetime64[D]'),
+                           'passed': pred[valid] == 1})
+        grouped = df.groupby(['day', 'model'], sort=True)['passed'].agg(['size', 'sum'])
+        summary = [{'model_id': names[code], 'day': str(day)[:10], 'count': int(count),
+                    'passed': int(passed), 'pass_rate': float(passed) / int(count)}
+                   for (day, code), count, passed in zip(grouped.index, grouped['size'], grouped['sum'])]
+        return sorted(summary, key=lambda row: (row['day'], row['model_id']))
+
+    def _mask(self, start, end, filters):
+        nbase = len(self._base)
+        parts = []
+        if start < nbase:
+            parts.append((self._base, start, min(end, nbase)))
+        if end > nbase:
+            parts.append((self._journal, max(start, nbase) - nbase, end - nbase))
+        masks = []
+        for part, lo, hi in parts:
+            mask = np.ones(hi - lo, dtype=bool)
+            if filters.get('model_id') is not None:
+                code = self._codes.get(filters['model_id'], -1)
+                mask &= part.model[lo:hi] == code
+            if filters.get('prediction') is not None:
+                mask &= part.pred[lo:hi] == int(filters['prediction'])
+            if filters.get('start') is not None:
+                mask &= part.ts[lo:hi] >= np.datetime64(filters['start'], 'us')
+            if filters.get('end') is not None:
+                mask &= part.ts[lo:hi] < np.datetime64(filters['end'], 'us')
+            masks.append(mask)
+        return np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+
+    def _read_rows(self, positions, base_file, journal_file):
+        nbase = len(self._base)
+        rows = {}
+        base_positions = [p for p in positions if p < nbase]
+        if base_positions:
+            base_file.seek(0)
+            chunks = [base_file.readline()]  # header
+            for p in base_positions:
+                start = self._base.offsets[p]
+                stop = self._base.offsets[p + 1] if p + 1 < nbase else self._base.end
+                base_file.seek(start)
+                chunk = base_file.read(stop - start)
+                chunks.append(chunk if chunk.endswith(b'\n') else chunk + b'\n')
+            df = pd.read_csv(io.BytesIO(b''.join(chunks)))
+            df = df.astype(object).where(pd.notnull(df), None)
+            rows.update(zip(base_positions, df.to_dict(orient='records')))
+        for p in positions:
+            if p >= nbase:
+                journal_file.seek(self._journal.offsets[p - nbase])
+                rows[p] = json.loads(journal_file.readline())
+        return [rows[p] for p in positions]
+
+    def _refresh(self, base_file, journal_file, journal_end):
+        base_key = None
+        if base_file is not None:
+            st = os.fstat(base_file.fileno())
+            base_key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if base_key != self._base_key:
+            self._names, self._codes = [], {}
+            self._base = self._load_base(base_key) or self._scan_base(base_file, base_key)
+            self._base_key = base_key
+            self._journal, self._journal_inode = _Part(), None
+
+        journal_inode = os.fstat(journal_file.fileno()).st_ino if journal_file is not None else None
+        if journal_inode != self._journal_inode or journal_end < self._journal.end:
+            self._journal, self._journal_inode = _Part(), journal_inode
+        if journal_file is not None and journal_end > self._journal.end:
+            self._index_journal(journal_file, journal_end)
+
+    def _encode(self, timestamps, model_ids, predictions, probabilities):
+        ts = pd.to_datetime(pd.Series(timestamps, dtype=object), errors='coerce', format='ISO8601')
+        codes = np.empty(len(model_ids), dtype=np.int32)
+        for i, model_id in enumerate(model_ids):
+            model_id = '' if model_id is None else str(model_id)
+            code = self._codes.get(model_id)
+            if code is None:
+                code = self._codes[model_id] = len(self._names)
+                self._names.append(model_id)
+            codes[i] = code
+        pred = pd.to_numeric(pd.Series(predictions, dtype=object), errors='coerce').fillna(-1).astype(np.int32)
+        prob = pd.to_numeric(pd.Series(probabilities, dtype=object), errors='coerce').astype(np.float64)
+        return ts.to_numpy(dtype='datetime64[us]'), codes, pred.to_numpy(), prob.to_numpy()
+
+    def _scan_base(self, base_file, base_key):
+        if base_file is None:
+            return _Part()
+        base_file.seek(0)
+        data = base_file.read(base_key[1])
+        header_end = data.find(b'\n') + 1
+        if header_end == 0:
+            return _Part(end=len(data))
+        header = next(csv.reader([data[:header_end].decode('utf-8')]))
+        usecols = [c for c in INDEX_COLUMNS if c in header]
+        df = pd.read_csv(io.BytesIO(data), usecols=usecols, dtype=str, keep_default_na=False)
+        # Fast path: one record per line. Quoted newlines fall back to a record scan
+        newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+        offsets = newlines[:-1] + 1 if data.endswith(b'\n') else newlines + 1
+        if len(offsets) != len(df):
+            offsets = np.array(_row_offsets(data, header_end), dtype=np.int64)
+        columns = [df[c].tolist() if c in df else [None] * len(df) for c in INDEX_COLUMNS]
+        part = _Part(offsets.astype(np.int64), *self._encode(*columns), end=len(data))
+        self._save_base(part, base_key)
+        return part
+
+    def _save_base(self, part, base_key):
+        temp = self.index_path + '.tmp'
+        try:
+            with open(temp, 'wb') as f:
+                np.savez(f, version=INDEX_VERSION, base_key=np.array(base_key, dtype=np.int64),
+                         offsets=part.offsets, ts=part.ts.view(np.int64), model=part.model, pred=part.pred, prob=part.prob,
+                         names=np.array(self._names, dtype=str),
+                         end=part.end)
+            os.replace(temp, self.index_path)
+        except OSError as e:
+            print(f"Could not save history index {self.index_path}: {e}")
+
+    def _load_base(self, base_key):
+        if base_key is None or not os.path.exists(self.index_path):
+            return None
+        try:
+            with np.load(self.index_path) as saved:
+                if int(saved['version']) != INDEX_VERSION or tuple(saved['base_key'].tolist()) != base_key:
+                    return None
+                names = saved['names'].tolist()
+                part = _Part(saved['offsets'], saved['ts'].view('datetime64[us]'), saved['model'],
+                             saved['pred'], saved['prob'], end=int(saved['end']))
+        except (OSError, ValueError, KeyError):
+            return None
+        self._names = names
+        self._codes = {name: code for code, name in enumerate(names)}
+        return part
+
+    def _index_journal(self, journal_file, journal_end):
+        journal_file.seek(self._journal.end)
+        data = journal_file.read(journal_end - self._journal.end)
+        offsets, timestamps, model_ids, predictions, probabilities = [], [], [], [], []
+        pos = 0
+        # Anything after the last newline is a torn or in-progress write
+        while True:
+            newline = data.find(b'\n', pos)
+            if newline == -1:
+                break
+            line = data[pos:newline]
+            try:
+                row = json.loads(line) if line else None
+            except ValueError:
+                row = None
+            if isinstance(row, dict):
+                offsets.append(self._journal.end + pos)
+                timestamps.append(row.get('timestamp'))
+                model_ids.append(row.get('model_id'))
+                predictions.append(row.get('prediction'))
+                probabilities.append(row.get('probability'))
+            pos = newline + 1
+        self._journal.extend(np.array(offsets, dtype=np.int64), *self._encode(timestamps, model_ids, predictions, probabilities),
+                             self._journal.end + pos)
+
+_indexes = {}
+_indexes_guard = Lock()
+
+def get_index(filepath):
+    """The process-wide index for filepath."""
+    with _indexes_guard:
+        index = _indexes.get(filepath)
+        if index is None:
+            index = _indexes[filepath] = HistoryIndex(filepath)
+    return index
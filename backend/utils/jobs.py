@@ -0,0 +1,188 @@
+import os
+import json
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from threading import RLock, Thread
+from config import Config
+
+class TrainingCancelled(Exception):
+    pass
+
+# Set in each pool worker by _init_worker
+_progress_queue = None
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+def _run_training(job_id, dataset_path, algorithm, hyperparams, search, cancel_path, n_jobs):
+    """Runs in a pool worker process."""
+    from .ml_utils import train_model, search_model
+
+    def progress(stage, fraction):
+        # Checked at every stage boundary; the model is only saved after the last one
+        if os.path.exists(cancel_path):
+            raise TrainingCancelled("Job cancelled")
+        _progress_queue.put((job_id, stage, fraction))
+
+    if search:
+        return search_model(dataset_path, algorithm, search, progress=progress, n_jobs=n_jobs)
+    return train_model(dataset_path, algorithm, hyperparams, progress=progress)
+
+class TrainingJobs:
+    """
+    Runs train_model in a process pool so web workers stay responsive.
+    Job state is kept in memory and mirrored to one JSON file per job, so any
+    web worker can report status, and cancellation is requested through a flag
+    file the training process checks between stages.
+    """
+
+    def __init__(self, jobs_folder=None, max_workers=None):
+        self.jobs_folder = jobs_folder or Config.JOBS_FOLDER
+        self.max_workers = max_workers or Config.TRAINING_WORKERS
+        # Cores each worker may use for parallel search folds, so that
+        # concurrent jobs don't each start a pool over every core
+        self.n_jobs = max(1, (os.cpu_count() or 1) // self.max_workers)
+        self._jobs = {}
+        self._futures = {}
+        self._lock = RLock()
+        self._executor = None
+        self._progress_queue = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: forking a threaded web server can deadlock the child
+            context = multiprocessing.get_context('spawn')
+            self._progress_queue = context.Queue()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                                 initializer=_init_worker, initargs=(self._progress_queue,))
+            Thread(target=self._listen, name='training-progress', daemon=True).start()
+        return self._executor
+
+    def submit(self, dataset_path, algorithm, hyperparams, on_complete=None, search=None):
+        """
+        Queues a training run (or a hyperparameter search, see ml_utils.search_model)
+        and returns its job record immediately.
+        on_complete(result) is called in this process once training succeeds.
+        """
+        os.makedirs(self.jobs_folder, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'stage': 'queued',
+            'progress': 0.0,
+            'algorithm': algorithm,
+            'dataset': os.path.basename(dataset_path),
+            'hyperparams': hyperparams,
+            'search': search,
+            'submitted': datetime.now().isoformat(),
+            'finished': None,
+            'result': None,
+            'error': None
+        }
+        with self._lock:
+            executor = self._get_executor()
+            self._jobs[job_id] = job
+            self._save(job)
+            future = executor.submit(_run_training, job_id, dataset_path, algorithm, hyperparams, search,
+                                     self._cancel_path(job_id), self.n_jobs)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._finish(job_id, f, on_complete))
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        # Submitted by another web worker
+        try:
+            with open(self._job_path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def list(self):
+        jobs = {}
+        if os.path.isdir(self.jobs_folder):
+            for name in os.listdir(self.jobs_folder):
+                if name.endswith('.json'):
+                    job = self.get(name[:-len('.json')])
+                    if job is not None:
+                        jobs[job['job_id']] = job
+        return sorted(jobs.values(), key=lambda j: j['submitted'], reverse=True)
+
+    def cancel(self, job_id):
+        """Cancels a queued job, or asks a running one to stop. Returns the job or None."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job['status'] in ('completed', 'failed', 'cancelled'):
+            return job
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is not None and future.cancel():
+                self._update(job_id, status='cancelled', stage='cancelled', finished=datetime.now().isoformat())
+                return dict(self._jobs[job_id])
+        open(self._cancel_path(job_id), 'w').close()
+        with self._lock:
+            if job_id in self._jobs:
+                self._update(job_id, status='cancelling')
+                return dict(self._jobs[job_id])
+        job['status'] = 'cancelling'
+        return job
+
+    def _finish(self, job_id, future, on_complete):
+        if future.cancelled():
+            return
+        finished = datetime.now().isoformat()
+        error = future.exception()
+        if isinstance(error, TrainingCancelled):
+            self._update(job_id, status='cancelled', stage='cancelled', finished=finished)
+        elif error is not None:
+            self._update(job_id, status='failed', stage='failed', error=str(error), finished=finished)
+        else:
+            result = future.result()
+            try:
+                if on_complete is not None:
+                    on_complete(result)
+                self._update(job_id, status='completed', stage='completed', progress=1.0, result=result, finished=finished)
+            except Exception as e:
+                self._update(job_id, status='failed', stage='failed', error=str(e), finished=finished)
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if os.path.exists(self._cancel_path(job_id)):
+            os.remove(self._cancel_path(job_id))
+
+    def _listen(self):
+        while True:
+            job_id, stage, fraction = self._progress_queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] not in ('queued', 'running'):
+                    continue
+                self._update(job_id, status='running', stage=stage, progress=fraction)
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+            self._save(job)
+
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_folder, f'{job_id}.json')
+
+    def _cancel_path(self, job_id):
+        return os.path.join(self.jobs_folder, f'{job_id}.cancel')
+
+    def _save(self, job):
+        path = self._job_path(job['job_id'])
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(job, f)
+        os.replace(temp, path)
+
+training_jobs = TrainingJobs()
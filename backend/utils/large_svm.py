@@ -0,0 +1,64 @@
+"""
+SVM for training sets too large for an exact SVC.
+
+SVC fits in roughly quadratic to cubic time in the number of rows, and
+probability=True adds an internal 5-fold cross-validation for Platt scaling.
+ApproximateSVC maps the scaled inputs through a Nystroem approximation of the
+kernel (skipped for kernel='linear') and fits a primal LinearSVC on the
+result, which is linear in rows. The kernel map is unsupervised and fitted
+once; probabilities come from a single sigmoid fitted on out-of-fold decision
+values of the linear SVM (CalibratedClassifierCV with ensemble=False), i.e.
+calibration_cv extra linear fits on the mapped features.
+
+ml_utils only imports this module when an SVM is trained on at least
+Config.SVM_LARGE_ROWS rows.
+"""
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import LinearSVC
+
+class ApproximateSVC(ClassifierMixin, BaseEstimator):
+    """Kernel-approximated, calibrated linear SVM taking SVC's main hyperparameters."""
+
+    def __init__(self, C=1.0, kernel='rbf', gamma=None, degree=3, coef0=0, class_weight=None, tol=1e-4,
+                 max_iter=1000, n_components=300, calibration_cv=3, random_state=0):
+        self.C = C
+        self.kernel = kernel
+        self.gamma = gamma
+        self.degree = degree
+        self.coef0 = coef0
+        self.class_weight = class_weight
+        self.tol = tol
+        self.max_iter = max_iter
+        self.n_components = n_components
+        self.calibration_cv = calibration_cv
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        # Unit variance makes Nystroem's default gamma (1 / n_features) match SVC's 'scale'
+        steps = [('scaler', StandardScaler(with_mean=False))]
+        if self.kernel != 'linear':
+            gamma = None if self.gamma in ('scale', 'auto') else self.gamma
+            steps.append(('kernel', Nystroem(kernel=self.kernel, gamma=gamma, degree=self.degree, coef0=self.coef0,
+                                             n_components=min(self.n_components, X.shape[0]),
+                                             random_state=self.random_state)))
+        self.features_ = Pipeline(steps).fit(X)
+        svm = LinearSVC(C=self.C, class_weight=self.class_weight, dual=False, tol=self.tol,
+                        max_iter=self.max_iter, random_state=self.random_state)
+        self.calibrated_ = CalibratedClassifierCV(svm, method='sigmoid', cv=self.calibration_cv,
+                                                  ensemble=False).fit(self.features_.transform(X), y)
+        self.classes_ = self.calibrated_.classes_
+        return self
+
+    def decision_function(self, X):
+        return self.calibrated_.calibrated_classifiers_[0].estimator.decision_function(self.features_.transform(X))
+
+    def predict_proba(self, X):
+        return self.calibrated_.predict_proba(self.features_.transform(X))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -0,0 +1,150 @@
+"""
+In-process request metrics exposed in Prometheus text format at /api/metrics.
+
+Counters and histograms are keyed by name plus a sorted label tuple. Stage
+timings are recorded with `metrics.span('stage', model_id=...)`; when metrics
+are disabled span() returns a shared no-op context manager and record calls
+return immediately, so instrumented code pays only an attribute check.
+"""
+import time
+from contextlib import nullcontext
+from threading import Lock
+from config import Config
+
+# Seconds, from sub-millisecond stages up to training runs
+DEFAULT_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+_NOOP = nullcontext()
+
+class Histogram:
+    """Cumulative fixed-bucket histogram (Prometheus style: count of values <= each bound)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets + ['+Inf'], counts):
+            running += count
+            cumulative.append([bound, running])
+        return {'buckets': cumulative, 'count': running, 'sum': total}
+
+class _Span:
+    __slots__ = ('metrics', 'key', 'start')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._observe('app_stage_seconds', self.key, time.perf_counter() - self.start)
+        return False
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+HELP = {
+    'app_stage_seconds': 'Time spent in instrumented stages',
+    'http_request_duration_seconds': 'Request latency by route',
+    'http_requests_total': 'Requests by route, method and status'
+}
+
+class Metrics:
+
+    def __init__(self, enabled=None):
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._lock = Lock()
+
+    def span(self, stage, **labels):
+        """Context manager timing a stage into app_stage_seconds{stage=..., **labels}."""
+        if not self.enabled:
+            return _NOOP
+        labels['stage'] = stage
+        return _Span(self, _labels(labels))
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        self._observe(name, _labels(labels), value)
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f'# HELP {name} {HELP[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), histogram in histograms:
+            header(name, 'histogram')
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot['buckets']:
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", str(bound))])} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(snapshot["sum"])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {snapshot["count"]}')
+        return '\n'.join(lines) + '\n' if lines else ''
+
+metrics = Metrics()
@@ -0,0 +1,117 @@
+import time
+import queue
+import pandas as pd
+from threading import Event, Lock, Thread
+from config import Config
+from .ml_utils import predict_single, predict_with_proba
+from .metrics import Histogram
+
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+class _Request:
+    __slots__ = ('model_id', 'model', 'scorer', 'input_data', 'start', 'done', 'result', 'error')
+
+    def __init__(self, model_id, model, scorer, input_data):
+        self.model_id = model_id
+        self.model = model
+        self.scorer = scorer
+        self.input_data = input_data
+        self.start = time.perf_counter()
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+class MicroBatcher:
+    """
+    Coalesces single predictions for the same model that arrive within
+    window_ms of each other (or until max_rows are waiting) and scores them in
+    one vectorized call. Each caller blocks until its own result is ready.
+    """
+
+    def __init__(self, window_ms=None, max_rows=None):
+        self.window = (window_ms if window_ms is not None else Config.PREDICT_BATCH_WINDOW_MS) / 1000.0
+        self.max_rows = max_rows or Config.PREDICT_BATCH_MAX_ROWS
+        self.queue = queue.Queue()
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self._started = False
+        self._lock = Lock()
+
+    def predict(self, model_id, model, scorer, input_data):
+        """Same result as predict_single(model, input_data, scorer)."""
+        self._start()
+        request = _Request(model_id, model, scorer, input_data)
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def stats(self):
+        return {
+            'window_ms': self.window * 1000,
+            'max_rows': self.max_rows,
+            'latency_ms': self.latency_ms.snapshot(),
+            'batch_size': self.batch_size.snapshot()
+        }
+
+    def _start(self):
+        if self._started:
+            return
+        with self._lock:
+            if not self._started:
+                Thread(target=self._run, name='predict-batcher', daemon=True).start()
+                self._started = True
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_model = {}
+            for request in batch:
+                # Keyed by the loaded object too: a reload mid-window starts a new group.
+                # And by the input's keys: in one DataFrame a key missing from some
+                # records becomes NaN and gets imputed, where predict_single rejects it
+                by_model.setdefault((request.model_id, id(request.model), _keys(request.input_data)), []).append(request)
+            for requests in by_model.values():
+                self._score(requests)
+                self.batch_size.observe(len(requests))
+                now = time.perf_counter()
+                for request in requests:
+                    self.latency_ms.observe((now - request.start) * 1000)
+                    request.done.set()
+
+    def _score(self, requests):
+        first = requests[0]
+        records = [r.input_data for r in requests]
+        if len(requests) > 1:
+            try:
+                if first.scorer is not None:
+                    predictions, probabilities = first.scorer.predict(records)
+                else:
+                    predictions, probabilities = predict_with_proba(first.model, pd.DataFrame(records))
+                for request, prediction, probability in zip(requests, predictions, probabilities):
+                    request.result = (int(prediction), float(probability))
+                return
+            except Exception:
+                pass  # score one by one so a bad record only fails its own request
+        for request in requests:
+            try:
+                request.result = predict_single(request.model, request.input_data, request.scorer)
+            except Exception as e:
+                request.error = e
+
+def _keys(input_data):
+    return frozenset(input_data) if isinstance(input_data, dict) else None
+
+micro_batcher = MicroBatcher()
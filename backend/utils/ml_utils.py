@@ -1,67 +1,110 @@
+"""
+Training, search and prediction helpers.
+
+scikit-learn and scipy are imported inside the functions that need them, and
+each estimator class only when its algorithm is first used, so importing this
+module (and the app) stays cheap for traffic that never trains or predicts.
+"""
 import joblib
 import os
+import sys
+import time
 import json
+import hashlib
+import importlib
+import numpy as np
 import pandas as pd
-from sklearn.tree import DecisionTreeClassifier, export_text
-from sklearn.naive_bayes import GaussianNB
-from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import cross_validate
-from sklearn.metrics import accuracy_score, precision_score, recall_score, confusion_matrix, roc_auc_score
 from .preprocessing import get_preprocessor, prepare_data
+from .dataset_cache import load_dataset, content_hash
+from .compiled_scorer import compile_pipeline, scorer_filename
+from .metrics import metrics
 from config import Config
 from datetime import datetime
 
-def get_model_instance(algorithm, hyperparams):
-    if algorithm == 'Decision Tree':
-        return DecisionTreeClassifier(**hyperparams)
-    elif algorithm == 'Naive Bayes':
-        return GaussianNB(**hyperparams) # NB doesn't take many params usually
-    elif algorithm == 'Logistic Regression':
-        return LogisticRegression(**hyperparams, max_iter=1000)
-    elif algorithm == 'SVM':
-        return SVC(**hyperparams, probability=True)
-    else:
+ALGORITHMS = ['Decision Tree', 'Naive Bayes', 'Logistic Regression', 'SVM']
+CV_SCORING = ['accuracy', 'precision', 'recall', 'roc_auc']
+
+# algorithm -> (module, estimator class, fixed constructor arguments)
+ESTIMATORS = {
+    'Decision Tree': ('sklearn.tree', 'DecisionTreeClassifier', {}),
+    'Naive Bayes': ('sklearn.naive_bayes', 'GaussianNB', {}),  # NB doesn't take many params usually
+    'Logistic Regression': ('sklearn.linear_model', 'LogisticRegression', {'max_iter': 1000}),
+    'SVM': ('sklearn.svm', 'SVC', {'probability': True})
+}
+
+def uses_large_svm(algorithm, n_rows):
+    """True when an SVM trained on n_rows rows is approximated instead of fitted exactly."""
+    return algorithm == 'SVM' and 0 < Config.SVM_LARGE_ROWS <= n_rows
+
+def get_model_instance(algorithm, hyperparams, n_rows=0):
+    if algorithm not in ESTIMATORS:
         raise ValueError(f"Unknown algorithm: {algorithm}")
+    if uses_large_svm(algorithm, n_rows):
+        # Exact SVC doesn't scale to this many rows, see utils/large_svm.py
+        from .large_svm import ApproximateSVC
+        defaults = {'n_components': Config.SVM_LARGE_COMPONENTS, 'calibration_cv': Config.SVM_LARGE_CALIBRATION_CV}
+        return ApproximateSVC(**{**defaults, **hyperparams})
+    module, name, fixed = ESTIMATORS[algorithm]
+    estimator = getattr(importlib.import_module(module), name)
+    return estimator(**hyperparams, **fixed)
 
-def train_model(dataset_path, algorithm, hyperparams):
-    # Use sep=None to auto-detect separator (e.g. ; vs ,)
-    df = pd.read_csv(dataset_path, sep=None, engine='python')
-    X, y = prepare_data(df)
-    
+def _build_pipeline(X, algorithm, hyperparams):
+    from sklearn.pipeline import Pipeline
     preprocessor = get_preprocessor(X)
-    clf = get_model_instance(algorithm, hyperparams)
-    
-    pipeline = Pipeline(steps=[('preprocessor', preprocessor),
-                               ('classifier', clf)])
-    
-    # Cross-validation
-    scoring = ['accuracy', 'precision', 'recall', 'roc_auc']
-    cv_results = cross_validate(pipeline, X, y, cv=5, scoring=scoring)
-    
-    # Train on full dataset for saving
-    pipeline.fit(X, y)
-    
-    # Metrics
-    metrics = {
+    clf = get_model_instance(algorithm, hyperparams, n_rows=len(X))
+    return Pipeline(steps=[('preprocessor', preprocessor),
+                           ('classifier', clf)])
+
+def _cv_metrics(pipeline, X, y, n_jobs=None):
+    from sklearn.model_selection import cross_validate
+    cv_results = cross_validate(pipeline, X, y, cv=5, scoring=CV_SCORING, n_jobs=n_jobs)
+    return {
         'accuracy': cv_results['test_accuracy'].mean(),
         'precision': cv_results['test_precision'].mean(),
         'recall': cv_results['test_recall'].mean(),
         'roc_auc': cv_results['test_roc_auc'].mean()
     }
-    
+
+def training_cache_key(dataset_path, algorithm, hyperparams, search=None):
+    """
+    Content address of a training request: dataset bytes, algorithm, canonical
+    hyperparams (or search spec) and the library versions that shape the model.
+    """
+    import sklearn
+    spec = {
+        'dataset': content_hash(dataset_path),
+        'algorithm': algorithm,
+        'hyperparams': hyperparams,
+        'search': search,
+        'versions': {
+            'python': '.'.join(map(str, sys.version_info[:2])),
+            'sklearn': sklearn.__version__,
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'joblib': joblib.__version__
+        }
+    }
+    canonical = json.dumps(spec, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def _save_model(pipeline, algorithm, hyperparams, metrics, report, dataset_path, cache_key, leaderboard=None, model_id=None):
+    """Saves a fitted pipeline and returns its models.csv record."""
     # Generate Model ID and Path
-    model_id = f"{algorithm.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    model_id = model_id or f"{algorithm.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
     model_filename = f"{model_id}.joblib"
     model_path = os.path.join(Config.MODELS_FOLDER, model_filename)
     
     # Save Model
+    report('saving', 0.95)
     joblib.dump(pipeline, model_path)
+    scorer = compile_pipeline(pipeline)
+    if scorer is not None:
+        joblib.dump(scorer, os.path.join(Config.MODELS_FOLDER, scorer_filename(model_filename)))
     
     # Extract Rules if Decision Tree
     rules = None
     if algorithm == 'Decision Tree':
+        from sklearn.tree import export_text
         try:
             # We need to get feature names after preprocessing
             # This is tricky with pipelines, but possible
@@ -103,22 +146,338 @@ def train_model(dataset_path, algorithm, hyperparams):
         'filepath': model_filename,
         'timestamp': datetime.now().isoformat(),
         'rules': rules,
-        'feature_importance': json.dumps(feature_importance)
+        'feature_importance': json.dumps(feature_importance),
+        'leaderboard': json.dumps(leaderboard) if leaderboard is not None else None,
+        'dataset': os.path.basename(dataset_path),
+        'cache_key': cache_key
     }
 
+def train_model(dataset_path, algorithm, hyperparams, progress=None):
+    """
+    Trains, cross-validates and saves a model. progress(stage, fraction), if
+    given, is called before each stage; it may raise to abort the run before
+    anything is saved.
+    """
+    report = progress or (lambda stage, fraction: None)
+    report('loading', 0.0)
+    # Parsed once per file content (separator auto-detected, e.g. ; vs ,)
+    df = load_dataset(dataset_path)
+    X, y = prepare_data(df)
+    
+    pipeline = _build_pipeline(X, algorithm, hyperparams)
+    
+    # Cross-validation
+    report('cross_validating', 0.1)
+    metrics = _cv_metrics(pipeline, X, y)
+    
+    # Train on full dataset for saving
+    report('fitting', 0.8)
+    pipeline.fit(X, y)
+    
+    cache_key = training_cache_key(dataset_path, algorithm, hyperparams)
+    return _save_model(pipeline, algorithm, hyperparams, metrics, report, dataset_path, cache_key)
+
+def _distribution(spec):
+    """A JSON search-space value: a list of choices or {"distribution", "low", "high"}."""
+    from scipy import stats
+    if isinstance(spec, list):
+        return spec
+    kind, low, high = spec.get('distribution'), spec.get('low'), spec.get('high')
+    if kind == 'uniform':
+        return stats.uniform(low, high - low)
+    if kind == 'loguniform':
+        return stats.loguniform(low, high)
+    if kind == 'randint':
+        return stats.randint(low, high)
+    raise ValueError(f"Unknown distribution: {kind}")
+
+def _plain(value):
+    return value.item() if hasattr(value, 'item') else value
+
+def _score(value):
+    # A candidate that failed to fit scores NaN, which isn't valid JSON
+    value = _plain(value)
+    return value if value is not None and np.isfinite(value) else None
+
+def _leaderboard(cv_results):
+    """One entry per candidate at the last round it reached, best first."""
+    entries = {}
+    for i, params in enumerate(cv_results['params']):
+        params = {k.replace('classifier__', '', 1): _plain(v) for k, v in params.items()}
+        entries[json.dumps(params, sort_keys=True, default=str)] = {
+            'params': params,
+            'score': _score(cv_results['mean_test_score'][i]),
+            'round': _plain(cv_results['iter'][i]),
+            'n_samples': _plain(cv_results['n_resources'][i])
+        }
+    ranked = sorted(entries.values(), key=lambda e: (-e['round'], -(e['score'] if e['score'] is not None else -np.inf)))
+    for rank, entry in enumerate(ranked, 1):
+        entry['rank'] = rank
+    return ranked
+
+def search_model(dataset_path, algorithm, search, progress=None, n_jobs=-1):
+    """
+    Hyperparameter search with successive halving: every candidate is scored
+    on a small sample, and only the best 1/factor move on to the next round
+    with factor times more rows. Folds run on n_jobs cores (all by default).
+    Only the winner is refit on the full data and saved; the leaderboard is
+    kept in its record.
+
+    search: {"method": "grid" | "random", "params": {name: [values] or
+    {"distribution": "uniform" | "loguniform" | "randint", "low", "high"}},
+    "scoring": "accuracy", "factor": 3, "n_candidates": "exhaust", "random_state": None}
+    """
+    from sklearn.base import clone
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV, HalvingRandomSearchCV
+    report = progress or (lambda stage, fraction: None)
+    method = search.get('method', 'grid')
+    space = search.get('params') or {}
+    if method not in ('grid', 'random'):
+        raise ValueError(f"Unknown search method: {method}")
+
+    report('loading', 0.0)
+    df = load_dataset(dataset_path)
+    X, y = prepare_data(df)
+    pipeline = _build_pipeline(X, algorithm, {})
+
+    options = dict(factor=search.get('factor', 3), cv=5, scoring=search.get('scoring', 'accuracy'), n_jobs=n_jobs, refit=True)
+    if method == 'grid':
+        grids = space if isinstance(space, list) else [space]
+        grid = [{f'classifier__{k}': v for k, v in g.items()} for g in grids]
+        searcher = HalvingGridSearchCV(pipeline, grid, **options)
+    else:
+        distributions = {f'classifier__{k}': _distribution(v) for k, v in space.items()}
+        searcher = HalvingRandomSearchCV(pipeline, distributions, n_candidates=search.get('n_candidates', 'exhaust'),
+                                         random_state=search.get('random_state'), **options)
+
+    report('searching', 0.1)
+    searcher.fit(X, y)
+    best = searcher.best_estimator_
+    hyperparams = {k.replace('classifier__', '', 1): _plain(v) for k, v in searcher.best_params_.items()}
+
+    # Same full 5-fold metrics as a plain training run, for comparability
+    report('cross_validating', 0.8)
+    metrics = _cv_metrics(clone(best), X, y, n_jobs=n_jobs)
+
+    cache_key = training_cache_key(dataset_path, algorithm, {}, search)
+    return _save_model(best, algorithm, hyperparams, metrics, report, dataset_path, cache_key,
+                       leaderboard=_leaderboard(searcher.cv_results_))
+
+def _transform_fold(X, y, train, test):
+    preprocessor = get_preprocessor(X).fit(X.iloc[train], y.iloc[train])
+    return preprocessor.transform(X.iloc[train]), preprocessor.transform(X.iloc[test])
+
+def _score_fold(algorithm, hyperparams, Xt_train, y_train, Xt_test, y_test, n_rows):
+    from sklearn.metrics import get_scorer
+    clf = get_model_instance(algorithm, hyperparams, n_rows=n_rows)
+    start = time.perf_counter()
+    clf.fit(Xt_train, y_train)
+    fit_time = time.perf_counter() - start
+    scores = {name: get_scorer(name)(clf, Xt_test, y_test) for name in CV_SCORING}
+    return scores, fit_time
+
+def sweep_models(dataset_path, algorithms=None, hyperparams=None, scoring='accuracy', save=False, n_jobs=-1):
+    """
+    Cross-validates several algorithms on one dataset, sharing preprocessing.
+    The dataset is parsed and split once, the preprocessor is fitted once per
+    fold, and every (algorithm, fold) fit runs in parallel on those cached
+    matrices (on n_jobs cores). Folds and scorers match train_model, so
+    metrics are comparable.
+
+    Returns (table, records): the table is sorted best first by `scoring`;
+    records holds a saved model record per algorithm when save is True.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.pipeline import Pipeline
+    algorithms = algorithms or ALGORITHMS
+    hyperparams = hyperparams or {}
+    if scoring not in CV_SCORING:
+        raise ValueError(f"scoring must be one of {CV_SCORING}")
+    for algorithm in algorithms:
+        get_model_instance(algorithm, hyperparams.get(algorithm, {}))  # validate before doing any work
+
+    df = load_dataset(dataset_path)
+    X, y = prepare_data(df)
+    # cross_validate(cv=5) on a classifier uses these same unshuffled stratified folds
+    folds = list(StratifiedKFold(n_splits=5).split(X, y))
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        matrices = parallel(delayed(_transform_fold)(X, y, train, test) for train, test in folds)
+        tasks = [(algorithm, fold) for algorithm in algorithms for fold in range(len(folds))]
+        results = parallel(delayed(_score_fold)(algorithm, hyperparams.get(algorithm, {}),
+                                                matrices[fold][0], y.iloc[folds[fold][0]],
+                                                matrices[fold][1], y.iloc[folds[fold][1]], len(X))
+                           for algorithm, fold in tasks)
+
+    table = []
+    for algorithm in algorithms:
+        fold_results = [r for (a, _), r in zip(tasks, results) if a == algorithm]
+        table.append({
+            'algorithm': algorithm,
+            'hyperparams': hyperparams.get(algorithm, {}),
+            'metrics': {name: float(np.mean([scores[name] for scores, _ in fold_results])) for name in CV_SCORING},
+            'fit_time': float(sum(t for _, t in fold_results))
+        })
+    table.sort(key=lambda row: row['metrics'][scoring], reverse=True)
+    for rank, row in enumerate(table, 1):
+        row['rank'] = rank
+
+    records = []
+    if save:
+        # One full-data preprocessor shared by every saved pipeline
+        preprocessor = get_preprocessor(X).fit(X, y)
+        Xt = preprocessor.transform(X)
+        report = lambda stage, fraction: None
+        for row in table:
+            clf = get_model_instance(row['algorithm'], row['hyperparams'], n_rows=len(X)).fit(Xt, y)
+            pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('classifier', clf)])
+            # Same folds and metrics as train_model, so it answers the same cache key
+            cache_key = training_cache_key(dataset_path, row['algorithm'], row['hyperparams'])
+            record = _save_model(pipeline, row['algorithm'], row['hyperparams'], row['metrics'], report, dataset_path, cache_key)
+            row['model_id'] = record['model_id']
+            records.append(record)
+    return table, records
+
+# How update_model folds new rows into each algorithm; anything else is refit
+INCREMENTAL_METHODS = {'Naive Bayes': 'partial_fit', 'Logistic Regression': 'sgd'}
+DELTA_SUFFIX = '.delta.csv'
+LABEL_COLUMN = '_label'
+
+def delta_filename(model_filename):
+    """Rows added to a refit model's lineage on top of its dataset."""
+    return os.path.splitext(model_filename)[0] + DELTA_SUFFIX
+
+def _sgd_from(clf):
+    """Log-loss SGD classifier that continues from a fitted logistic regression or SGD model."""
+    from sklearn.linear_model import SGDClassifier
+    if isinstance(clf, SGDClassifier):
+        return clf
+    sgd = SGDClassifier(loss='log_loss', alpha=Config.INCREMENTAL_SGD_ALPHA, learning_rate='constant',
+                        eta0=Config.INCREMENTAL_SGD_ETA0, random_state=0)
+    # partial_fit keeps coefficients that are already set instead of starting from zero
+    sgd.coef_ = np.ascontiguousarray(clf.coef_, dtype=np.float64)
+    sgd.intercept_ = np.ascontiguousarray(clf.intercept_, dtype=np.float64)
+    return sgd
+
+def update_model(parent, X_new, y_new, versions=(), progress=None):
+    """
+    Folds new labelled rows (raw feature columns and 0/1 labels) into a trained
+    model and saves the result as a new version; parent is its registry record
+    and versions the versions already taken in its lineage.
+
+    Naive Bayes is updated with GaussianNB.partial_fit and logistic regression
+    with one log-loss SGD pass starting from the current coefficients, both on
+    the new rows only, with the fitted preprocessor kept as is (categories it
+    has not seen are ignored), so the cost is O(new rows). Their metrics are
+    inherited from the parent; `update` records accuracy on the new rows
+    before and after. Decision trees and SVM have no incremental form: they
+    are refit on the parent's dataset plus every row added along the lineage,
+    with fresh cross-validated metrics.
+    """
+    report = progress or (lambda stage, fraction: None)
+    if len(X_new) == 0:
+        raise ValueError("No new rows to update with")
+    algorithm = parent['algorithm']
+    hyperparams = parent.get('hyperparams') or {}
+    method = INCREMENTAL_METHODS.get(algorithm, 'refit')
+    lineage = parent.get('lineage') or parent['model_id']
+    version = max([int(float(parent.get('version') or 1)), *versions]) + 1
+    model_id = f"{lineage}_v{version}"
+    y_new = pd.Series(y_new, dtype=int).reset_index(drop=True)
+
+    report('loading', 0.0)
+    pipeline = load_model(parent['filepath'])
+    X_new = X_new.reset_index(drop=True).reindex(columns=pipeline.named_steps['preprocessor'].feature_names_in_)
+    accuracy_before = float((pipeline.predict(X_new) == y_new).mean())
+    dataset_path = os.path.join(Config.UPLOAD_FOLDER, parent['dataset']) if parent.get('dataset') else None
+    delta = None
+
+    if method == 'refit':
+        if dataset_path is None or not os.path.exists(dataset_path):
+            raise ValueError("The parent model's dataset is needed to refit it and is no longer available")
+        X, y = prepare_data(load_dataset(dataset_path))
+        delta = pd.concat([_lineage_delta(parent), X_new.assign(**{LABEL_COLUMN: y_new})], ignore_index=True)
+        X_all = pd.concat([X, delta.drop(columns=[LABEL_COLUMN]).reindex(columns=X.columns)], ignore_index=True)
+        y_all = pd.concat([y, delta[LABEL_COLUMN]], ignore_index=True).astype(int)
+        pipeline = _build_pipeline(X_all, algorithm, hyperparams)
+        report('cross_validating', 0.1)
+        metrics = _cv_metrics(pipeline, X_all, y_all)
+        report('fitting', 0.8)
+        pipeline.fit(X_all, y_all)
+    else:
+        report('fitting', 0.5)
+        Xt = pipeline.named_steps['preprocessor'].transform(X_new)
+        clf = pipeline.named_steps['classifier']
+        if method == 'partial_fit':
+            clf.partial_fit(Xt, y_new)
+        else:
+            clf = _sgd_from(clf)
+            clf.partial_fit(Xt, y_new, classes=pipeline.named_steps['classifier'].classes_)
+            pipeline.steps[-1] = ('classifier', clf)
+        metrics = parent.get('metrics') or {}
+
+    record = _save_model(pipeline, algorithm, hyperparams, metrics, report, dataset_path or '', None, model_id=model_id)
+    if delta is not None:
+        delta.to_csv(os.path.join(Config.MODELS_FOLDER, delta_filename(record['filepath'])), index=False)
+    record.update({
+        'dataset': parent.get('dataset'),
+        'parent_model_id': parent['model_id'],
+        'lineage': lineage,
+        'version': version,
+        'update': json.dumps({
+            'method': method,
+            'rows': len(X_new),
+            'accuracy_before': accuracy_before,
+            'accuracy_after': float((pipeline.predict(X_new) == y_new).mean())
+        })
+    })
+    return record
+
+def _lineage_delta(parent):
+    path = os.path.join(Config.MODELS_FOLDER, delta_filename(parent['filepath']))
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_csv(path)
+
 def load_model(model_filename):
     path = os.path.join(Config.MODELS_FOLDER, model_filename)
     if not os.path.exists(path):
         raise FileNotFoundError("Model file not found")
     return joblib.load(path)
 
-def predict_single(model, input_data):
+def predict_with_proba(model, X):
+    """
+    Returns (predictions, probability of the predicted class) for a batch.
+    Uses a single predict_proba pass, except for SVC where predict() follows the
+    decision function and can disagree with the Platt-scaled probabilities.
+    """
+    if not hasattr(model, 'predict_proba'):
+        return model.predict(X), np.zeros(len(X))
+    proba = model.predict_proba(X)
+    classifier = model.named_steps['classifier'] if hasattr(model, 'named_steps') else model
+    svm = sys.modules.get('sklearn.svm')  # an SVC can only exist once its module is loaded
+    if svm is not None and isinstance(classifier, svm.SVC):
+        predictions = model.predict(X)
+    else:
+        predictions = model.classes_[proba.argmax(axis=1)]
+    return predictions, proba.max(axis=1)
+
+def predict_single(model, input_data, scorer=None):
     # input_data is a dict
-    df = pd.DataFrame([input_data])
+    if scorer is not None:
+        try:
+            predictions, probabilities = scorer.predict([input_data])
+            return int(predictions[0]), float(probabilities[0])
+        except (KeyError, TypeError, ValueError):
+            pass  # let the pipeline handle (or reject) unusual input
+
+    with metrics.span('dataframe'):
+        df = pd.DataFrame([input_data])
     # Ensure columns match what the pipeline expects (preprocessing handles missing cols if robust, but better to have them)
     # The pipeline expects raw columns.
     
-    prediction = model.predict(df)[0]
-    probability = model.predict_proba(df)[0].max() if hasattr(model, 'predict_proba') else 0.0
-    
-    return int(prediction), float(probability)
+    with metrics.span('predict_proba'):
+        predictions, probabilities = predict_with_proba(model, df)
+    return int(predictions[0]), float(probabilities[0])
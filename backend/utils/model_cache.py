@@ -0,0 +1,164 @@
+import os
+from collections import OrderedDict
+from threading import Lock
+import joblib
+from config import Config
+from .compiled_scorer import compile_pipeline, scorer_filename, SCORER_VERSION
+from .metrics import metrics
+
+class ModelCache:
+    """
+    Bounded in-process LRU cache of loaded model pipelines.
+    Entries are keyed by model_id plus the model file's mtime and size, so a
+    file that is rewritten on disk (e.g. a retrain reusing the same id) is
+    reloaded instead of being served stale.
+    Eviction happens by entry count and by approximate memory, which is taken
+    from the size of the uncompressed joblib file on disk.
+    Each entry also holds the model's compiled scorer (or None), loaded from
+    its saved file or compiled on load for models saved without one.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, models_folder=None):
+        self.max_entries = max_entries if max_entries is not None else Config.MODEL_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes if max_bytes is not None else Config.MODEL_CACHE_MAX_BYTES
+        self.models_folder = models_folder or Config.MODELS_FOLDER
+        self._entries = OrderedDict()  # model_id -> (key, model, nbytes, scorer)
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_id, model_filename):
+        """Returns the loaded pipeline for model_id, loading it from disk on a miss."""
+        return self._get(model_id, model_filename)[1]
+
+    def get_with_scorer(self, model_id, model_filename):
+        """Returns (pipeline, compiled scorer or None) for model_id."""
+        entry = self._get(model_id, model_filename)
+        return entry[1], entry[3]
+
+    def _get(self, model_id, model_filename):
+        path = os.path.join(self.models_folder, model_filename)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(model_id)
+            raise FileNotFoundError("Model file not found")
+        key = (model_filename, st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(model_id)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(model_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Load outside the lock so a slow load doesn't block hits on other models
+        # Uncompressed joblib files can be memory-mapped: their arrays then live in the
+        # shared page cache instead of each worker's heap
+        with metrics.span('joblib_load', model_id=model_id):
+            model = joblib.load(path, mmap_mode='r' if Config.MODEL_MMAP else None)
+        entry = (key, model, st.st_size, self._load_scorer(path, model_filename, st, model))
+
+        with self._lock:
+            self._remove(model_id)
+            if st.st_size <= self.max_bytes and self.max_entries > 0:
+                self._entries[model_id] = entry
+                self._bytes += st.st_size
+                self._evict()
+        return entry
+
+    def _load_scorer(self, path, model_filename, st, model):
+        scorer_path = os.path.join(self.models_folder, scorer_filename(model_filename))
+        try:
+            # A scorer older than its model belongs to a previous save under the same id
+            if os.stat(scorer_path).st_mtime_ns >= st.st_mtime_ns:
+                scorer = joblib.load(scorer_path, mmap_mode='r' if Config.MODEL_MMAP else None)
+                if getattr(scorer, 'version', None) == SCORER_VERSION:
+                    return scorer
+        except (OSError, AttributeError, ImportError, EOFError):
+            pass
+        try:
+            return compile_pipeline(model)
+        except Exception as e:
+            print(f"Could not compile scorer for {model_filename}: {e}")
+            return None
+
+    def preload(self, records, count):
+        """
+        Loads the `count` most recently trained models and runs a warm-up
+        prediction through each, so the first real request doesn't pay for
+        the load. Returns the model_ids that were loaded.
+        """
+        from .ml_utils import predict_single
+
+        recent = sorted(records, key=lambda r: str(r.get('timestamp') or ''), reverse=True)[:count]
+        loaded = []
+        # Oldest first, so the newest model ends up most recently used in the LRU
+        for record in reversed(recent):
+            try:
+                model, scorer = self.get_with_scorer(record['model_id'], record['filepath'])
+                sample = _warmup_input(model)
+                if sample is not None:
+                    predict_single(model, sample)
+                    if scorer is not None:
+                        predict_single(model, sample, scorer)
+                loaded.append(record['model_id'])
+            except Exception as e:
+                print(f"Could not preload model {record.get('model_id')}: {e}")
+        return loaded
+
+    def invalidate(self, model_id):
+        """Drops a model from the cache (after delete or retrain)."""
+        with self._lock:
+            self._remove(model_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0,
+                'models': list(self._entries.keys())
+            }
+
+    def _remove(self, model_id):
+        entry = self._entries.pop(model_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, nbytes, _) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            self.evictions += 1
+
+def _warmup_input(model):
+    """A plausible input row built from the pipeline's imputation values, or None."""
+    try:
+        preprocessor = model.named_steps['preprocessor']
+        sample = {}
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == 'remainder' or not len(columns):
+                continue
+            imputer = transformer.steps[0][1]
+            sample.update(zip(columns, imputer.statistics_))
+        return sample
+    except (AttributeError, KeyError, IndexError, TypeError):
+        return None
+
+# Shared cache used by the predict routes
+model_cache = ModelCache()
@@ -0,0 +1,139 @@
+import os
+import json
+import pandas as pd
+from threading import Lock
+from config import Config
+from .metrics import metrics
+from .csv_utils import read_csv, append_row, init_csv, write_csv, file_signature, file_lock, encode_value, find_rows, indexed_lookups
+
+MODEL_COLUMNS = ['model_id', 'algorithm', 'hyperparams', 'metrics', 'filepath', 'timestamp', 'rules', 'feature_importance', 'leaderboard', 'dataset', 'cache_key',
+                 'parent_model_id', 'lineage', 'version', 'update']
+JSON_FIELDS = ['hyperparams', 'metrics', 'feature_importance', 'leaderboard', 'update']
+
+def _parse_record(raw):
+    """Turns a raw models.csv row into the JSON-ready record served by the API."""
+    record = {k: (None if pd.isnull(v) else v) for k, v in raw.items()}
+    for field in JSON_FIELDS:
+        if record.get(field):
+            try:
+                record[field] = json.loads(record[field])
+            except (TypeError, ValueError):
+                pass
+    return record
+
+class ModelRegistry:
+    """
+    In-memory index of models.csv keyed by model_id.
+    The file is parsed once and JSON fields are decoded up front; writes made
+    through the registry update the index in place, and the file is only
+    re-read when its mtime/size changes underneath us (another worker wrote it).
+    On storage with indexed lookups (SQLite), get() then queries the one
+    model by key and the full reload waits until list() needs it.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._lock = Lock()
+        self._signature = None
+        self._raw = {}      # model_id -> row as stored in the CSV
+        self._models = {}   # model_id -> parsed record
+        self._list = []     # parsed records in file order
+        self._keys = {}     # training cache_key -> model_id
+        self._created = False
+
+    def get(self, model_id):
+        """Returns the parsed record for model_id, or None."""
+        self._ensure_file()
+        if indexed_lookups() and file_signature(self.filepath) != self._signature:
+            # Changed elsewhere: look the one model up rather than reloading the table
+            rows = find_rows(self.filepath, 'model_id', model_id)
+            return _parse_record(rows[-1]) if rows else None
+        self._refresh()
+        return self._models.get(model_id)
+
+    def list(self):
+        """Returns all parsed records in file order. Callers must not mutate them."""
+        self._refresh()
+        return self._list
+
+    def find_cached(self, cache_key):
+        """Returns the raw record of the latest model trained with cache_key, or None."""
+        self._refresh()
+        model_id = self._keys.get(cache_key)
+        if model_id is None:
+            return None
+        return {k: encode_value(v) for k, v in self._raw[model_id].items()}
+
+    def add(self, record):
+        """Appends a raw record (as returned by train_model) to models.csv."""
+        # Under the file lock, so no other worker's row can land between the
+        # signature check and the new signature without being indexed
+        with self._lock, file_lock(self.filepath):
+            self._ensure_file()
+            current = file_signature(self.filepath) == self._signature
+            append_row(record, self.filepath)
+            if current:
+                self._index(record)
+                self._signature = file_signature(self.filepath)
+            else:
+                self._signature = None
+
+    def remove(self, model_id):
+        """Removes model_id from models.csv. Returns the removed record or None."""
+        # The rewrite replaces the journal: hold the file lock from the reload
+        # on, or a model another worker appends in between is lost
+        with self._lock, file_lock(self.filepath):
+            self._reload_if_changed()
+            raw = self._raw.get(model_id)
+            if raw is None:
+                return None
+            rows = [r for mid, r in self._raw.items() if mid != model_id]
+            # Older rows may predate newer columns
+            columns = list(dict.fromkeys(k for r in self._raw.values() for k in r))
+            write_csv(pd.DataFrame(rows, columns=columns), self.filepath, mode='w')
+            self._raw.pop(model_id)
+            self._models.pop(model_id)
+            self._list = [m for m in self._list if m['model_id'] != model_id]
+            # An older model trained with the same key answers it again
+            self._keys = {m['cache_key']: m['model_id'] for m in self._list if m.get('cache_key')}
+            self._signature = file_signature(self.filepath)
+            return _parse_record(raw)
+
+    def _ensure_file(self):
+        # Created on first use rather than when the module is imported
+        if not self._created:
+            init_csv(self.filepath, MODEL_COLUMNS)
+            self._created = True
+
+    def _refresh(self):
+        self._ensure_file()
+        if file_signature(self.filepath) == self._signature:
+            return
+        with self._lock:
+            self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        self._ensure_file()
+        signature = file_signature(self.filepath)
+        if signature == self._signature:
+            return
+        self._raw, self._models, self._list, self._keys = {}, {}, [], {}
+        with metrics.span('registry_read'):
+            df = read_csv(self.filepath)
+        for raw in df.to_dict(orient='records'):
+            self._index(raw)
+        self._signature = signature
+
+    def _index(self, raw):
+        model_id = raw['model_id']
+        record = _parse_record(raw)
+        if model_id in self._models:
+            # Same id written twice (retrain within one second): latest wins
+            self._list = [m for m in self._list if m['model_id'] != model_id]
+        self._raw[model_id] = raw
+        self._models[model_id] = record
+        self._list.append(record)
+        if record.get('cache_key'):
+            self._keys[record['cache_key']] = model_id
+
+model_registry = ModelRegistry(os.path.join(Config.DATA_FOLDER, 'models.csv'))
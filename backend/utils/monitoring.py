@@ -0,0 +1,284 @@
+"""
+Live accuracy per model from user feedback.
+
+Each feedback event is matched to the prediction it refers to through the
+predictions index (csv_utils.find_prediction, no table scan), stored in
+feedback.csv together with that prediction, and folded into running counts
+per model: a confusion matrix, calibration buckets over the probability of
+the predicted class, and hourly buckets that rolling windows are summed from.
+Recording an event costs O(1) on top of the index lookup; reads sum at most
+the buckets of the longest window.
+
+Like ModelRegistry, the counts are only rebuilt from feedback.csv when it
+changes underneath us (feedback recorded by another worker).
+"""
+import os
+import ast
+import time
+import pandas as pd
+from collections import deque
+from datetime import datetime
+from threading import Lock
+from config import Config
+from .csv_utils import read_csv, append_row, init_csv, file_signature, file_lock, find_prediction, read_prediction
+
+FEEDBACK_COLUMNS = ['timestamp', 'model_id', 'actual_result', 'feedback_time', 'prediction', 'probability']
+
+class _Counts:
+    """Binary confusion counts (1 = pass is the positive class) plus summed confidence."""
+    __slots__ = ('tp', 'fp', 'tn', 'fn', 'scored', 'confidence')
+
+    def __init__(self):
+        self.tp = self.fp = self.tn = self.fn = self.scored = 0
+        self.confidence = 0.0
+
+    def add(self, actual, predicted, probability):
+        if predicted == 1:
+            if actual == 1:
+                self.tp += 1
+            else:
+                self.fp += 1
+        elif actual == 1:
+            self.fn += 1
+        else:
+            self.tn += 1
+        if probability is not None:
+            self.scored += 1
+            self.confidence += probability
+
+    def merge(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def summary(self):
+        n = self.tp + self.fp + self.tn + self.fn
+        predicted_pass, actual_pass = self.tp + self.fp, self.tp + self.fn
+        return {
+            'n': n,
+            'accuracy': (self.tp + self.tn) / n if n else None,
+            'precision': self.tp / predicted_pass if predicted_pass else None,
+            'recall': self.tp / actual_pass if actual_pass else None,
+            'mean_confidence': self.confidence / self.scored if self.scored else None,
+            'confusion': {'tp': self.tp, 'fp': self.fp, 'tn': self.tn, 'fn': self.fn}
+        }
+
+class _ModelStats:
+
+    def __init__(self, bins):
+        self.total = _Counts()
+        self.calibration = [[0, 0.0, 0] for _ in range(bins)]  # [count, confidence sum, correct]
+        self.hours = deque()  # (hour number, _Counts), oldest first
+        self.unmatched = 0
+        self.last_feedback = None
+
+    def add(self, actual, predicted, probability, when, keep_hours):
+        self.last_feedback = max(self.last_feedback or when, when)
+        if predicted is None:
+            self.unmatched += 1
+            return
+        self.total.add(actual, predicted, probability)
+        if probability is not None:
+            bucket = self.calibration[min(int(probability * len(self.calibration)), len(self.calibration) - 1)]
+            bucket[0] += 1
+            bucket[1] += probability
+            bucket[2] += int(actual == predicted)
+
+        hour = int(when // 3600)
+        if self.hours and self.hours[-1][0] == hour:
+            counts = self.hours[-1][1]
+        elif not self.hours or self.hours[-1][0] < hour:
+            counts = _Counts()
+            self.hours.append((hour, counts))
+        else:
+            # Out of order (replaying feedback from several workers)
+            counts = next((c for h, c in self.hours if h == hour), None)
+            if counts is None:
+                if hour <= self.hours[-1][0] - keep_hours:
+                    return
+                counts = _Counts()
+                self.hours.append((hour, counts))
+                self.hours = deque(sorted(self.hours, key=lambda item: item[0]))
+        counts.add(actual, predicted, probability)
+        while self.hours and self.hours[0][0] <= self.hours[-1][0] - keep_hours:
+            self.hours.popleft()
+
+    def window(self, hours, now):
+        counts = _Counts()
+        first = int(now // 3600) - hours
+        for hour, bucket in reversed(self.hours):
+            if hour <= first:
+                break
+            counts.merge(bucket)
+        return counts
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return time.time()
+
+def _missing(value):
+    return value is None or value != value  # None or NaN
+
+class ModelMonitor:
+
+    def __init__(self, feedback_path, predictions_path):
+        self.feedback_path = feedback_path
+        self.predictions_path = predictions_path
+        self._lock = Lock()
+        self._signature = None
+        self._models = {}  # model_id -> _ModelStats
+        self._created = False
+
+    def record(self, timestamp, model_id, actual_result):
+        """
+        Stores a feedback event and updates the live counts. Returns
+        (prediction, probability) of the matching prediction, or None when the
+        prediction wasn't saved to history (the event then only counts as unmatched).
+        """
+        match = find_prediction(self.predictions_path, model_id, timestamp)
+        prediction, probability = match if match is not None else (None, None)
+        row = {
+            'timestamp': timestamp,
+            'model_id': model_id,
+            'actual_result': actual_result,
+            'feedback_time': datetime.now().isoformat(),
+            'prediction': prediction,
+            'probability': probability
+        }
+        # Under the file lock, so another worker's event can't land between the
+        # signature check and the new signature without being counted
+        with self._lock, file_lock(self.feedback_path):
+            self._ensure_file()
+            current = file_signature(self.feedback_path) == self._signature
+            append_row(row, self.feedback_path)
+            if current:
+                self._apply(row)
+                self._signature = file_signature(self.feedback_path)
+            else:
+                self._signature = None
+        return match
+
+    def model_ids(self):
+        self._refresh()
+        with self._lock:
+            return list(self._models)
+
+    def report(self, model_id, baseline=None, now=None):
+        """
+        Cumulative and rolling-window metrics, calibration buckets and drift
+        alerts for model_id, or None if it has no feedback. baseline is the
+        accuracy to compare windows against (e.g. the model's cross-validated
+        accuracy); without it the cumulative live accuracy is used.
+        """
+        self._refresh()
+        now = now or time.time()
+        with self._lock:
+            stats = self._models.get(model_id)
+            if stats is None:
+                return None
+            total = stats.total.summary()
+            windows = {f'{h}h': stats.window(h, now).summary() for h in Config.MONITOR_WINDOWS_HOURS}
+            calibration = [{
+                'low': i / len(stats.calibration),
+                'high': (i + 1) / len(stats.calibration),
+                'n': n,
+                'mean_confidence': confidence / n if n else None,
+                'accuracy': correct / n if n else None
+            } for i, (n, confidence, correct) in enumerate(stats.calibration)]
+            unmatched, last_feedback = stats.unmatched, stats.last_feedback
+
+        reference = baseline if baseline is not None else total['accuracy']
+        return {
+            'model_id': model_id,
+            'total': total,
+            'unmatched': unmatched,
+            'last_feedback': datetime.fromtimestamp(last_feedback).isoformat() if last_feedback else None,
+            'windows': windows,
+            'calibration': calibration,
+            'baseline_accuracy': baseline,
+            'alerts': _alerts(windows, reference)
+        }
+
+    def labelled_rows(self, model_ids, since=None):
+        """
+        (X, y) from feedback on saved predictions of model_ids, recorded after
+        `since` (ISO timestamp): the prediction's input as features,
+        actual_result as the label. The latest feedback on a prediction wins.
+        """
+        self._ensure_file()
+        df = read_csv(self.feedback_path)
+        if not df.empty:
+            df = df[df['model_id'].astype(str).isin([str(m) for m in model_ids])]
+        if not df.empty and since:
+            df = df[df['feedback_time'].astype(str) > since]
+        records, labels = [], []
+        if not df.empty:
+            for row in df.drop_duplicates(['model_id', 'timestamp'], keep='last').to_dict(orient='records'):
+                prediction = read_prediction(self.predictions_path, row['model_id'], row['timestamp'])
+                try:
+                    # Inputs are stored as the repr of the request's dict
+                    features = ast.literal_eval(prediction['input_data']) if prediction else None
+                    label = int(row['actual_result'])
+                except (ValueError, SyntaxError, TypeError):
+                    continue
+                if isinstance(features, dict):
+                    records.append(features)
+                    labels.append(label)
+        return pd.DataFrame(records), pd.Series(labels, dtype=int)
+
+    def _ensure_file(self):
+        # Created on first use rather than when the module is imported
+        if not self._created:
+            init_csv(self.feedback_path, FEEDBACK_COLUMNS)
+            self._created = True
+
+    def _refresh(self):
+        self._ensure_file()
+        if file_signature(self.feedback_path) == self._signature:
+            return
+        with self._lock:
+            signature = file_signature(self.feedback_path)
+            if signature == self._signature:
+                return
+            self._models = {}
+            df = read_csv(self.feedback_path)
+            for row in df.to_dict(orient='records'):
+                if _missing(row.get('prediction')):
+                    # Recorded before predictions were matched at write time
+                    match = find_prediction(self.predictions_path, row.get('model_id'), row.get('timestamp'))
+                    row['prediction'], row['probability'] = match if match is not None else (None, None)
+                self._apply(row)
+            self._signature = signature
+
+    def _apply(self, row):
+        try:
+            actual = int(row['actual_result'])
+        except (TypeError, ValueError):
+            return
+        prediction = None if _missing(row.get('prediction')) else int(row['prediction'])
+        probability = None if _missing(row.get('probability')) else float(row['probability'])
+        stats = self._models.get(str(row['model_id']))
+        if stats is None:
+            stats = self._models[str(row['model_id'])] = _ModelStats(Config.MONITOR_CALIBRATION_BINS)
+        stats.add(actual, prediction, probability, _timestamp(row.get('feedback_time')),
+                  max(Config.MONITOR_WINDOWS_HOURS))
+
+def _alerts(windows, baseline):
+    alerts = []
+    tolerance = Config.MONITOR_DRIFT_TOLERANCE
+    for name, window in windows.items():
+        if window['n'] < Config.MONITOR_MIN_SAMPLES:
+            continue
+        accuracy, confidence = window['accuracy'], window['mean_confidence']
+        if baseline is not None and baseline - accuracy > tolerance:
+            alerts.append({'type': 'accuracy_drop', 'window': name, 'n': window['n'],
+                           'accuracy': accuracy, 'baseline': baseline})
+        if confidence is not None and confidence - accuracy > tolerance:
+            alerts.append({'type': 'overconfident', 'window': name, 'n': window['n'],
+                           'accuracy': accuracy, 'mean_confidence': confidence})
+    return alerts
+
+model_monitor = ModelMonitor(os.path.join(Config.DATA_FOLDER, 'feedback.csv'),
+                             os.path.join(Config.DATA_FOLDER, 'predictions.csv'))
@@ -0,0 +1,84 @@
+"""
+Stdlib sampling profiler for single requests.
+
+A background thread samples the profiled thread's stack every interval and
+counts identical stacks. The result is written in the collapsed-stack format
+("frame;frame;frame count" per line) read by flamegraph.pl and speedscope.
+"""
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from threading import Event, Thread, get_ident
+from werkzeug.utils import secure_filename
+from config import Config
+
+PROFILE_SUFFIX = '.collapsed'
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+class SamplingProfiler:
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or get_ident()
+        self.interval = (interval if interval is not None else Config.REQUEST_PROFILE_INTERVAL_MS) / 1000.0
+        self.samples = Counter()
+        self.started = None
+        self.duration = None
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+def save_profile(profiler, method, path, folder=None):
+    """Writes a finished profile under REQUEST_PROFILES_FOLDER and returns its file name."""
+    folder = folder or Config.REQUEST_PROFILES_FOLDER
+    os.makedirs(folder, exist_ok=True)
+    route = secure_filename(path.strip('/').replace('/', '_')) or 'root'
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{method}-{route}-{uuid.uuid4().hex[:8]}{PROFILE_SUFFIX}"
+    temp = os.path.join(folder, name + '.tmp')
+    with open(temp, 'w') as f:
+        f.write(profiler.collapsed())
+    os.replace(temp, os.path.join(folder, name))
+    return name
+
+def list_profiles(folder=None):
+    """Saved profiles, newest first."""
+    folder = folder or Config.REQUEST_PROFILES_FOLDER
+    if not os.path.isdir(folder):
+        return []
+    profiles = []
+    for name in os.listdir(folder):
+        if name.endswith(PROFILE_SUFFIX):
+            st = os.stat(os.path.join(folder, name))
+            profiles.append({'name': name, 'bytes': st.st_size,
+                             'created': datetime.fromtimestamp(st.st_mtime).isoformat()})
+    return sorted(profiles, key=lambda p: p['created'], reverse=True)
@@ -0,0 +1,112 @@
+import os
+import json
+import pandas as pd
+from config import Config
+from .dataset_cache import load_dataset, content_hash, dataset_cache_dir
+from .streaming_profile import stream_profile
+from .metrics import metrics
+
+# Columns of the student dataset charted on the dataset page
+CATEGORICAL_COLUMNS = ['sex', 'address', 'famsize', 'Pstatus', 'Mjob', 'Fjob', 'reason', 'guardian', 'schoolsup', 'famsup', 'paid', 'activities', 'nursery', 'higher', 'internet', 'romantic']
+NUMERIC_COLUMNS = ['age', 'Medu', 'Fedu', 'traveltime', 'studytime', 'failures', 'famrel', 'freetime', 'goout', 'Dalc', 'Walc', 'health', 'absences', 'G1', 'G2', 'G3']
+
+# Bump when the profile layout or computation changes to invalidate sidecars
+PROFILE_FILE = 'profile_v1.json'
+
+def _pairs(counts):
+    # Stored as [key, count] pairs so numeric keys keep their type through JSON
+    return [[k, v] for k, v in counts.items()]
+
+def compute_profile(df):
+    """
+    Computes everything the dataset page shows in one pass over a loaded frame:
+    preview rows, summary stats, G3 class distribution, correlation matrix and
+    per-column distributions. Each column's value_counts is computed once and
+    shared between the class distribution and the histograms.
+    """
+    head = df.head(10)
+    preview = head.astype(object).where(pd.notnull(head), None).to_dict(orient='records')
+
+    desc_df = df.describe()
+    desc_df = desc_df.astype(object).where(pd.notnull(desc_df), None)
+    stats = {
+        "rows": len(df),
+        "columns": list(df.columns),
+        "description": desc_df.to_dict()
+    }
+
+    counts = {}
+    for col in set(CATEGORICAL_COLUMNS + NUMERIC_COLUMNS + ['G3']):
+        if col in df.columns:
+            counts[col] = df[col].value_counts()
+
+    if 'G3' in counts:
+        stats['class_distribution'] = _pairs(counts['G3'])
+
+    correlation = None
+    numeric_df = df.select_dtypes(include=['number'])
+    if not numeric_df.empty:
+        corr_matrix = numeric_df.corr().round(2)
+        corr_matrix = corr_matrix.where(pd.notnull(corr_matrix), None)
+        correlation = {
+            "columns": list(corr_matrix.columns),
+            "values": corr_matrix.values.tolist()
+        }
+
+    distributions = {}
+    for col in CATEGORICAL_COLUMNS:
+        if col in counts:
+            distributions[col] = _pairs(counts[col])
+    for col in NUMERIC_COLUMNS:
+        if col in counts:
+            # nunique() is the number of distinct non-null values, i.e. len(value_counts)
+            if len(counts[col]) < 20:
+                distributions[col] = _pairs(counts[col].sort_index())
+            else:
+                binned = df[col].value_counts(bins=10).sort_index()
+                distributions[col] = [[str(k), v] for k, v in binned.items()]
+
+    return {
+        "preview": preview,
+        "stats": stats,
+        "correlation": correlation,
+        "distributions": distributions
+    }
+
+def _json_default(value):
+    if hasattr(value, 'item'):
+        return value.item()  # numpy scalar
+    return str(value)
+
+def save_profile(filepath):
+    """
+    Profiles a dataset and persists the result next to its cached columns.
+    Files above PROFILE_STREAMING_BYTES are profiled in chunks instead of
+    being loaded into memory (see utils/streaming_profile.py).
+    """
+    with metrics.span('profile_compute'):
+        if os.path.getsize(filepath) > Config.PROFILE_STREAMING_BYTES:
+            profile = stream_profile(filepath)
+        else:
+            profile = compute_profile(load_dataset(filepath))
+    directory = dataset_cache_dir(content_hash(filepath))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, PROFILE_FILE)
+    temp = path + f'.tmp{os.getpid()}'
+    with open(temp, 'w') as f:
+        json.dump(profile, f, default=_json_default)
+    os.replace(temp, path)
+    return json.loads(json.dumps(profile, default=_json_default))
+
+def get_profile(filepath):
+    """Returns the persisted profile for a dataset, computing it on first use."""
+    path = os.path.join(dataset_cache_dir(content_hash(filepath)), PROFILE_FILE)
+    try:
+        with metrics.span('profile_read'), open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return save_profile(filepath)
+
+def as_dict(pairs):
+    """Turns stored [key, count] pairs back into the dict served by the API."""
+    return {k: v for k, v in pairs}
@@ -0,0 +1,110 @@
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from config import Config
+
+def _normalize(value):
+    if hasattr(value, 'item'):
+        value = value.item()  # numpy scalar
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)  # 15, 15.0 and np.int64(15) score the same
+    return str(value)
+
+def input_hash(input_data):
+    """Hash of an input record that ignores key order and int/float differences."""
+    canonical = json.dumps({str(k): _normalize(v) for k, v in input_data.items()},
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """
+    Bounded LRU cache of (prediction, probability) keyed by model_id, model
+    version and a canonical hash of the input. Entries expire after ttl seconds
+    and all entries of a model can be dropped at once when it is retrained or
+    deleted.
+    """
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries if max_entries is not None else Config.RESULT_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else Config.RESULT_CACHE_TTL
+        self._entries = OrderedDict()  # key -> (expires, result)
+        self._by_model = {}            # model_id -> keys
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key(self, model_id, version, input_data):
+        return (model_id, version, input_hash(input_data))
+
+    def get(self, key):
+        """Returns the cached result for key, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._by_model.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, model_id):
+        """Drops every cached result of a model (after delete or retrain)."""
+        with self._lock:
+            for key in list(self._by_model.get(model_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_model.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+    def _remove(self, key):
+        if self._entries.pop(key, None) is not None:
+            keys = self._by_model.get(key[0])
+            keys.discard(key)
+            if not keys:
+                del self._by_model[key[0]]
+
+# Shared cache used by the predict route
+result_cache = ResultCache()
@@ -0,0 +1,259 @@
+import os
+import sqlite3
+import pandas as pd
+from threading import local
+from config import Config
+from .csv_utils import encode_value
+
+# Columns that get a secondary index whenever a table has them
+INDEXED_COLUMNS = ['model_id', 'username', 'timestamp']
+META_TABLE = '_storage_meta'
+
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+def table_name(filepath, data_folder):
+    """
+    Maps a data file path to its table name: relative to data_folder
+    (data/predictions.csv -> predictions), or the full path for files elsewhere,
+    so a test or benchmark writing to a temporary folder never shares a table
+    with the real data.
+    """
+    path, root = os.path.abspath(filepath), os.path.abspath(data_folder)
+    if os.path.commonpath([path, root]) == root:
+        path = os.path.relpath(path, root)
+    return os.path.splitext(path)[0].replace(os.sep, '/')
+
+class SQLiteBackend:
+    """
+    Embedded SQLite store in WAL mode: one table per former CSV file.
+    Readers never block writers, writes from several worker processes are
+    serialized by SQLite itself, and every write bumps a per-table version in
+    the meta table so other workers can cheaply detect changes.
+    """
+    name = 'sqlite'
+    indexed_lookups = True  # find_rows on INDEXED_COLUMNS uses their index
+
+    def __init__(self, db_path, data_folder=None):
+        self.db_path = db_path
+        self.data_folder = data_folder or Config.DATA_FOLDER
+        self._local = local()
+        self._columns = {}  # table -> known columns
+        with self._connect() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {META_TABLE} (name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return _Transaction(conn, on_rollback=self._columns.clear)
+
+    def _table(self, filepath):
+        return table_name(filepath, self.data_folder)
+
+    def _table_columns(self, conn, table):
+        columns = self._columns.get(table)
+        if columns is None:
+            rows = conn.execute(f'PRAGMA table_info({_quote(table)})').fetchall()
+            columns = [r[1] for r in rows]
+            if columns:
+                self._columns[table] = columns
+        return columns
+
+    def _ensure_table(self, conn, table, columns):
+        existing = self._table_columns(conn, table)
+        if not existing:
+            if not columns:
+                raise ValueError(f"Cannot create table {table} without columns")
+            cols = ', '.join(_quote(c) for c in columns)
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {_quote(table)} ({cols})')
+            for col in INDEXED_COLUMNS:
+                if col in columns:
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS {_quote(f"idx_{table}_{col}")} ON {_quote(table)} ({_quote(col)})')
+            self._columns.pop(table, None)
+            existing = self._table_columns(conn, table)
+        missing = [c for c in columns if c not in existing]
+        if missing:
+            # Another process may have added them since we cached the schema
+            self._columns.pop(table, None)
+            existing = self._table_columns(conn, table)
+            missing = [c for c in columns if c not in existing]
+        for col in missing:
+            conn.execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)}')
+        if missing:
+            self._columns[table] = existing + missing
+
+    def _bump_version(self, conn, table):
+        conn.execute(f'INSERT INTO {META_TABLE} (name, version) VALUES (?, 1) '
+                     f'ON CONFLICT(name) DO UPDATE SET version = version + 1', (table,))
+
+    def _insert(self, conn, table, columns, rows):
+        cols = ', '.join(_quote(c) for c in columns)
+        params = ', '.join('?' for _ in columns)
+        conn.executemany(f'INSERT INTO {_quote(table)} ({cols}) VALUES ({params})',
+                         ([encode_value(row.get(c)) for c in columns] for row in rows))
+
+    def read(self, filepath):
+        table = self._table(filepath)
+        with self._connect() as conn:
+            columns = self._table_columns(conn, table)
+            if not columns:
+                return pd.DataFrame()
+            return pd.read_sql_query(f'SELECT * FROM {_quote(table)} ORDER BY rowid', conn.conn)
+
+    def find_rows(self, filepath, column, value):
+        table = self._table(filepath)
+        with self._connect() as conn:
+            if column not in (self._table_columns(conn, table) or []):
+                return []
+            cursor = conn.execute(f'SELECT * FROM {_quote(table)} WHERE {_quote(column)} = ? ORDER BY rowid',
+                                  (encode_value(value),))
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def write(self, df, filepath):
+        table = self._table(filepath)
+        columns = [str(c) for c in df.columns]
+        with self._connect() as conn:
+            conn.begin()
+            if not columns and not self._table_columns(conn, table):
+                return  # e.g. an empty, header-less CSV: nothing to store
+            self._ensure_table(conn, table, columns)
+            conn.execute(f'DELETE FROM {_quote(table)}')
+            self._insert(conn, table, columns, df.to_dict(orient='records'))
+            self._bump_version(conn, table)
+
+    def append(self, data_dict, filepath):
+        table = self._table(filepath)
+        columns = list(data_dict.keys())
+        with self._connect() as conn:
+            conn.begin()
+            self._ensure_table(conn, table, columns)
+            self._insert(conn, table, columns, [data_dict])
+            self._bump_version(conn, table)
+
+    def init(self, filepath, columns):
+        table = self._table(filepath)
+        with self._connect() as conn:
+            conn.begin()
+            self._ensure_table(conn, table, columns)
+
+    def signature(self, filepath):
+        with self._connect() as conn:
+            row = conn.execute(f'SELECT version FROM {META_TABLE} WHERE name = ?', (self._table(filepath),)).fetchone()
+        return row[0] if row else None
+
+    def compact(self, filepath):
+        with self._connect() as conn:
+            conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return False
+
+    def list_files(self, data_folder):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                                "AND name != ? ORDER BY name", (META_TABLE,)).fetchall()
+        root = os.path.abspath(data_folder)
+        paths = [os.path.join(os.path.abspath(self.data_folder), f'{r[0]}.csv') for r in rows]
+        return [os.path.join(data_folder, os.path.basename(p)) for p in paths if os.path.dirname(p) == root]
+
+    def _where(self, filters):
+        clauses, params = [], []
+        if filters.get('model_id') is not None:
+            clauses.append('model_id = ?')
+            params.append(filters['model_id'])
+        if filters.get('prediction') is not None:
+            clauses.append('CAST(prediction AS INTEGER) = ?')
+            params.append(int(filters['prediction']))
+        # Timestamps are stored as ISO strings, which sort chronologically
+        if filters.get('start') is not None:
+            clauses.append('timestamp >= ?')
+            params.append(filters['start'].isoformat())
+        if filters.get('end') is not None:
+            clauses.append('timestamp < ?')
+            params.append(filters['end'].isoformat())
+        return clauses, params
+
+    def page(self, filepath, filters, before, limit):
+        table = self._table(filepath)
+        clauses, params = self._where(filters)
+        if before is not None:
+            clauses.append('rowid < ?')
+            params.append(int(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._connect() as conn:
+            if not self._table_columns(conn, table):
+                return [], None
+            cursor = conn.execute(f'SELECT rowid, * FROM {_quote(table)} {where} ORDER BY rowid DESC LIMIT ?',
+                                  params + [limit + 1])
+            columns = [d[0] for d in cursor.description][1:]
+            rows = cursor.fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return [dict(zip(columns, row[1:])) for row in rows], (rows[-1][0] if more else None)
+
+    def daily_counts(self, filepath, filters):
+        table = self._table(filepath)
+        clauses, params = self._where(filters)
+        clauses.append('timestamp IS NOT NULL')
+        with self._connect() as conn:
+            if not self._table_columns(conn, table):
+                return []
+            rows = conn.execute(f'SELECT substr(timestamp, 1, 10) AS day, model_id, COUNT(*), '
+                                f'SUM(CAST(prediction AS INTEGER) = 1) FROM {_quote(table)} '
+                                f"WHERE {' AND '.join(clauses)} GROUP BY day, model_id ORDER BY day, model_id",
+                                params).fetchall()
+        return [{'model_id': model_id, 'day': day, 'count': count, 'passed': passed, 'pass_rate': passed / count}
+                for day, model_id, count, passed in rows]
+
+    def find_prediction(self, filepath, model_id, timestamp, row=False):
+        table = self._table(filepath)
+        with self._connect() as conn:
+            if not self._table_columns(conn, table):
+                return None
+            cursor = conn.execute(f'SELECT * FROM {_quote(table)} '
+                                  f'WHERE model_id = ? AND timestamp = ? ORDER BY rowid DESC LIMIT 1',
+                                  (str(model_id), str(timestamp)))
+            columns = [d[0] for d in cursor.description]
+            found = cursor.fetchone()
+        if found is None:
+            return None
+        found = dict(zip(columns, found))
+        if row:
+            return found
+        prediction, probability = found.get('prediction'), found.get('probability')
+        return (None if prediction is None else int(prediction), None if probability is None else float(probability))
+
+class _Transaction:
+    """Commits on success and rolls back on error, if begin() was called."""
+
+    def __init__(self, conn, on_rollback=None):
+        self.conn = conn
+        self.active = False
+        self.on_rollback = on_rollback
+
+    def begin(self):
+        # IMMEDIATE takes the write lock up front, so concurrent writers queue
+        # on the busy timeout instead of failing mid-transaction
+        self.conn.execute('BEGIN IMMEDIATE')
+        self.active = True
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        return self.conn.executemany(*args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.active:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+            self.active = False
+            if exc_type and self.on_rollback:
+                # Any ALTER TABLE in the transaction was undone too
+                self.on_rollback()
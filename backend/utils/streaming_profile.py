@@ -0,0 +1,269 @@
+"""
+Out-of-core dataset profiling for files too large to load into memory.
+
+The file is read in chunks and every statistic is kept in a mergeable
+accumulator, so memory is bounded by the chunk size plus a small fixed state:
+
+- count/mean/std and Pearson correlation come from pairwise co-moments
+  merged across chunks with Chan et al.'s parallel Welford update, using the
+  same pairwise-complete observations as DataFrame.corr();
+- value counts are exact per column up to EXACT_VALUES_LIMIT distinct values;
+  beyond that a numeric column switches to an equal-weight histogram sketch.
+
+Tolerance against the in-memory profile (utils/profiling.compute_profile):
+counts, class distributions and categorical distributions are exact; mean,
+std and correlation agree to ~1e-9 (float summation order only); quantiles,
+min/max and 10-bin histograms are exact while a column has at most
+EXACT_VALUES_LIMIT distinct values, otherwise quantiles are within one sketch
+bin (1/SKETCH_BINS of the rows) and histogram counts may shift rows across
+adjacent bin edges. The preview is taken from the first chunk.
+"""
+import numpy as np
+import pandas as pd
+from config import Config
+from .dataset_cache import sniff_file_delimiter
+
+EXACT_VALUES_LIMIT = 10000
+SKETCH_BINS = 1024
+QUANTILES = [0.25, 0.5, 0.75]
+
+class PairwiseMoments:
+    """Mergeable pairwise count/mean/M2/co-moment matrices for k numeric columns."""
+
+    def __init__(self, k):
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))  # mean[i, j]: mean of column i over rows where i and j are present
+        self.m2 = np.zeros((k, k))
+        self.cov = np.zeros((k, k))
+
+    def update(self, X):
+        present = ~np.isnan(X)
+        mask = present.astype(float)
+        counts = mask.sum(axis=0)
+        # Shift by the chunk's column means to keep the sums well conditioned
+        shift = np.where(counts > 0, np.nansum(X, axis=0) / np.maximum(counts, 1), 0.0)
+        Xc = np.where(present, X - shift, 0.0)
+
+        n_b = mask.T @ mask
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(n_b > 0, (Xc.T @ mask) / n_b, 0.0)
+        m2_b = (Xc ** 2).T @ mask - n_b * mean_b ** 2
+        cov_b = Xc.T @ Xc - n_b * mean_b * mean_b.T
+        mean_b = mean_b + shift[:, None]
+
+        total = self.n + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frac = np.where(total > 0, n_b / total, 0.0)
+        delta = mean_b - self.mean
+        weight = self.n * frac  # n_a * n_b / n
+        self.mean = self.mean + delta * frac
+        self.m2 = self.m2 + m2_b + delta ** 2 * weight
+        self.cov = self.cov + cov_b + delta * delta.T * weight
+        self.n = total
+
+    def count(self):
+        return np.diag(self.n)
+
+    def column_mean(self):
+        return np.where(self.count() > 0, np.diag(self.mean), np.nan)
+
+    def column_std(self):
+        n = self.count()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n > 1, np.sqrt(np.maximum(np.diag(self.m2), 0) / (n - 1)), np.nan)
+
+    def corr(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            divisor = np.sqrt(self.m2 * self.m2.T)
+            result = np.where((self.n > 0) & (divisor > 0), self.cov / divisor, np.nan)
+        return np.clip(result, -1, 1)
+
+class HistogramSketch:
+    """
+    Mergeable equal-weight histogram of (centroid, weight) pairs with exact
+    min/max. Compression keeps at most `bins` centroids, each holding roughly
+    1/bins of the total weight.
+    """
+
+    def __init__(self, bins=SKETCH_BINS):
+        self.bins = bins
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values, weights):
+        values = np.asarray(values, dtype=float)
+        weights = np.asarray(weights, dtype=float)
+        if len(values) == 0:
+            return
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.values = np.concatenate([self.values, values])
+        self.weights = np.concatenate([self.weights, weights])
+        if len(self.values) > self.bins:
+            self._compress()
+
+    def _compress(self):
+        order = np.argsort(self.values, kind='mergesort')
+        values, weights = self.values[order], self.weights[order]
+        before = np.cumsum(weights) - weights
+        bucket = np.minimum((before / weights.sum() * self.bins).astype(int), self.bins - 1)
+        totals = np.bincount(bucket, weights=weights, minlength=self.bins)
+        sums = np.bincount(bucket, weights=values * weights, minlength=self.bins)
+        keep = totals > 0
+        self.values = sums[keep] / totals[keep]
+        self.weights = totals[keep]
+
+    def items(self):
+        order = np.argsort(self.values)
+        return self.values[order], self.weights[order]
+
+class ColumnValues:
+    """Exact value counts, falling back to a HistogramSketch for high-cardinality numeric columns."""
+
+    def __init__(self, numeric):
+        self.numeric = numeric
+        self.counts = {}
+        self.sketch = None
+
+    def update(self, series):
+        vc = series.value_counts()
+        if self.sketch is not None:
+            self.sketch.update(vc.index.to_numpy(dtype=float), vc.to_numpy())
+            return
+        for value, count in vc.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        if self.numeric and len(self.counts) > EXACT_VALUES_LIMIT:
+            self.sketch = HistogramSketch()
+            self.sketch.update(list(self.counts.keys()), list(self.counts.values()))
+            self.counts = None
+
+    @property
+    def exact(self):
+        return self.sketch is None
+
+    def value_counts(self):
+        """Exact counts as a Series sorted by frequency, like Series.value_counts()."""
+        return pd.Series(self.counts, dtype='int64').sort_values(ascending=False, kind='stable')
+
+    def _weighted(self):
+        if self.exact:
+            values = np.array(list(self.counts.keys()), dtype=float)
+            weights = np.array(list(self.counts.values()), dtype=float)
+            order = np.argsort(values)
+            return values[order], weights[order], values[order[0]] if len(order) else np.nan, values[order[-1]] if len(order) else np.nan
+        values, weights = self.sketch.items()
+        return values, weights, self.sketch.min, self.sketch.max
+
+    def describe(self):
+        """min, 25%, 50%, 75%, max with the linear interpolation used by Series.quantile."""
+        values, weights, lo, hi = self._weighted()
+        if len(values) == 0:
+            return [np.nan] * 5
+        total = weights.sum()
+        if self.exact:
+            cumulative = np.cumsum(weights)
+            result = []
+            for q in QUANTILES:
+                pos = q * (total - 1)
+                below = values[np.searchsorted(cumulative, np.floor(pos), side='right')]
+                above = values[np.searchsorted(cumulative, np.ceil(pos), side='right')]
+                result.append(below + (above - below) * (pos - np.floor(pos)))
+        else:
+            # Centroids sit at the middle of their weight
+            centers = np.cumsum(weights) - weights / 2
+            result = [float(np.interp(q * total, centers, values)) for q in QUANTILES]
+        return [lo] + result + [hi]
+
+    def histogram(self, bins=10):
+        """Same bins and labels as Series.value_counts(bins=bins).sort_index()."""
+        values, weights, lo, hi = self._weighted()
+        _, edges = pd.cut(np.array([lo, hi]), bins, retbins=True)
+        cats = pd.cut(values, edges, include_lowest=True)
+        counts = pd.Series(weights).groupby(cats, observed=False).sum()
+        return [[str(k), int(round(v))] for k, v in counts.items()]
+
+def stream_profile(filepath, chunk_rows=None):
+    """Same output as profiling.compute_profile(load_dataset(filepath)), in bounded memory."""
+    from .profiling import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS
+
+    chunk_rows = chunk_rows or Config.PROFILE_CHUNK_ROWS
+    reader = pd.read_csv(filepath, sep=sniff_file_delimiter(filepath), chunksize=chunk_rows)
+
+    rows = 0
+    preview = columns = numeric = moments = None
+    non_numeric = set()
+    tracked = {}
+
+    for chunk in reader:
+        if columns is None:
+            head = chunk.head(10)
+            preview = head.astype(object).where(pd.notnull(head), None).to_dict(orient='records')
+            columns = list(chunk.columns)
+            numeric = list(chunk.select_dtypes(include=['number']).columns)
+            moments = PairwiseMoments(len(numeric))
+            wanted = set(CATEGORICAL_COLUMNS + NUMERIC_COLUMNS + ['G3'])
+            for col in columns:
+                if col in numeric or col in wanted:
+                    tracked[col] = ColumnValues(col in numeric)
+
+        rows += len(chunk)
+        block = np.full((len(chunk), len(numeric)), np.nan)
+        for i, col in enumerate(numeric):
+            if col in non_numeric:
+                continue
+            if not pd.api.types.is_numeric_dtype(chunk[col]):
+                # A full read would parse this column as text: drop it from the numeric stats
+                non_numeric.add(col)
+                tracked[col].numeric = False
+                continue
+            block[:, i] = chunk[col].to_numpy(dtype=float, na_value=np.nan)
+        moments.update(block)
+        for col, values in tracked.items():
+            values.update(chunk[col])
+
+    if columns is None:
+        raise ValueError("Dataset is empty")
+
+    keep = [i for i, col in enumerate(numeric) if col not in non_numeric]
+    numeric = [numeric[i] for i in keep]
+
+    description = {}
+    count, mean, std = moments.count(), moments.column_mean(), moments.column_std()
+    for i, col in zip(keep, numeric):
+        lo, q1, q2, q3, hi = tracked[col].describe()
+        stats = {'count': count[i], 'mean': mean[i], 'std': std[i], 'min': lo, '25%': q1, '50%': q2, '75%': q3, 'max': hi}
+        description[col] = {k: (None if pd.isnull(v) else float(v)) for k, v in stats.items()}
+
+    stats = {"rows": rows, "columns": columns, "description": description}
+    if 'G3' in tracked and tracked['G3'].exact:
+        stats['class_distribution'] = [[k, int(v)] for k, v in tracked['G3'].value_counts().items()]
+
+    correlation = None
+    if numeric:
+        corr = np.round(moments.corr()[np.ix_(keep, keep)], 2)
+        correlation = {
+            "columns": numeric,
+            "values": [[None if np.isnan(v) else float(v) for v in row] for row in corr]
+        }
+
+    distributions = {}
+    for col in CATEGORICAL_COLUMNS:
+        if col in tracked:
+            distributions[col] = [[k, int(v)] for k, v in tracked[col].value_counts().items()]
+    for col in NUMERIC_COLUMNS:
+        if col not in tracked:
+            continue
+        values = tracked[col]
+        if values.exact and len(values.counts) < 20:
+            distributions[col] = [[k, int(v)] for k, v in values.value_counts().sort_index().items()]
+        elif col not in non_numeric:
+            distributions[col] = values.histogram(bins=10)
+
+    return {
+        "preview": preview,
+        "stats": stats,
+        "correlation": correlation,
+        "distributions": distributions
+    }
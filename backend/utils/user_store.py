@@ -0,0 +1,103 @@
+import os
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from config import Config
+from .csv_utils import read_csv, append_row, init_csv, file_signature, file_lock, find_rows, indexed_lookups
+
+# bcrypt releases the GIL while hashing, so a small pool lets hash/check work
+# run on all cores while bounding how many run at once.
+_bcrypt_pool = ThreadPoolExecutor(max_workers=Config.BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+
+def hash_password(password):
+    salt = bcrypt.gensalt(rounds=Config.BCRYPT_ROUNDS)
+    return _bcrypt_pool.submit(bcrypt.hashpw, password.encode('utf-8'), salt).result().decode('utf-8')
+
+def check_password(password, hashed):
+    return _bcrypt_pool.submit(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8')).result()
+
+class UserStore:
+    """
+    In-memory username -> password hash index over users.csv.
+    Registrations write through to storage; the index is reloaded only when
+    the file changes underneath us (a registration in another worker). Users
+    are only ever added, so a cached hash never goes stale; on storage with
+    indexed lookups (SQLite) a miss is one keyed query instead of a reload.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._lock = Lock()
+        self._signature = None
+        self._users = {}
+        self._created = False
+
+    def get_hash(self, username):
+        """Returns the stored bcrypt hash for username, or None."""
+        hashed = self._users.get(username)
+        if hashed is None:
+            if indexed_lookups():
+                self._ensure_file()
+                return self._lookup(username)
+            self._refresh()
+            hashed = self._users.get(username)
+        return hashed
+
+    def exists(self, username):
+        return self.get_hash(username) is not None
+
+    def create(self, username, hashed):
+        """
+        Adds a user. Returns False if the username is already taken.
+        The check and the append happen under the storage file lock, so two
+        concurrent registrations of one name can't both succeed, even across
+        worker processes.
+        """
+        with self._lock, file_lock(self.filepath):
+            if indexed_lookups():
+                self._ensure_file()
+                if username in self._users or self._lookup(username) is not None:
+                    return False
+                append_row({'username': username, 'password': hashed}, self.filepath)
+            else:
+                self._reload_if_changed()
+                if username in self._users:
+                    return False
+                append_row({'username': username, 'password': hashed}, self.filepath)
+                self._signature = file_signature(self.filepath)
+            self._users[username] = hashed
+            return True
+
+    def _lookup(self, username):
+        rows = find_rows(self.filepath, 'username', username)
+        if not rows:
+            return None
+        return self._users.setdefault(username, rows[0]['password'])  # first registration wins
+
+    def _ensure_file(self):
+        # Created on first use rather than when the module is imported
+        if not self._created:
+            init_csv(self.filepath, ['username', 'password'])
+            self._created = True
+
+    def _refresh(self):
+        self._ensure_file()
+        if file_signature(self.filepath) == self._signature:
+            return
+        with self._lock:
+            self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        self._ensure_file()
+        signature = file_signature(self.filepath)
+        if signature == self._signature:
+            return
+        df = read_csv(self.filepath)
+        users = {}
+        if not df.empty:
+            for username, hashed in zip(df['username'].astype(str), df['password']):
+                users.setdefault(username, hashed)  # first registration wins, as before
+        self._users = users
+        self._signature = signature
+
+user_store = UserStore(os.path.join(Config.DATA_FOLDER, 'users.csv'))